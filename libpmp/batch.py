@@ -0,0 +1,240 @@
+"""Batch mode of `cost` (`cost --batch ...`):  cost many models in one run,
+and optionally roll their costs up into a portfolio total.
+
+Each input is one of:
+ * the path of a model;
+ * a glob pattern, eg `plans/*.md`, standing for every matching path, in
+   sorted order;
+ * `@FILE`, a manifest listing one input per line (blank lines and lines
+   starting with `#` are skipped), relative to the manifest's directory.
+
+Any of these may end in `#PATH`, selecting the node at the export path
+`PATH` (see `export.node_paths`) of each model instead of its root, eg
+`plan.md#Phase 1`.  Inputs naming a node already named are skipped.  With
+a portfolio, the nodes selected in a model must not contain one another,
+lest the portfolio count them twice.
+
+Models are costed in a pool of worker processes (see
+`loader.map_reporting_errors`).  Each worker keeps its parsed estimates and
+costs between models (see `node.make_distribution` and
+`node.SHARED_COST_CACHE_SIZE`), so estimates and sections repeated across
+plans are fitted and costed once per worker rather than once per model.
+Costs needed for a portfolio are handed back in shared buffers (see
+`buffers`), not pickled.  `buffers` is imported only then, since it needs
+the shared memory of Python 3.8.
+
+The result is written as JSON lines:  one per selected node, with its
+quantiles (or the error that kept it from being costed), then, if a
+portfolio was asked for, one with the quantiles of the sum of all of them.
+"""
+
+import contextlib
+import glob
+import json
+import os
+import sys
+
+from libpmp.cost import load_model
+from libpmp.distributions.distribution import ZERO
+from libpmp.historical.loader import map_reporting_errors
+from libpmp.report.export import node_paths
+
+# Prefix of a manifest input.
+MANIFEST_PREFIX = "@"
+
+# Separates a model's path from the path of the node selected within it.
+SELECTION_SEPARATOR = "#"
+
+# Default kind of buffer for portfolio costs:  `buffers.DEFAULT_KIND`.
+DEFAULT_BUFFER_KIND = "shm"
+
+# Characters that make an input a glob pattern.
+_GLOB_CHARACTERS = "*?["
+
+
+def _read_manifest(path):
+    """@return the inputs listed in the manifest at @p path, relative to
+    the current directory."""
+    directory = os.path.dirname(path)
+    with open(path) as manifest_file:
+        lines = [line.strip() for line in manifest_file]
+    return [os.path.join(directory, line) for line in lines
+            if line and not line.startswith("#")]
+
+
+def expand_inputs(specs):
+    """@return the list of `(path, selection)` of models and nodes named
+    by the inputs @p specs (see the module documentation).  The selection
+    is the export path of a node, or "" for a root.  Each pair is listed
+    once, where first named.  Raises ValueError if a pattern matches
+    nothing."""
+    items = []
+    for spec in specs:
+        if spec.startswith(MANIFEST_PREFIX):
+            items.extend(expand_inputs(
+                _read_manifest(spec[len(MANIFEST_PREFIX):])))
+            continue
+        (pattern, _, selection) = spec.partition(SELECTION_SEPARATOR)
+        if any(character in pattern for character in _GLOB_CHARACTERS):
+            paths = sorted(glob.glob(pattern))
+            if not paths:
+                raise ValueError("No models match %s" % pattern)
+        else:
+            paths = [pattern]
+        items.extend((path, selection) for path in paths)
+    return list(dict.fromkeys(items))
+
+
+def _check_disjoint(path, nodes, selections):
+    """Raise ValueError if any of the @p selections in the model at @p path
+    (whose nodes by export path are @p nodes) is within another."""
+    selected = {nodes[selection]: selection for selection in selections}
+    for selection in selections:
+        ancestor = nodes[selection].parent
+        while ancestor is not None:
+            if ancestor in selected:
+                raise ValueError("%s is within %s in %s" % (
+                    selection, selected[ancestor], path))
+            ancestor = ancestor.parent
+
+
+def _cost_model(job):
+    """Parse and cost a model.  @p job is `(path, selections, quantiles,
+    engine, buffers)`.  @return a list, parallel to `selections`, of the
+    `quantiles` of each selected node and its cost:  None if `buffers` is
+    None, or else shared (see `buffers.share`) into buffers of the
+    `(kind, directory)` `buffers`, or as is if that kind is None.  Costs are
+    only handed back for a portfolio, so then the selected nodes must be
+    disjoint."""
+    (path, selections, quantiles, engine, buffers) = job
+    root = load_model(path)
+    nodes = dict(node_paths(root))
+    for selection in selections:
+        if selection not in nodes:
+            raise ValueError("No node %s in %s" % (selection, path))
+    if buffers is not None:
+        _check_disjoint(path, nodes, selections)
+    root.final_cost(engine=engine)  # Cost the whole tree at once.
+    costs = [nodes[selection].final_cost(engine=engine)
+             for selection in selections]
+    values = [cost.quantiles(quantiles).tolist() for cost in costs]
+    if buffers is None:
+        costs = [None] * len(costs)
+    elif buffers[0] is not None:
+        costs = _share_all(costs, buffers)
+    return list(zip(values, costs))
+
+
+def _share_all(costs, buffers):
+    """@return the handles of @p costs shared (see `buffers.share`) into
+    buffers of the `(kind, directory)` @p buffers.  If any fails, those
+    already shared are released, since nobody would attach them."""
+    # pylint: disable = import-outside-toplevel
+    from libpmp.distributions.buffers import release, share
+    handles = []
+    try:
+        for cost in costs:
+            handles.append(share(cost, *buffers))
+    except BaseException:
+        for handle in handles:
+            release(handle)
+        raise
+    return handles
+
+
+def cost_batch(items, quantiles, engine, jobs=None, portfolio=False,
+               buffer_kind=DEFAULT_BUFFER_KIND):
+    """Cost the nodes @p items (as returned by `expand_inputs`) with
+    @p engine, using up to @p jobs worker processes (default: one per cpu).
+    Each model is parsed once, however many of its nodes are selected.
+    Costs are handed back in buffers of @p buffer_kind (see
+    `buffers.BUFFER_KINDS`), or pickled if that is None.
+
+    @return `(rows, total)`, where `rows` is a list parallel to @p items of
+    `(quantiles, error)` pairs, exactly one of each None; and `total` is
+    the distribution of the sum of the costs of every distinct node without
+    an error if @p portfolio is set, otherwise None.  A model whose selected
+    nodes contain one another is then an error."""
+    selections = {}  # Map of {path: selections in it}, in input order.
+    for (path, selection) in items:
+        selections.setdefault(path, [])
+        if selection not in selections[path]:
+            selections[path].append(selection)
+    with contextlib.ExitStack() as stack:
+        store = None
+        buffers = None
+        if portfolio and buffer_kind is not None:
+            # pylint: disable = import-outside-toplevel
+            from libpmp.distributions.buffers import BufferStore
+            store = stack.enter_context(BufferStore(buffer_kind))
+            buffers = (store.kind, store.directory)
+        elif portfolio:
+            buffers = (None, None)
+        jobs_list = [(path, path_selections, quantiles, engine, buffers)
+                     for (path, path_selections) in selections.items()]
+        outcomes = map_reporting_errors(_cost_model, jobs_list, jobs, False)
+        results = _results(jobs_list, outcomes, store)
+        rows = []
+        total = ZERO if portfolio else None
+        counted = set()
+        for item in items:
+            (item_quantiles, cost, error) = results[item]
+            rows.append((item_quantiles, error))
+            if portfolio and error is None and item not in counted:
+                counted.add(item)
+                total = engine.add(total, cost)
+    return (rows, total)
+
+
+def _results(jobs_list, outcomes, store):
+    """@return a map of {(path, selection): (quantiles, cost, error)} of
+    the @p outcomes of `_cost_model` for @p jobs_list, with costs attached
+    from @p store (if any)."""
+    results = {}
+    for ((path, path_selections, *_), (result, error)) in zip(
+            jobs_list, outcomes):
+        for (i, selection) in enumerate(path_selections):
+            if error is not None:
+                results[(path, selection)] = (None, None, error)
+                continue
+            (quantiles, cost) = result[i]
+            if store is not None:
+                cost = store.attach(cost)
+            results[(path, selection)] = (quantiles, cost, None)
+    return results
+
+
+def _quantile_map(quantiles, values):
+    return dict(zip(("%g" % q for q in quantiles), values))
+
+
+def write_batch(items, rows, quantiles, total=None, output=None):
+    """Write the result of `cost_batch` to the text stream @p output
+    (default: stdout) as JSON lines."""
+    output = output or sys.stdout
+    for ((path, selection), (values, error)) in zip(items, rows):
+        record = {"model": path, "path": selection}
+        if error is not None:
+            record["error"] = "%s: %s" % (type(error).__name__, error)
+        else:
+            record["quantiles"] = _quantile_map(quantiles, values)
+        output.write(json.dumps(record) + "\n")
+    if total is not None:
+        output.write(json.dumps({
+            "portfolio": True,
+            "models": sum(1 for (_, error) in rows if error is None),
+            "failed": sum(1 for (_, error) in rows if error is not None),
+            "quantiles": _quantile_map(
+                quantiles, total.quantiles(quantiles).tolist()),
+        }) + "\n")
+
+
+def run_batch(specs, args, engine):
+    """Cost the models named by the inputs @p specs as directed by the
+    `cost` command line @p args, and write the result to stdout."""
+    items = expand_inputs(specs)
+    (rows, total) = cost_batch(
+        items, args.quantiles, engine, jobs=args.jobs,
+        portfolio=args.portfolio,
+        buffer_kind=None if args.buffers == "pickle" else args.buffers)
+    write_batch(items, rows, args.quantiles, total)
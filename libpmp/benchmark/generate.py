@@ -0,0 +1,150 @@
+"""Generators of synthetic models, for benchmarking.
+
+A model is a tree of `depth` levels below the root, each node having
+`fan_out` children; the top `heading_levels` levels are headings and the
+rest are nested bullets, and the leaves carry estimates.  The same tree can
+be written as markdown or as HTML.  Generation is deterministic for a given
+`seed`.
+"""
+
+import random
+from collections import namedtuple
+
+# Kinds of leaf estimates:  a range such as "{8-40}", a point such as
+# "{12}", or a range from zero such as "{0-30}" (whose fit has no closed
+# form), or none at all.
+ESTIMATE_KINDS = ("range", "point", "zero", "none")
+
+# Default relative frequencies of the `ESTIMATE_KINDS`.
+DEFAULT_ESTIMATE_MIX = {"range": 0.8, "point": 0.1, "zero": 0.05,
+                        "none": 0.05}
+
+# Words from which node names are made.
+_WORDS = ("build", "design", "test", "review", "migrate", "port", "fix",
+          "parser", "server", "client", "schema", "widget", "report", "cache",
+          "index", "query", "plot", "model", "history", "release")
+
+TreeNode = namedtuple("TreeNode", ["name", "estimate", "children"])
+
+
+def _estimate(rng, mix):
+    """@return a random estimate text (or "") drawn according to @p mix."""
+    kinds = sorted(mix)
+    kind = rng.choices(kinds, weights=[mix[k] for k in kinds])[0]
+    low = rng.randint(1, 40)
+    high = low + rng.randint(1, 3 * low)
+    if kind == "range":
+        return "{%d-%d}" % (low, high)
+    if kind == "point":
+        return "{%d}" % low
+    if kind == "zero":
+        return "{0-%d}" % high
+    return ""
+
+
+def generate_tree(depth=3, fan_out=4, estimate_mix=None, seed=0):
+    """@return the root `TreeNode` of a random tree as described in the
+    module docstring, estimated according to @p estimate_mix (a map of
+    {estimate kind: relative frequency}; see `ESTIMATE_KINDS`)."""
+    rng = random.Random(seed)
+    mix = estimate_mix or DEFAULT_ESTIMATE_MIX
+    counter = [0]
+
+    def make(level):
+        counter[0] += 1
+        name = "%s %s %d" % (rng.choice(_WORDS).capitalize(),
+                             rng.choice(_WORDS), counter[0])
+        if level == depth:
+            return TreeNode(name, _estimate(rng, mix), [])
+        return TreeNode(name, "",
+                        [make(level + 1) for _ in range(fan_out)])
+
+    return TreeNode("", "", [make(1) for _ in range(fan_out)])
+
+
+def _text(tree_node):
+    if tree_node.estimate:
+        return "%s %s" % (tree_node.name, tree_node.estimate)
+    return tree_node.name
+
+
+def to_markdown(tree, heading_levels=2):
+    """@return @p tree (from `generate_tree`) as markdown text."""
+    lines = []
+
+    def write(tree_node, level):
+        if level <= heading_levels and tree_node.children:
+            lines.append("%s %s" % ("#" * level, _text(tree_node)))
+            lines.append("")
+        else:
+            indent = "  " * (level - heading_levels - 1)
+            lines.append("%s* %s" % (indent, _text(tree_node)))
+        for child in tree_node.children:
+            write(child, level + 1)
+        if level <= heading_levels and tree_node.children:
+            lines.append("")
+
+    for child in tree.children:
+        write(child, 1)
+    return "\n".join(lines) + "\n"
+
+
+def to_html(tree, heading_levels=2):
+    """@return @p tree (from `generate_tree`) as HTML text, in the form our
+    HTML parser expects of exported documents:  flat lists whose items'
+    nesting is given by their "cN" class (so at most 9 list levels)."""
+    parts = ["<html><body>"]
+
+    def write(tree_node, level):
+        if level <= heading_levels and tree_node.children:
+            parts.append("<h%d>%s</h%d>" % (level, _text(tree_node), level))
+        else:
+            parts.append('<li class="c%d">%s</li>' % (
+                level - heading_levels, _text(tree_node)))
+        for child in tree_node.children:
+            write(child, level + 1)
+
+    for child in tree.children:
+        write(child, 1)
+    parts.append("</body></html>")
+    return "\n".join(parts) + "\n"
+
+
+def _evolve(tree, rng, change_fraction):
+    """@return a copy of @p tree in which about @p change_fraction of the
+    estimated leaves have made progress (their estimates shrink) and a few
+    have been renamed, as between snapshots of a real plan."""
+    def evolve(tree_node):
+        if tree_node.children:
+            return tree_node._replace(
+                children=[evolve(child) for child in tree_node.children])
+        if not tree_node.estimate or rng.random() >= change_fraction:
+            return tree_node
+        name = tree_node.name
+        if rng.random() < 0.1:
+            name += " (revised)"
+        numbers = [int(value)
+                   for value in tree_node.estimate[1:-1].split("-")]
+        numbers = [value // 2 for value in numbers]
+        if len(numbers) == 2 and numbers[1] <= numbers[0]:
+            numbers[1] = numbers[0] + 1
+        if not any(numbers):
+            return tree_node._replace(name=name, estimate="{0-1}")
+        return tree_node._replace(
+            name=name,
+            estimate="{%s}" % "-".join("%d" % value for value in numbers))
+    return evolve(tree)
+
+
+def generate_history(snapshots=5, depth=3, fan_out=4, estimate_mix=None,
+                     change_fraction=0.1, seed=0):
+    """@return a list of @p snapshots markdown texts, oldest first, of a
+    plan (see `generate_tree`) in which a @p change_fraction of estimates
+    change between successive snapshots."""
+    rng = random.Random(seed)
+    tree = generate_tree(depth, fan_out, estimate_mix, seed)
+    texts = []
+    for _ in range(snapshots):
+        texts.append(to_markdown(tree))
+        tree = _evolve(tree, rng, change_fraction)
+    return texts
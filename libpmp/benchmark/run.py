@@ -0,0 +1,268 @@
+#! /usr/bin/env python3
+
+"""Benchmark the stages of the cost and progress tools on synthetic models
+(see `generate`):  parsing, fitting estimates, costing, each report, and
+the progress pipeline.  Each stage's best wall time over several repeats and
+its peak traced memory are written as JSON, so that runs on different
+commits can be compared (see `--compare`)."""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from libpmp.benchmark.generate import (
+    generate_history,
+    generate_tree,
+    to_html,
+    to_markdown,
+)
+from libpmp.model import engines, node
+from libpmp.model.from_html import from_html
+from libpmp.model.from_markdown import from_markdown
+
+# Reports run by the benchmark, with the options they are given.  Plots are
+# drawn serially and uncached, so that timings measure the drawing itself.
+REPORT_ARGS = {
+    "structure_dump": {},
+    "parser_debug": {},
+    "export": {"export_format": "jsonl"},
+    "export_npz": {"export_format": "npz"},
+    "enhanced_html": {},
+}
+
+# Repeats of each stage; the fastest is reported, as the least disturbed by
+# whatever else the machine was doing.
+DEFAULT_REPEATS = 3
+
+# Ratio of new to old time beyond which `--compare` flags a stage.
+REGRESSION_THRESHOLD = 1.1
+
+
+def _report_args(**overrides):
+    """@return the argument namespace the cost tool would give a report."""
+    # pylint: disable = import-outside-toplevel
+    from libpmp.report.export import DEFAULT_QUANTILES
+    args = argparse.Namespace(levels=2, jobs=1, plot_backend="svg",
+                              plot_cache=None, export_format="jsonl",
+                              quantiles=DEFAULT_QUANTILES)
+    for (name, value) in overrides.items():
+        setattr(args, name, value)
+    return args
+
+
+def _fresh_state():
+    """Forget the estimates and costs shared between models, so that no
+    stage (or repeat) is helped by those before it, nor by its setup."""
+    node._SHARED_COSTS.clear()  # pylint: disable = protected-access
+    node.make_distribution.cache_clear()
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Discard whatever is written to stdout, as text or bytes."""
+    sink = io.TextIOWrapper(io.BytesIO(), write_through=True)
+    with contextlib.redirect_stdout(sink):
+        yield
+
+
+def _estimate_texts(markdown_text):
+    """@return the estimate texts of every node of @p markdown_text."""
+    texts = []
+    stack = [from_markdown(markdown_text)]
+    while stack:
+        current = stack.pop()
+        if current.distribution_text:
+            texts.append(current.distribution_text)
+        stack.extend(current.children)
+    return texts
+
+
+def _run_report(name, markdown_text, overrides):
+    # pylint: disable = import-outside-toplevel
+    from libpmp.cost import get_report
+    report = get_report("export" if name == "export_npz" else name)
+    root = from_markdown(markdown_text)
+    with _quiet():
+        report(root, _report_args(**overrides))
+
+
+def _run_progress(history_texts):
+    # pylint: disable = import-outside-toplevel
+    from libpmp.historical.history import history_from_md_texts
+    from libpmp.historical.report import report_sections
+    history = history_from_md_texts(history_texts)
+    model = history.most_recent_model()
+    for _ in report_sections(model, history, _report_args()):
+        pass
+
+
+def stages(markdown_text, html_text, history_texts):
+    """@return a list of `(name, setup, run)` benchmark stages.  `setup()`
+    is called, untimed, before each repeat, and its result is passed to the
+    timed `run`."""
+    def final_cost(root):
+        root.final_cost()
+
+    result = [
+        ("parse_markdown", lambda: markdown_text, from_markdown),
+        ("parse_html", lambda: html_text, from_html),
+        ("fit", lambda: _estimate_texts(markdown_text),
+         lambda texts: [node.make_distribution(text) for text in texts]),
+        ("final_cost", lambda: from_markdown(markdown_text), final_cost),
+    ]
+    for (name, overrides) in REPORT_ARGS.items():
+        result.append(("report_" + name, lambda: None,
+                       lambda _, name=name, overrides=overrides:
+                       _run_report(name, markdown_text, overrides)))
+    result.append(("progress", lambda: history_texts, _run_progress))
+    return result
+
+
+def measure(setup, run, repeats=DEFAULT_REPEATS):
+    """@return `{"seconds": best wall time, "peak_bytes": peak traced
+    memory}` of `run(setup())`, starting each run from a `_fresh_state`.
+    Memory is traced in a separate, untimed run, since tracing slows
+    everything down."""
+    best = float("inf")
+    for _ in range(repeats):
+        state = setup()
+        _fresh_state()
+        start = time.perf_counter()
+        run(state)
+        best = min(best, time.perf_counter() - start)
+    state = setup()
+    _fresh_state()
+    tracemalloc.start()
+    try:
+        run(state)
+        (_, peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "peak_bytes": peak}
+
+
+def _git_commit():
+    """@return the current git commit, or None if there is none."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(params, repeats=DEFAULT_REPEATS, only=None):
+    """@return the benchmark results (as a JSON-compatible dict) of a model
+    generated with @p params (the keyword arguments of `generate_tree` and
+    `generate_history`, and for the record the key of the default engine).
+    If @p only is given, run only the stages named in it."""
+    tree_params = {key: params[key] for key in
+                   ("depth", "fan_out", "estimate_mix", "seed")}
+    tree = generate_tree(**tree_params)
+    history_texts = generate_history(
+        snapshots=params["snapshots"],
+        change_fraction=params["change_fraction"], **tree_params)
+    results = {}
+    for (name, setup, run) in stages(to_markdown(tree), to_html(tree),
+                                     history_texts):
+        if only and name not in only:
+            continue
+        results[name] = measure(setup, run, repeats)
+    return {
+        "commit": _git_commit(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": params,
+        "repeats": repeats,
+        "stages": results,
+    }
+
+
+def compare(old, new):
+    """@return lines comparing the stage times and memory of the benchmark
+    results @p old and @p new."""
+    lines = ["%-24s %10s %10s %7s %9s" % ("stage", "old s", "new s",
+                                          "ratio", "mem ratio")]
+    for (name, result) in new["stages"].items():
+        if name not in old["stages"]:
+            continue
+        before = old["stages"][name]
+        ratio = result["seconds"] / max(before["seconds"], 1e-9)
+        memory_ratio = result["peak_bytes"] / max(before["peak_bytes"], 1)
+        lines.append("%-24s %10.4f %10.4f %7.2f %9.2f%s" % (
+            name, before["seconds"], result["seconds"], ratio, memory_ratio,
+            "  *" if ratio > REGRESSION_THRESHOLD else ""))
+    return lines
+
+
+def _estimate_mix(text):
+    """@return the estimate mix in @p text, eg "range=8,point=1"."""
+    mix = {}
+    for item in text.split(","):
+        (kind, weight) = item.split("=")
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+def _argument_parser():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--depth', type=int, default=3,
+                        help='levels of the generated model')
+    parser.add_argument('--fan-out', type=int, default=4,
+                        help='children of each non-leaf node')
+    parser.add_argument('--estimate-mix', type=_estimate_mix, default=None,
+                        help='relative frequencies of leaf estimate kinds, '
+                             'eg range=8,point=1,zero=1,none=0')
+    parser.add_argument('--snapshots', type=int, default=5,
+                        help='snapshots in the generated history')
+    parser.add_argument('--change-fraction', type=float, default=0.1,
+                        help='fraction of estimates changed per snapshot')
+    parser.add_argument('--seed', type=int, default=0)
+    engines.add_engine_arguments(parser)
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS,
+                        help='timed runs of each stage')
+    parser.add_argument('--stage', action='append', default=None,
+                        help='run only this stage (may be repeated)')
+    parser.add_argument('--output', type=str, default=None,
+                        help='write the JSON results to this file')
+    parser.add_argument('--compare', type=str, default=None,
+                        metavar='OLD_JSON',
+                        help='compare the results with an earlier run')
+    return parser
+
+
+def main():
+    """Parse command line args, run the benchmark, and write the results."""
+    args = _argument_parser().parse_args()
+    params = {"depth": args.depth, "fan_out": args.fan_out,
+              "estimate_mix": args.estimate_mix, "seed": args.seed,
+              "snapshots": args.snapshots,
+              "change_fraction": args.change_fraction}
+    engine = engines.engine_from_args(args)
+    engines.set_default_engine(engine)
+    params["engine"] = list(engine.key)
+    results = benchmark(params, args.repeats, args.stage)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as old_file:
+            old = json.load(old_file)
+        if old["params"] != params:
+            print("warning: comparing runs with different parameters",
+                  file=sys.stderr)
+        print("\n".join(compare(old, results)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
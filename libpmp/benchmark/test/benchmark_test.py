@@ -0,0 +1,90 @@
+#! /usr/bin/env python3
+
+"""Tests for the benchmark's model generator and runner."""
+
+import unittest
+
+from libpmp.benchmark import generate, run
+from libpmp.model import node
+from libpmp.model.from_html import from_html
+from libpmp.model.from_markdown import from_markdown
+
+
+def _leaves(root):
+    if not root.children:
+        return [root]
+    return [leaf for child in root.children for leaf in _leaves(child)]
+
+
+class GenerateTest(unittest.TestCase):
+    """Tests for `generate`."""
+
+    def test_formats_agree(self):
+        """The markdown and HTML forms of a tree parse to the same model."""
+        tree = generate.generate_tree(depth=4, fan_out=3, seed=1)
+        from_md = from_markdown(generate.to_markdown(tree))
+        from_ht = from_html(generate.to_html(tree))
+        self.assertEqual(len(_leaves(from_md)), 3 ** 4)
+        self.assertEqual(
+            [leaf.distribution_text for leaf in _leaves(from_md)],
+            [leaf.distribution_text for leaf in _leaves(from_ht)])
+
+    def test_estimate_mix(self):
+        """Leaves are estimated according to the requested mix."""
+        tree = generate.generate_tree(depth=2, fan_out=4,
+                                      estimate_mix={"point": 1})
+        texts = [leaf.distribution_text for leaf in
+                 _leaves(from_markdown(generate.to_markdown(tree)))]
+        self.assertEqual(len(texts), 16)
+        for text in texts:
+            self.assertRegex(text, r"^{\d+}$")
+
+    def test_history(self):
+        """Histories are deterministic, and change between snapshots."""
+        texts = generate.generate_history(snapshots=3, depth=2, fan_out=3,
+                                          change_fraction=0.5)
+        self.assertEqual(len(texts), 3)
+        self.assertNotEqual(texts[0], texts[2])
+        self.assertEqual(texts, generate.generate_history(
+            snapshots=3, depth=2, fan_out=3, change_fraction=0.5))
+
+
+class RunTest(unittest.TestCase):
+    """Tests for `run`."""
+
+    def test_benchmark(self):
+        """Each stage is timed and measured, and can be compared."""
+        params = {"depth": 2, "fan_out": 2, "estimate_mix": None, "seed": 0,
+                  "snapshots": 2, "change_fraction": 0.5}
+        results = run.benchmark(params, repeats=1,
+                                only=("parse_markdown", "report_export"))
+        self.assertEqual(sorted(results["stages"]),
+                         ["parse_markdown", "report_export"])
+        for result in results["stages"].values():
+            self.assertGreater(result["seconds"], 0)
+            self.assertGreater(result["peak_bytes"], 0)
+        self.assertEqual(len(run.compare(results, results)), 3)
+
+    def test_fit_repeats_fit(self):
+        """Every repeat of the fit stage fits its estimates afresh, though
+        its setup parsed them."""
+        markdown_text = generate.to_markdown(
+            generate.generate_tree(depth=2, fan_out=3, seed=0))
+        (_, setup, fit) = next(
+            stage for stage in run.stages(markdown_text, "", [])
+            if stage[0] == "fit")
+        texts = setup()
+        misses = []
+
+        def fit_counting(state):
+            before = node.make_distribution.cache_info().misses
+            fit(state)
+            misses.append(node.make_distribution.cache_info().misses -
+                          before)
+
+        run.measure(setup, fit_counting, repeats=2)
+        self.assertEqual(misses, [len(set(texts))] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
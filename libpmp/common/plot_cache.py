@@ -0,0 +1,127 @@
+"""An on-disk cache of rendered plots, so that re-running a report over a
+document that has mostly not changed (eg, a nightly `enhanced_html` or
+`progress` run) re-renders only the plots whose data did.
+
+Plots are keyed by a fingerprint of the plot job (the plotter and every
+value of its data) and of the backend and style used to draw it; see
+`fingerprint`.  Each plot is one file, and the least recently used ones are
+evicted (by file mtime, which a cache hit refreshes) once there are more
+than `max_entries`.
+"""
+
+import datetime
+import hashlib
+import os
+import tempfile
+
+import numpy
+
+# Version of the drawing code, part of every fingerprint.  Bump this whenever
+# a change to the plotters or backends changes how a plot looks, so that
+# stale plots are not served from old caches.
+STYLE_VERSION = 1
+
+# Default maximum number of plots kept in a cache directory.
+DEFAULT_MAX_ENTRIES = 5000
+
+_SUFFIX = ".svg"
+
+
+def _feed(digest, value):
+    """Feed a canonical encoding of @p value (made of dicts, sequences,
+    numpy arrays, strings, numbers, datetimes and None) into @p digest."""
+    if isinstance(value, dict):
+        digest.update(b"{")
+        for key in sorted(value, key=repr):
+            _feed(digest, key)
+            _feed(digest, value[key])
+        digest.update(b"}")
+    elif isinstance(value, (list, tuple)):
+        digest.update(b"[")
+        for item in value:
+            _feed(digest, item)
+        digest.update(b"]")
+    elif isinstance(value, numpy.ndarray):
+        array = numpy.ascontiguousarray(value, dtype=float)
+        digest.update(b"a%d:" % array.size)
+        digest.update(array.tobytes())
+    elif isinstance(value, datetime.datetime):
+        digest.update(b"d" + value.isoformat().encode("utf-8"))
+    else:
+        digest.update(("%s:%r;" % (type(value).__name__, value)).encode(
+            "utf-8"))
+
+
+def fingerprint(job, backend):
+    """@return the cache key of the plot job @p job drawn by @p backend."""
+    (plotter, data) = job
+    digest = hashlib.sha1()
+    _feed(digest, (STYLE_VERSION, backend, plotter.__module__,
+                   plotter.__qualname__))
+    _feed(digest, data)
+    return digest.hexdigest()
+
+
+class PlotCache:
+    """A directory of rendered plots, keyed by `fingerprint`."""
+
+    def __init__(self, directory, max_entries=DEFAULT_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._size = None  # Number of plots stored, if known.
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, key):
+        """@return the plot stored under @p key, or None."""
+        path = self._path(key)
+        try:
+            with open(path) as plot_file:
+                svg = plot_file.read()
+            os.utime(path)  # Mark as recently used.
+        except OSError:
+            return None
+        return svg
+
+    def put(self, key, svg):
+        """Store @p svg under @p key.  The file appears atomically, so that
+        concurrent reports sharing the cache never see a partial plot."""
+        (handle, temp_path) = tempfile.mkstemp(dir=self.directory,
+                                               suffix=".tmp")
+        try:
+            with os.fdopen(handle, "w") as temp_file:
+                temp_file.write(svg)
+            if self._size is not None and not os.path.exists(self._path(key)):
+                self._size += 1
+            os.replace(temp_path, self._path(key))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def evict(self):
+        """Remove the least recently used plots beyond `max_entries`.  The
+        directory is only listed when it may have grown too large, so this
+        is cheap to call after every `put`.  (Plots stored by other
+        processes are counted at the next listing.)"""
+        if self._size is not None and self._size <= self.max_entries:
+            return
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(_SUFFIX):
+                    try:
+                        entries.append((entry.stat().st_mtime_ns, entry.path))
+                    except OSError:
+                        pass  # Removed by a concurrent eviction.
+        self._size = len(entries)
+        if len(entries) <= self.max_entries:
+            return
+        self._size = self.max_entries
+        entries.sort()
+        for (_, path) in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
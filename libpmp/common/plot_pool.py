@@ -0,0 +1,167 @@
+"""Rendering of plots to svg, in parallel worker processes.
+
+A plot job is a `(plotter, data)` pair:  @p plotter is a module-level
+function `plotter(data, axes)` that draws onto a matplotlib-style `Axes`,
+and @p data is a picklable description of everything to be drawn (sampled
+curves, labels, and so on).  Reports compute the data for all of their plots
+first, since that needs the models, and then render the jobs together.  Each
+job gets its own axes, never the global `pyplot` ones, so jobs can be
+rendered in any process in any order.
+
+Jobs are drawn by one of two backends:  "svg", our own lightweight svg
+writer (`libpmp.common.svg_plot`), or "matplotlib", which draws in xkcd
+style but is far slower.  Rendered plots may also be kept in a
+`plot_cache.PlotCache`.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from io import StringIO
+
+from libpmp.common import profiling
+from libpmp.common.plot_cache import PlotCache, fingerprint
+from libpmp.common.svg_plot import SvgAxes
+
+BACKENDS = ("svg", "matplotlib")
+
+DEFAULT_BACKEND = "svg"
+
+# Backends slow enough to be worth a process pool.  Our svg writer takes
+# about as long to draw a plot as to send its data to another process.
+PARALLEL_BACKENDS = ("matplotlib",)
+
+# Fixed salt for the ids within matplotlib svgs, so that the same job always
+# renders to the same svg, whichever process renders it.
+_SVG_HASH_SALT = "libpmp"
+
+# The matplotlib release whose svgs first carry a date, which we drop with
+# the `metadata` option it introduced so the same job renders the same svg.
+_SVG_METADATA_VERSION = (3, 1)
+
+
+def _matplotlib_version():
+    """@return the (major, minor) version of the installed matplotlib."""
+    # pylint: disable = import-outside-toplevel
+    import matplotlib
+    return tuple(int(part) for part in matplotlib.__version__.split(".")[:2])
+
+
+def _render_matplotlib(plotter, data):
+    """Draw @p data with @p plotter onto a new matplotlib figure."""
+    # pylint: disable = import-outside-toplevel
+    from matplotlib import pyplot as plt
+    from matplotlib.backends.backend_svg import FigureCanvasSVG
+    from matplotlib.figure import Figure
+
+    options = {}
+    if _matplotlib_version() >= _SVG_METADATA_VERSION:
+        options["metadata"] = {"Date": None}
+    # Represent approximate/unfounded estimates with xkcd art.
+    with plt.xkcd(), plt.rc_context({"svg.hashsalt": _SVG_HASH_SALT}):
+        figure = Figure()
+        # Before matplotlib 3.1 a bare figure has no canvas to save with.
+        FigureCanvasSVG(figure)
+        plotter(data, figure.add_subplot(1, 1, 1))
+        svg = StringIO()
+        figure.savefig(svg, format="svg", **options)
+    return svg.getvalue()
+
+
+def render_svg(job, backend=DEFAULT_BACKEND):
+    """Draw the plot job @p job with @p backend.  @return the plot as a
+    string of svg."""
+    (plotter, data) = job
+    with profiling.span("render_plot", backend=backend):
+        if backend == "matplotlib":
+            return _render_matplotlib(plotter, data)
+        assert backend == "svg", "Unknown plot backend %s" % backend
+        axes = SvgAxes()
+        plotter(data, axes)
+        return axes.to_svg()
+
+
+# Map of {directory: PlotCache}, so that the caches named by command line
+# arguments persist (and track their sizes) between reports.
+_CACHES = {}
+
+
+def plot_options(args):
+    """@return the keyword arguments for `render_svgs` selected by the
+    command line @p args (`jobs`, `plot_backend` and `plot_cache`, any of
+    which may be absent)."""
+    cache_directory = getattr(args, "plot_cache", None)
+    return {
+        "workers": getattr(args, "jobs", None),
+        "backend": getattr(args, "plot_backend", DEFAULT_BACKEND),
+        "cache": (None if cache_directory is None
+                  else _CACHES.setdefault(cache_directory,
+                                          PlotCache(cache_directory))),
+    }
+
+
+def in_pool(workers=None, backend=DEFAULT_BACKEND, **_):
+    """@return True iff `render_svgs` with these arguments renders its jobs
+    in a process pool (for which it takes them all at once), rather than
+    one at a time as its result is iterated."""
+    return backend in PARALLEL_BACKENDS and (workers is None or workers > 1)
+
+
+def render_svgs(jobs, workers=None, backend=DEFAULT_BACKEND, cache=None):
+    """Render the plot jobs @p jobs with @p backend, in up to @p workers
+    processes (default: one per cpu) if the backend is slow enough to
+    benefit (see `in_pool`).  Plots found in the `PlotCache` @p cache, if
+    given, are not rendered again, and new ones are added to it.
+
+    @return an iterator over their svg strings, in the same order as
+    @p jobs.  Unless in a pool, each job is taken from @p jobs and rendered
+    only as its svg is needed, so that streaming reports can write each
+    plot as soon as it is ready."""
+    if in_pool(workers, backend):
+        jobs = list(jobs)
+        if len(jobs) > 1:
+            return _render_batch(jobs, workers, backend, cache)
+    return _render_lazily(jobs, backend, cache)
+
+
+def _render_lazily(jobs, backend, cache):
+    """Generator of the svgs of @p jobs, rendered one at a time."""
+    for job in jobs:
+        if cache is None:
+            yield render_svg(job, backend)
+            continue
+        key = fingerprint(job, backend)
+        svg = cache.get(key)
+        profiling.count("plot_cache.hits" if svg else "plot_cache.misses")
+        if svg is None:
+            svg = render_svg(job, backend)
+            cache.put(key, svg)
+            cache.evict()
+        yield svg
+
+
+def _render_batch(jobs, workers, backend, cache):
+    """Generator of the svgs of @p jobs, with those not in @p cache rendered
+    in a process pool."""
+    if cache is None:
+        yield from _render_in_pool(jobs, workers, backend)
+        return
+    keys = [fingerprint(job, backend) for job in jobs]
+    svgs = [cache.get(key) for key in keys]
+    missing = [i for (i, svg) in enumerate(svgs) if svg is None]
+    profiling.count("plot_cache.hits", len(jobs) - len(missing))
+    profiling.count("plot_cache.misses", len(missing))
+    rendered = _render_in_pool([jobs[i] for i in missing], workers, backend)
+    for (i, svg) in enumerate(svgs):
+        if svg is None:
+            svg = next(rendered)
+            cache.put(keys[i], svg)
+        yield svg
+    cache.evict()
+
+
+def _render_in_pool(jobs, workers, backend):
+    """Generator of the svgs of @p jobs, rendered in a process pool."""
+    # Rendering in the workers is not profiled; only count it.
+    profiling.count("render_plot.pooled", len(jobs))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(partial(render_svg, backend=backend), jobs)
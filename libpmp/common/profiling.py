@@ -0,0 +1,173 @@
+"""Opt-in instrumentation of the hot paths (distribution arithmetic, fitting,
+quantiles, costing and plotting), to find which sections of a plan and which
+operations are slow.
+
+Nothing is recorded unless `ENABLED` is set (see `enable`), and the checks
+made while it is not are as cheap as possible, since they sit in the
+innermost loops.  Three things are recorded:
+ * counters, by name (see `count`);
+ * spans, intervals of wall time by name (see `span`), which
+   `write_chrome_trace` writes as a trace viewable in chrome://tracing or
+   Perfetto;
+ * per-node costing statistics (see `record_node` and `node_stats`).
+
+Only the current process is instrumented:  work done in worker processes
+(eg plots rendered in a pool) shows as a single span of the parent.  Threads
+of the process (eg of the server) may record at once.
+"""
+
+import contextlib
+import json
+import threading
+import time
+import weakref
+from collections import Counter
+
+# Whether to record anything.  Hot paths check this directly, to spare even
+# a function call when profiling is off.
+ENABLED = False
+
+# Map of {counter name: count}.
+_COUNTERS = Counter()
+
+# Trace events, in the Chrome trace-event format.
+_EVENTS = []
+
+# Map of {node: statistics} (see `node_stats`).
+_NODE_STATS = weakref.WeakKeyDictionary()
+
+# Origin of the trace's timestamps.
+_START = time.perf_counter()
+
+_NOT_RECORDING = contextlib.nullcontext()
+
+# Held while updating or reading what is recorded.
+_LOCK = threading.Lock()
+
+
+def enable(enabled=True):
+    """Start (or, if @p enabled is False, stop) recording."""
+    global ENABLED  # pylint: disable = global-statement
+    ENABLED = enabled
+
+
+def reset():
+    """Discard everything recorded so far."""
+    global _START  # pylint: disable = global-statement
+    with _LOCK:
+        _COUNTERS.clear()
+        _EVENTS.clear()
+        _NODE_STATS.clear()
+        _START = time.perf_counter()
+
+
+def count(name, amount=1):
+    """Add @p amount to the counter @p name, if recording."""
+    if ENABLED:
+        with _LOCK:
+            _COUNTERS[name] += amount
+
+
+def counters():
+    """@return a map of {counter name: count} of everything counted."""
+    with _LOCK:
+        return dict(_COUNTERS)
+
+
+def _add_event(name, start, end, args):
+    """Record a trace event.  Call with `_LOCK` held."""
+    _EVENTS.append({"name": name, "ph": "X", "pid": 0, "tid": 0,
+                    "ts": (start - _START) * 1e6,
+                    "dur": (end - start) * 1e6, "args": args})
+
+
+class _Span:
+    """Context manager that records the wall time of its block."""
+
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        end = time.perf_counter()
+        with _LOCK:
+            _COUNTERS[self.name + ".calls"] += 1
+            _COUNTERS[self.name + ".seconds"] += end - self.start
+            _add_event(self.name, self.start, end, self.args)
+
+
+def span(name, **args):
+    """@return a context manager that, if recording, records the time spent
+    in its block as a span @p name with the JSON-compatible @p args, and
+    counts its calls and seconds (as counters "<name>.calls" and
+    "<name>.seconds").  Values of @p args may be added to the span (as
+    `span.args`) within the block."""
+    if not ENABLED:
+        return _NOT_RECORDING
+    return _Span(name, args)
+
+
+def clock():
+    """@return the current time, for `record_node`."""
+    return time.perf_counter()
+
+
+def record_node(node, start, grid=None):
+    """Record that @p node was costed (not from a memo) from the `clock()`
+    time @p start until now, giving a distribution over @p grid points (if
+    it is discretized)."""
+    end = time.perf_counter()
+    with _LOCK:
+        stats = _node_stats(node)
+        stats["seconds"] += end - start
+        stats["misses"] += 1
+        if grid is not None:
+            stats["grid"] = max(stats["grid"], grid)
+        _COUNTERS["cost.misses"] += 1
+        _add_event("cost", start, end,
+                   {"node": node.get_display_name() or "", "grid": grid})
+
+
+def record_memo_hit(node):
+    """Record that the cost of @p node was found in a memo."""
+    with _LOCK:
+        _node_stats(node)["hits"] += 1
+        _COUNTERS["cost.hits"] += 1
+
+
+def _node_stats(node):
+    """`node_stats`, with `_LOCK` held."""
+    if node not in _NODE_STATS:
+        _NODE_STATS[node] = {"seconds": 0., "grid": 0, "hits": 0,
+                             "misses": 0}
+    return _NODE_STATS[node]
+
+
+def node_stats(node):
+    """@return the costing statistics of @p node:  a map with the total
+    `seconds` spent costing it and its descendants, the most `grid` points
+    of its cost's discretization, and the memo `hits` and `misses`."""
+    with _LOCK:
+        return _node_stats(node)
+
+
+def chrome_trace():
+    """@return everything recorded, as a Chrome trace-event JSON object."""
+    with _LOCK:
+        events = list(_EVENTS)
+    return {"traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"counters": counters()}}
+
+
+def write_chrome_trace(path):
+    """Write `chrome_trace()` to the file @p path."""
+    with open(path, "w") as trace_file:
+        json.dump(chrome_trace(), trace_file)
@@ -0,0 +1,310 @@
+"""A small svg writer for the plots in our reports, much cheaper than
+matplotlib.
+
+`SvgAxes` implements the few `matplotlib.axes.Axes` methods that our plotter
+functions use (lines, hatched fill-between bands, labels, limits and a
+legend), so the same plotter can draw onto either.  Coordinates are written
+straight into compact path data, rounded to a tenth of a pixel, with
+duplicate points and the interiors of horizontal and vertical runs dropped.
+"""
+
+import datetime
+import math
+from html import escape
+
+import numpy
+
+# Size of the whole plot, and the margins around the plotting area, in px.
+WIDTH = 640
+HEIGHT = 480
+MARGINS = {"left": 70, "right": 20, "top": 40, "bottom": 55}
+
+# Approximate number of ticks along each axis.
+NUM_TICKS = 6
+
+# Colors used, in turn, by lines and fills that are not given one.
+COLOR_CYCLE = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728"]
+
+# Size of the repeating tile of each hatch pattern, in px.
+HATCH_SIZE = 8
+
+# Map of {matplotlib hatch: svg elements drawing one tile of it}.
+HATCH_TILES = {
+    "/": '<path d="M0 %(s)d L%(s)d 0"/>',
+    "\\": '<path d="M0 0 L%(s)d %(s)d"/>',
+    "-": '<path d="M0 %(h)d L%(s)d %(h)d"/>',
+    "o": '<circle cx="%(h)d" cy="%(h)d" r="2" fill="none"/>',
+}
+
+# Id of the clip path of the plotting area; it is the same in every plot, as
+# is its definition, so plots can share a document.
+_CLIP_ID = "libpmp-plot-area"
+
+# Names for the hatches in element ids.
+_HATCH_NAMES = {"/": "fwd", "\\": "back", "-": "horiz", "o": "circle"}
+
+
+def _numeric(values):
+    """@return @p values (numbers or datetimes) as a float numpy array."""
+    values = list(values)
+    if values and isinstance(values[0], datetime.datetime):
+        values = [value.timestamp() for value in values]
+    return numpy.asarray(values, dtype=float)
+
+
+def _is_date(value):
+    return isinstance(value, datetime.datetime)
+
+
+def nice_ticks(low, high, count=NUM_TICKS):
+    """@return about @p count round numbers spanning [@p low, @p high]."""
+    if not high > low:
+        return [low]
+    raw_step = (high - low) / count
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    step = next(multiple * magnitude for multiple in (1, 2, 2.5, 5, 10)
+                if multiple * magnitude >= raw_step)
+    first = math.ceil(low / step - 1e-9)
+    last = math.floor(high / step + 1e-9)
+    return [round(i * step, 12) for i in range(first, last + 1)]
+
+
+def _format_tick(value):
+    """@return a short label for the numeric tick @p value."""
+    if value == int(value):
+        return "%d" % value
+    return ("%.3g" % value).rstrip("0")
+
+
+class SvgAxes:
+    """Collects matplotlib-style drawing calls; `to_svg` then writes them
+    out as an svg document."""
+
+    def __init__(self):
+        self._title = ""
+        self._xlabel = ""
+        self._ylabel = ""
+        self._xlim = [None, None]
+        self._ylim = [None, None]
+        self._xdates = False  # True iff the x values are datetimes.
+        self._lines = []  # List of (xs, ys, color).
+        self._fills = []  # List of (xs, lower ys, upper ys, hatch, edge, face)
+        self._legend = []
+        self._colors = 0  # Index of the next color in COLOR_CYCLE.
+
+    def _next_color(self):
+        color = COLOR_CYCLE[self._colors % len(COLOR_CYCLE)]
+        self._colors += 1
+        return color
+
+    def set_title(self, title):
+        self._title = title
+
+    def set_xlabel(self, label):
+        self._xlabel = label
+
+    def set_ylabel(self, label):
+        self._ylabel = label
+
+    def set_xlim(self, left=None, right=None):
+        if left is not None:
+            self._xdates |= _is_date(left)
+            self._xlim[0] = _numeric([left])[0]
+        if right is not None:
+            self._xlim[1] = _numeric([right])[0]
+
+    def set_ylim(self, bottom=None, top=None):
+        if bottom is not None:
+            self._ylim[0] = float(bottom)
+        if top is not None:
+            self._ylim[1] = float(top)
+
+    def set_autoscaley_on(self, _):
+        pass  # The y axis always fits the data not fixed by `set_ylim`.
+
+    def plot(self, xs, ys, _fmt="-", color=None):
+        xs = list(xs)
+        self._xdates |= bool(xs) and _is_date(xs[0])
+        self._lines.append((_numeric(xs), _numeric(ys),
+                            color or self._next_color()))
+
+    def fill_between(self, xs, lower, upper, hatch=None, edgecolor=None,
+                     facecolor=None):
+        xs = list(xs)
+        self._xdates |= bool(xs) and _is_date(xs[0])
+        self._fills.append((_numeric(xs), _numeric(lower), _numeric(upper),
+                            hatch, edgecolor or "black",
+                            facecolor or self._next_color()))
+
+    def legend(self, labels):
+        self._legend = list(labels)
+
+    def _limits(self, limits, arrays):
+        """@return (low, high) from @p limits, defaulting to the extent of
+        @p arrays."""
+        values = [array for array in arrays if len(array)]
+        (low, high) = limits
+        if low is None:
+            low = min(array.min() for array in values) if values else 0.
+        if high is None:
+            high = max(array.max() for array in values) if values else 1.
+        if high <= low:
+            high = low + 1.
+        return (float(low), float(high))
+
+    def to_svg(self):
+        """@return the plot as a string of svg."""
+        xs = [line[0] for line in self._lines] + [f[0] for f in self._fills]
+        ys = ([line[1] for line in self._lines] +
+              [f[1] for f in self._fills] + [f[2] for f in self._fills])
+        (x_low, x_high) = self._limits(self._xlim, xs)
+        (y_low, y_high) = self._limits(self._ylim, ys)
+        left = MARGINS["left"]
+        top = MARGINS["top"]
+        width = WIDTH - left - MARGINS["right"]
+        height = HEIGHT - top - MARGINS["bottom"]
+
+        def x_px(values):
+            return left + (values - x_low) * (width / (x_high - x_low))
+
+        def y_px(values):
+            return top + height - (values - y_low) * (height / (y_high - y_low))
+
+        parts = ['<svg xmlns="http://www.w3.org/2000/svg" width="%dpt" '
+                 'height="%dpt" viewBox="0 0 %d %d" font-family="sans-serif" '
+                 'font-size="12">' % (WIDTH * 3 // 4, HEIGHT * 3 // 4,
+                                      WIDTH, HEIGHT)]
+        parts.append(self._hatch_defs())
+        parts.append('<clipPath id="%s"><rect x="%d" y="%d" width="%d" '
+                     'height="%d"/></clipPath>' % (
+                         _CLIP_ID, left, top, width, height))
+        parts.append('<g clip-path="url(#%s)">' % _CLIP_ID)
+        for (fill_xs, lower, upper, hatch, edge, face) in self._fills:
+            path = _path(numpy.concatenate((x_px(fill_xs),
+                                            x_px(fill_xs[::-1]))),
+                         numpy.concatenate((y_px(lower), y_px(upper[::-1]))),
+                         close=True)
+            parts.append('<path d="%s" fill="%s" stroke="%s"/>' % (
+                path, face, edge))
+            if hatch in HATCH_TILES:
+                parts.append('<path d="%s" fill="url(#%s)" stroke="none"/>' %
+                             (path, _hatch_id(hatch, edge)))
+        for (line_xs, line_ys, color) in self._lines:
+            parts.append(
+                '<path d="%s" fill="none" stroke="%s" stroke-width="2"/>' % (
+                    _path(x_px(line_xs), y_px(line_ys)), color))
+        parts.append('</g>')
+        parts.append(self._axes_svg(x_low, x_high, y_low, y_high,
+                                    x_px, y_px))
+        parts.append(self._legend_svg())
+        parts.append('</svg>')
+        return "\n".join(part for part in parts if part)
+
+    def _hatch_defs(self):
+        """@return a `defs` element of the hatch patterns used."""
+        patterns = []
+        for (_, _, _, hatch, edge, _) in self._fills:
+            if hatch not in HATCH_TILES:
+                continue
+            pattern = (
+                '<pattern id="%s" patternUnits="userSpaceOnUse" width="%d" '
+                'height="%d"><g stroke="%s">%s</g></pattern>' % (
+                    _hatch_id(hatch, edge), HATCH_SIZE, HATCH_SIZE, edge,
+                    HATCH_TILES[hatch] % {"s": HATCH_SIZE,
+                                          "h": HATCH_SIZE // 2}))
+            if pattern not in patterns:
+                patterns.append(pattern)
+        return "<defs>%s</defs>" % "".join(patterns) if patterns else ""
+
+    def _axes_svg(self, x_low, x_high, y_low, y_high, x_px, y_px):
+        """@return svg for the frame, ticks, and labels."""
+        left = MARGINS["left"]
+        top = MARGINS["top"]
+        right = WIDTH - MARGINS["right"]
+        bottom = HEIGHT - MARGINS["bottom"]
+        parts = ['<rect x="%d" y="%d" width="%d" height="%d" fill="none" '
+                 'stroke="black"/>' % (left, top, right - left, bottom - top)]
+        if self._xdates:
+            x_ticks = list(numpy.linspace(x_low, x_high, NUM_TICKS - 1))
+            x_labels = [datetime.datetime.fromtimestamp(
+                tick, tz=datetime.timezone.utc).strftime("%Y-%m-%d")
+                        for tick in x_ticks]
+        else:
+            x_ticks = nice_ticks(x_low, x_high)
+            x_labels = [_format_tick(tick) for tick in x_ticks]
+        for (tick, label) in zip(x_ticks, x_labels):
+            x = x_px(tick)
+            parts.append('<path d="M%.1f %d v5" stroke="black"/>'
+                         '<text x="%.1f" y="%d" text-anchor="middle">%s'
+                         '</text>' % (x, bottom, x, bottom + 18, label))
+        for tick in nice_ticks(y_low, y_high):
+            y = y_px(tick)
+            parts.append('<path d="M%d %.1f h-5" stroke="black"/>'
+                         '<text x="%d" y="%.1f" text-anchor="end">%s'
+                         '</text>' % (left, y, left - 8, y + 4,
+                                      _format_tick(tick)))
+        parts.append('<text x="%d" y="%d" text-anchor="middle" '
+                     'font-size="14">%s</text>' % (
+                         (left + right) // 2, top - 14, escape(self._title)))
+        parts.append('<text x="%d" y="%d" text-anchor="middle">%s</text>' % (
+            (left + right) // 2, HEIGHT - 12, escape(self._xlabel)))
+        parts.append('<text transform="translate(16 %d) rotate(-90)" '
+                     'text-anchor="middle">%s</text>' % (
+                         (top + bottom) // 2, escape(self._ylabel)))
+        return "".join(parts)
+
+    def _legend_svg(self):
+        """@return svg for the legend, in the lower right of the plot."""
+        if not self._legend:
+            return ""
+        entries = list(zip(self._legend,
+                           [line[2] for line in self._lines]))
+        line_height = 18
+        box_width = 30 + 7 * max(len(label) for (label, _) in entries)
+        box_height = 8 + line_height * len(entries)
+        x = WIDTH - MARGINS["right"] - 10 - box_width
+        y = HEIGHT - MARGINS["bottom"] - 10 - box_height
+        parts = ['<rect x="%d" y="%d" width="%d" height="%d" fill="white" '
+                 'stroke="#ccc"/>' % (x, y, box_width, box_height)]
+        for (i, (label, color)) in enumerate(entries):
+            entry_y = y + 4 + line_height * i + line_height // 2
+            parts.append('<path d="M%d %d h20" stroke="%s" stroke-width="2"/>'
+                         '<text x="%d" y="%d">%s</text>' % (
+                             x + 4, entry_y, color, x + 28, entry_y + 4,
+                             escape(label)))
+        return "".join(parts)
+
+
+def _hatch_id(hatch, color):
+    """@return the element id of the pattern for @p hatch in @p color.  Ids
+    are shared between plots of a document, along with their (identical)
+    definitions."""
+    return "libpmp-hatch-%s-%s" % (_HATCH_NAMES[hatch],
+                                   color.lstrip("#"))
+
+
+def _coordinate(value):
+    """@return @p value as a short svg coordinate."""
+    text = "%.1f" % value
+    return text[:-2] if text.endswith(".0") else text
+
+
+def _path(xs, ys, close=False):
+    """@return compact svg path data through the points (@p xs, @p ys).
+    (After the initial moveto, further coordinate pairs are implicit
+    linetos.)"""
+    points = []
+    for point in zip(map(_coordinate, xs), map(_coordinate, ys)):
+        if points and point == points[-1]:
+            continue
+        # Drop the middle of three points along a horizontal or vertical.
+        if len(points) >= 2 and any(
+                points[-2][axis] == points[-1][axis] == point[axis]
+                for axis in (0, 1)):
+            points[-1] = point
+        else:
+            points.append(point)
+    if not points:
+        return ""
+    return ("M" + " ".join("%s %s" % point for point in points) +
+            (" Z" if close else ""))
@@ -0,0 +1,145 @@
+#! /usr/bin/env python3
+
+"""Tests for `batch`."""
+
+import io
+import json
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+from libpmp import batch
+from libpmp.distributions import buffers
+from libpmp.distributions.buffers import NumericHandle, share
+from libpmp.distributions.distribution import ZERO
+from libpmp.model.engines import make_engine
+from libpmp.model.node import make_distribution
+
+
+class BatchTest(unittest.TestCase):
+    """Tests for `batch`."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.paths = []
+        for (name, estimate) in (("a", "{10-20}"), ("b", "{100-200}")):
+            self.paths.append(self._write(name + ".md", """\
+# Plan
+* Design {1}
+* Build %s
+""" % estimate))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as model_file:
+            model_file.write(text)
+        return path
+
+    def test_expand_inputs(self):
+        """Globs and manifests expand to paths; selections are kept."""
+        pattern = os.path.join(self.directory.name, "*.md")
+        self.assertEqual(batch.expand_inputs([pattern]),
+                         [(path, "") for path in self.paths])
+        manifest = self._write("plans.txt", "# Plans\n\nb.md#Plan/Build\n")
+        self.assertEqual(batch.expand_inputs(["@" + manifest]),
+                         [(self.paths[1], "Plan/Build")])
+        with self.assertRaises(ValueError):
+            batch.expand_inputs([os.path.join(self.directory.name, "*.x")])
+        # Nodes named twice are listed once, where first named.
+        self.assertEqual(
+            batch.expand_inputs([self.paths[1] + "#Plan", pattern + "#Plan",
+                                 "@" + manifest]),
+            [(self.paths[1], "Plan"), (self.paths[0], "Plan"),
+             (self.paths[1], "Plan/Build")])
+
+    def test_overlapping_portfolio(self):
+        """The portfolio counts each node once, and rejects models whose
+        selected nodes contain one another."""
+        items = [(self.paths[0], "Plan/Build"), (self.paths[0], "Plan/Build"),
+                 (self.paths[1], "Plan"), (self.paths[1], "Plan/Build")]
+        (rows, total) = batch.cost_batch(items, (0.75,), make_engine(),
+                                         jobs=1, portfolio=True,
+                                         buffer_kind=None)
+        self.assertEqual([error is None for (_, error) in rows],
+                         [True, True, False, False])
+        self.assertIn("Plan/Build is within Plan", str(rows[3][1]))
+        self.assertAlmostEqual(total.quantile(0.75), 20, delta=0.5)
+        # Without a portfolio, nested nodes are only reported.
+        (rows, total) = batch.cost_batch(items, (0.75,), make_engine(),
+                                         jobs=1)
+        self.assertTrue(all(error is None for (_, error) in rows))
+        self.assertIsNone(total)
+
+    def test_cost_batch(self):
+        """Each node is costed, errors are reported per model, and the
+        portfolio sums the nodes costed."""
+        items = [(self.paths[0], "Plan/Build"), (self.paths[1], ""),
+                 (self.paths[1], "Plan/Nothing"),
+                 (os.path.join(self.directory.name, "none.md"), "")]
+        quantiles = (0.1, 0.75)
+        for (jobs, buffer_kind) in ((1, None), (2, "shm"), (2, "file")):
+            (rows, total) = batch.cost_batch(
+                items, quantiles, make_engine(), jobs=jobs, portfolio=True,
+                buffer_kind=buffer_kind)
+            self.assertAlmostEqual(rows[0][0][0], 10, delta=0.1)
+            self.assertAlmostEqual(rows[0][0][1], 20, delta=0.1)
+            self.assertIsNone(rows[0][1])
+            # Model b has an unknown node, so none of it is costed.
+            self.assertIsInstance(rows[1][1], ValueError)
+            self.assertIsInstance(rows[2][1], ValueError)
+            self.assertIsInstance(rows[3][1], OSError)
+            self.assertAlmostEqual(total.quantile(0.75), 20, delta=0.5)
+
+        output = io.StringIO()
+        batch.write_batch(items, rows, quantiles, total, output)
+        records = [json.loads(line)
+                   for line in output.getvalue().splitlines()]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0]["path"], "Plan/Build")
+        self.assertIn("error", records[3])
+        self.assertEqual((records[4]["models"], records[4]["failed"]),
+                         (1, 3))
+
+    def test_failed_share(self):
+        """Buffers shared before a model fails are removed."""
+        path = self._write("phases.md", """\
+# Plan
+## Design
+* Sketch {1-2}
+* Review {2-3}
+## Build
+* Code {5-10}
+* Test {3-4}
+""")
+        shared = []
+
+        def share_once(cost, *target):
+            if shared:
+                raise OSError("No space left")
+            shared.append(share(cost, *target))
+            return shared[-1]
+
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(buffers, "share", side_effect=share_once):
+            with self.assertRaises(OSError):
+                # pylint: disable = protected-access
+                batch._cost_model((path, ["Plan/Design", "Plan/Build"],
+                                   (0.5,), make_engine(),
+                                   ("file", directory)))
+            self.assertIsInstance(shared[0], NumericHandle)
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_interning(self):
+        """Estimates are parsed once, and zero survives pickling."""
+        self.assertIs(make_distribution("{10-20}"),
+                      make_distribution("{10-20}"))
+        self.assertIs(pickle.loads(pickle.dumps(ZERO)), ZERO)
+
+
+if __name__ == '__main__':
+    unittest.main()
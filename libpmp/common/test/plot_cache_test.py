@@ -0,0 +1,73 @@
+#! /usr/bin/env python3
+
+"""Tests for `plot_cache`."""
+
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from libpmp.common.plot_cache import PlotCache, fingerprint
+from libpmp.common.plot_pool import render_svgs
+
+DRAWN = []  # Data drawn by `_plotter`, in order.
+
+
+def _plotter(data, axes):
+    """A plotter that records what it draws."""
+    DRAWN.append(data)
+    axes.plot(data["xs"], data["ys"])
+
+
+class PlotCacheTest(unittest.TestCase):
+    """Tests for `plot_cache`."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        del DRAWN[:]
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    @staticmethod
+    def _job(top):
+        return (_plotter, {"xs": numpy.array([0., 1.]), "ys": [0, top]})
+
+    def test_fingerprint(self):
+        """Equal jobs share a fingerprint; other data or backends do not."""
+        self.assertEqual(fingerprint(self._job(1), "svg"),
+                         fingerprint(self._job(1), "svg"))
+        self.assertNotEqual(fingerprint(self._job(1), "svg"),
+                            fingerprint(self._job(2), "svg"))
+        self.assertNotEqual(fingerprint(self._job(1), "svg"),
+                            fingerprint(self._job(1), "matplotlib"))
+
+    def test_render_cached(self):
+        """Only plots not already in the cache are drawn."""
+        cache = PlotCache(self.tempdir.name)
+        first = list(render_svgs([self._job(1), self._job(2)], cache=cache))
+        self.assertEqual(len(DRAWN), 2)
+        second = list(render_svgs([self._job(2), self._job(3), self._job(1)],
+                                  cache=cache))
+        self.assertEqual(len(DRAWN), 3)
+        self.assertEqual(DRAWN[-1]["ys"], [0, 3])
+        self.assertEqual(second[0], first[1])
+        self.assertEqual(second[2], first[0])
+
+    def test_evict(self):
+        """The least recently used plots are evicted first."""
+        cache = PlotCache(self.tempdir.name, max_entries=2)
+        for (mtime, key) in enumerate(["a", "b", "c"]):
+            cache.put(key, "<svg>%s</svg>" % key)
+            os.utime(os.path.join(self.tempdir.name, key + ".svg"),
+                     (mtime, mtime))
+        os.utime(os.path.join(self.tempdir.name, "a.svg"), (10, 10))
+        cache.evict()
+        self.assertEqual(cache.get("a"), "<svg>a</svg>")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "<svg>c</svg>")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+#! /usr/bin/env python3
+
+"""Tests for `plot_pool`."""
+
+import unittest
+from unittest import mock
+
+from libpmp.common import plot_pool
+from libpmp.common.plot_pool import BACKENDS, render_svg, render_svgs
+from libpmp.model.from_markdown import from_markdown
+from libpmp.model.node_plot import cdf_job
+
+
+class PlotPoolTest(unittest.TestCase):
+    """Tests for `plot_pool`."""
+
+    def setUp(self):
+        model = from_markdown("# Short\n* A {1-2}\n# Long\n* B {100-200}\n")
+        self.jobs = [cdf_job(node, None) for node in model.children]
+
+    def test_render_svg(self):
+        """A job renders to a complete svg document with either backend."""
+        for backend in BACKENDS:
+            svg = render_svg(self.jobs[0], backend)
+            self.assertIn("<svg", svg)
+            self.assertTrue(svg.rstrip().endswith("</svg>"))
+
+    def test_render_svgs_order(self):
+        """Jobs rendered in worker processes come back in order, and the
+        same as if rendered here."""
+        serial = list(render_svgs(self.jobs, workers=1,
+                                  backend="matplotlib"))
+        parallel = list(render_svgs(self.jobs, workers=2,
+                                    backend="matplotlib"))
+        self.assertEqual(serial, parallel)
+        self.assertNotEqual(parallel[0], parallel[1])
+
+    def test_render_without_metadata(self):
+        """Matplotlib releases without the svg `metadata` option are not
+        passed it."""
+        with mock.patch.object(plot_pool, "_matplotlib_version",
+                               return_value=(2, 0)), \
+                mock.patch("matplotlib.figure.Figure.savefig",
+                           autospec=True) as savefig:
+            render_svg(self.jobs[0], "matplotlib")
+        self.assertNotIn("metadata", savefig.call_args[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+#! /usr/bin/env python3
+
+"""Tests for `profiling`."""
+
+import unittest
+
+from libpmp.common import profiling
+from libpmp.model import node
+from libpmp.model.from_markdown import from_markdown
+
+
+class ProfilingTest(unittest.TestCase):
+    """Tests for `profiling`."""
+
+    MODEL_MD = """\
+# Plan
+* Design {1-20}
+* Build {10-200}
+* Test {0-50}
+"""
+
+    def setUp(self):
+        node._SHARED_COSTS.clear()
+        profiling.reset()
+
+    def tearDown(self):
+        profiling.enable(False)
+        profiling.reset()
+
+    def test_disabled(self):
+        """Nothing is recorded unless profiling is enabled."""
+        from_markdown(self.MODEL_MD).final_cost()
+        self.assertEqual(profiling.counters(), {})
+        self.assertEqual(profiling.chrome_trace()["traceEvents"], [])
+
+    def test_costing(self):
+        """Costing records the time and memo use of each node, and spans of
+        the operations."""
+        profiling.enable()
+        model = from_markdown(self.MODEL_MD)
+        model.final_cost()
+        model.final_cost()
+        counters = profiling.counters()
+        self.assertEqual(counters["fit.calls"], 3)
+        self.assertEqual(counters["fit_numerically.calls"], 1)
+        self.assertEqual(counters["dist_add.calls"], 2)
+        self.assertEqual(counters["cost.misses"], 5)
+        self.assertEqual(counters["cost.hits"], 1)
+        plan = profiling.node_stats(model.children[0])
+        self.assertEqual(plan["misses"], 1)
+        self.assertGreater(plan["grid"], 100)
+        self.assertGreaterEqual(
+            plan["seconds"],
+            profiling.node_stats(model.children[0].children[0])["seconds"])
+
+    def test_chrome_trace(self):
+        """Spans become complete events of the trace."""
+        profiling.enable()
+        with profiling.span("outer", size=3) as span:
+            span.args["extra"] = True
+            profiling.count("things", 2)
+        trace = profiling.chrome_trace()
+        (event,) = trace["traceEvents"]
+        self.assertEqual(event["name"], "outer")
+        self.assertEqual(event["ph"], "X")
+        self.assertEqual(event["args"], {"size": 3, "extra": True})
+        self.assertGreaterEqual(event["dur"], 0)
+        self.assertEqual(trace["otherData"]["counters"]["things"], 2)
+        self.assertEqual(trace["otherData"]["counters"]["outer.calls"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+#! /usr/bin/env python3
+
+"""Tests for `server`."""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from libpmp import server
+
+
+def _fields(node):
+    """@return the public attributes of @p node."""
+    return {name: value for (name, value) in vars(node).items()
+            if not name.startswith("_")}
+
+
+class ServerTest(unittest.TestCase):
+    """Tests for `server`."""
+
+    MODEL_MD = """\
+# Plan
+* Design {10-20}
+* Build {100-200}
+"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "plan.md")
+        self._write(self.MODEL_MD)
+        self.service = server.CostService(
+            [self.path], argparse.Namespace(levels=2, jobs=1))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write(self, text):
+        with open(self.path, "w") as model_file:
+            model_file.write(text)
+
+    def test_quantiles(self):
+        """Quantiles are those of the named node."""
+        result = self.service.quantiles_query({"node": "Plan/Build",
+                                               "q": "0.1,0.75"})
+        self.assertAlmostEqual(result["quantiles"]["0.1"], 100, delta=0.1)
+        self.assertAlmostEqual(result["quantiles"]["0.75"], 200, delta=0.1)
+        with self.assertRaises(KeyError):
+            self.service.quantiles_query({"node": "Plan/Nothing"})
+        with self.assertRaises(ValueError):
+            self.service.quantiles_query({"q": "2"})
+
+    def test_reload(self):
+        """Models are parsed again when their files change."""
+        before = self.service.quantiles_query({"q": "0.5"})
+        self._write(self.MODEL_MD.replace("{100-200}", "{200-400}"))
+        os.utime(self.path, ns=(0, 0))  # A change even within the mtime tick.
+        after = self.service.quantiles_query({"q": "0.5"})
+        self.assertGreater(after["quantiles"]["0.5"],
+                           before["quantiles"]["0.5"] + 100)
+
+    def test_cdf_and_report(self):
+        """CDFs are sampled, and reports are rendered to text."""
+        result = self.service.cdf_query({"node": "Plan", "points": "5"})
+        self.assertEqual(len(result["cdf"]), 5)
+        self.assertEqual(result["cdf"][0], 0)
+        result = self.service.report_query({"report": "export",
+                                            "export_format": "csv"})
+        self.assertIn("Plan/Design", result["output"])
+        with self.assertRaises(ValueError):
+            self.service.report_query({"report": "display_cdf"})
+
+    def test_repeated_report(self):
+        """Serving a report again on an unchanged model gives the same
+        output, with the plots of nested headings not added twice."""
+        self._write(self.MODEL_MD + "\n> ## Quoted\n> * Review {1-2}\n")
+        query = {"report": "enhanced_html"}
+        first = self.service.report_query(query)["output"]
+        self.assertEqual(first.count("<svg"), 2)
+        self.assertEqual(self.service.report_query(query)["output"], first)
+
+    def test_what_if(self):
+        """What-if queries cost a changed copy, leaving the model alone."""
+        actual = self.service.quantiles_query({"q": "0.5"})
+        model = self.service.models[self.path]
+        before = {path: (node.parent, list(node.children), _fields(node))
+                  for (path, node) in model.nodes.items()}
+        result = self.service.what_if_query({
+            "overrides": {"Plan/Build": "{1-2}"}, "q": "0.5"})
+        self.assertEqual(result["actual"], actual["quantiles"])
+        self.assertLess(result["whatif"]["0.5"], 30)
+        self.assertEqual(self.service.quantiles_query({"q": "0.5"}), actual)
+        result = self.service.what_if_query({
+            "node": "Plan", "estimate": "{5}", "of": "Plan", "q": "0.5"})
+        self.assertAlmostEqual(result["whatif"]["0.5"], 5, delta=1)
+        with self.assertRaises(ValueError):
+            self.service.what_if_query({"node": "Plan", "estimate": "{x}"})
+        for (path, node) in model.nodes.items():
+            (parent, children, attributes) = before[path]
+            self.assertIs(node.parent, parent)
+            self.assertEqual(node.children, children)
+            self.assertEqual(_fields(node), attributes)
+        model.root.check_valid()
+
+    def test_http(self):
+        """The server answers queries over HTTP, in JSON."""
+        http_server = server.make_server(self.service, port=0)
+        thread = threading.Thread(target=http_server.serve_forever)
+        thread.start()
+        base = "http://%s:%d" % http_server.server_address[:2]
+        try:
+            with urllib.request.urlopen(base + "/quantiles?q=0.5") as reply:
+                self.assertIn("0.5", json.load(reply)["quantiles"])
+            request = urllib.request.Request(
+                base + "/whatif", method="POST", data=json.dumps({
+                    "overrides": {"Plan/Design": "{1-2}"}}).encode("utf-8"))
+            with urllib.request.urlopen(request) as reply:
+                self.assertIn("whatif", json.load(reply))
+            with self.assertRaises(urllib.error.HTTPError) as raised:
+                urllib.request.urlopen(base + "/quantiles?node=Nothing")
+            self.assertEqual(raised.exception.code, 404)
+            raised.exception.close()
+            for body in ({"q": [0.5]}, {"node": {}},
+                         {"overrides": {"Plan/Design": [1, 2]}}):
+                request = urllib.request.Request(
+                    base + "/whatif", method="POST", data=json.dumps(
+                        dict({"node": "Plan", "estimate": "{1}"},
+                             **body)).encode("utf-8"))
+                with self.assertRaises(urllib.error.HTTPError) as raised:
+                    urllib.request.urlopen(request)
+                self.assertEqual(raised.exception.code, 400)
+                raised.exception.close()
+            request = urllib.request.Request(
+                base + "/quantiles", method="POST",
+                data=json.dumps({"q": 0.5}).encode("utf-8"))
+            with urllib.request.urlopen(request) as reply:
+                self.assertIn("0.5", json.load(reply)["quantiles"])
+        finally:
+            http_server.shutdown()
+            http_server.server_close()
+            thread.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#! /usr/bin/env python3
+
+"""Guards the startup cost of the command line tools:  the heavy libraries
+must be imported only by the reports and estimates that need them, and
+`cost --help` must be quick."""
+
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+import unittest
+
+HEAVY_MODULES = ("matplotlib", "scipy", "commonmark")
+
+# Limit on the wall time of `cost --help`, in seconds.  Generous, so as not
+# to fail on a slow or busy machine:  it takes about 0.25s, but was about 3s
+# when the heavy libraries were imported up front.
+HELP_TIME_LIMIT = 2
+
+# Runs of `cost --help` timed, of which the fastest is compared with the
+# limit, as the least disturbed by whatever else the machine was doing.
+HELP_RUNS = 3
+
+# Modules needing a later Python than the package does, which only the
+# commands that need them may import.
+RECENT_MODULES = ("libpmp.distributions.buffers",)
+
+
+def _imported_heavy_modules(code, modules=HEAVY_MODULES):
+    """@return the @p modules (by default `HEAVY_MODULES`) imported after
+    running @p code in a fresh interpreter."""
+    script = textwrap.dedent(code) + textwrap.dedent("""
+        import sys
+        print("\\n" + " ".join(module for module in %r
+                                if module in sys.modules))
+        """ % (modules,))
+    output = subprocess.run([sys.executable, "-c", script], check=True,
+                            stdout=subprocess.PIPE).stdout.decode("utf-8")
+    return set(output.split("\n")[-2].split())  # The last line printed.
+
+
+class StartupTest(unittest.TestCase):
+    """Tests of what the command line tools import."""
+
+    def test_import_cost(self):
+        """Importing `cost` imports none of the heavy libraries."""
+        self.assertEqual(_imported_heavy_modules("import libpmp.cost"), set())
+        self.assertEqual(_imported_heavy_modules("import libpmp.cost",
+                                                 RECENT_MODULES), set())
+
+    def test_batch_without_buffers(self):
+        """Batch mode without shared buffers imports none of the modules
+        needing a later Python."""
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, "model.md")
+            with open(path, "w") as model_file:
+                model_file.write("# Plan\n* Design {1-2}\n")
+            imported = _imported_heavy_modules("""
+                import sys
+                import libpmp.cost
+                sys.argv = ["cost", "--batch", "--portfolio", "--buffers",
+                            "pickle", "--jobs", "1", %r]
+                libpmp.cost.main()
+                """ % path, RECENT_MODULES)
+        self.assertEqual(imported, set())
+
+    def test_help_time(self):
+        """`cost --help` starts, and finishes, quickly."""
+        best = float("inf")
+        for _ in range(HELP_RUNS):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-m", "libpmp.cost", "--help"],
+                           check=True, stdout=subprocess.DEVNULL)
+            best = min(best, time.perf_counter() - start)
+        self.assertLess(best, HELP_TIME_LIMIT)
+
+    def test_import_progress(self):
+        """Importing `progress` imports neither plotting nor scipy."""
+        self.assertEqual(_imported_heavy_modules("import libpmp.progress"),
+                         {"commonmark"})
+
+    def test_structure_dump(self):
+        """A simple report on a simple model needs only the markdown
+        parser."""
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, "model.md")
+            with open(path, "w") as model_file:
+                model_file.write("# Plan\n* Design {1-2}\n* Build {5-10}\n")
+            imported = _imported_heavy_modules("""
+                import sys
+                import libpmp.cost
+                sys.argv = ["cost", "--report", "structure_dump", %r]
+                libpmp.cost.main()
+                """ % path)
+        self.assertEqual(imported, {"commonmark"})
+
+
+if __name__ == '__main__':
+    unittest.main()
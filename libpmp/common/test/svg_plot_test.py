@@ -0,0 +1,58 @@
+#! /usr/bin/env python3
+
+"""Tests for `svg_plot`."""
+
+import datetime
+import unittest
+from xml.etree import ElementTree
+
+from libpmp.common import svg_plot
+from libpmp.common.svg_plot import SvgAxes, nice_ticks
+
+
+class SvgPlotTest(unittest.TestCase):
+    """Tests for `svg_plot`."""
+
+    def test_nice_ticks(self):
+        """Ticks are round numbers within the range."""
+        self.assertEqual(nice_ticks(0, 1), [0, 0.2, 0.4, 0.6, 0.8, 1])
+        self.assertEqual(nice_ticks(0, 130), [0, 25, 50, 75, 100, 125])
+        self.assertEqual(nice_ticks(3, 3), [3])
+
+    def test_path(self):
+        """Path data is compact:  duplicates and the middles of straight
+        runs are dropped."""
+        path = svg_plot._path([0, 1, 2, 3, 3, 3.04, 4], [5, 5, 5, 5, 6, 6, 9])
+        self.assertEqual(path, "M0 5 3 5 3 6 4 9")
+
+    def test_to_svg(self):
+        """A plot is well-formed svg, with its labels and hatching."""
+        axes = SvgAxes()
+        axes.set_title("Costs <& such>")
+        axes.set_xlabel("Cost")
+        axes.plot([0, 1, 2], [0, 0.5, 1], '-', color="red")
+        axes.fill_between([0, 1, 2], [1, 1, 1], [0, 0.5, 1], hatch="/",
+                          edgecolor="red", facecolor="white")
+        axes.legend(["Only"])
+        svg = axes.to_svg()
+        root = ElementTree.fromstring(svg)
+        texts = [element.text for element in root.iter()
+                 if element.tag.endswith("text")]
+        self.assertIn("Costs <& such>", texts)
+        self.assertIn("Only", texts)
+        self.assertIn('fill="url(#libpmp-hatch-fwd-red)"', svg)
+
+    def test_dates(self):
+        """Datetime x values get date tick labels."""
+        axes = SvgAxes()
+        dates = [datetime.datetime(2020, 1, day, tzinfo=datetime.timezone.utc)
+                 for day in (1, 15, 29)]
+        axes.set_xlim(left=dates[0], right=dates[-1])
+        axes.plot(dates, [3, 2, 1], color="black")
+        svg = axes.to_svg()
+        self.assertIn(">2020-01-01<", svg)
+        self.assertIn(">2020-01-29<", svg)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#! /usr/bin/env python3
+
+"""Tests for `watch`."""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from libpmp.common.watch import redirected_output, watch_files
+
+
+class WatchTest(unittest.TestCase):
+    """Tests for `watch`."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, "model.md")
+        with open(self.path, "w") as model_file:
+            model_file.write("* Item {1-2}\n")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_watch_files(self):
+        """The callback runs at once and again after the file changes."""
+        calls = []
+
+        def edit():
+            time.sleep(0.1)
+            with open(self.path, "a") as model_file:
+                model_file.write("* Another item {3-4}\n")
+
+        editor = threading.Thread(target=edit)
+        editor.start()
+        watch_files([self.path], calls.append, interval=0.01, max_calls=2)
+        editor.join()
+        self.assertEqual(calls, [[self.path], [self.path]])
+
+    def test_callback_errors(self):
+        """An exception in the callback does not end the watch."""
+        calls = []
+
+        def callback(changed):
+            calls.append(changed)
+            raise RuntimeError("half-saved input")
+
+        watch_files([self.path], callback, max_calls=1)
+        self.assertEqual(len(calls), 1)
+
+    def test_redirected_output(self):
+        """Output is written to the file only on completion."""
+        output_path = os.path.join(self.tempdir.name, "report.txt")
+        with redirected_output(output_path):
+            print("partial")
+            self.assertFalse(os.path.exists(output_path))
+        with open(output_path) as output_file:
+            self.assertEqual(output_file.read(), "partial\n")
+        self.assertEqual(sorted(os.listdir(self.tempdir.name)),
+                         ["model.md", "report.txt"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""Utilities for the `--watch` modes of the command line tools, which keep
+models in memory and regenerate a report whenever their inputs change."""
+
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+# Default seconds between polls of the watched files.
+POLL_INTERVAL = 0.2
+
+
+def file_state(path):
+    """@return something that changes whenever the file at @p path does."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def watch_files(paths, callback, interval=POLL_INTERVAL, max_calls=None):
+    """Call `callback(changed_paths)` once with all of @p paths, then again
+    with the changed subset whenever any of them changes, polling every
+    @p interval seconds.  Runs until interrupted, or until @p callback has
+    been called @p max_calls times; an interrupt (^C) returns quietly.
+
+    An exception from @p callback is reported on stderr rather than ending
+    the watch, since a half-saved input is a normal occurrence."""
+    states = {path: file_state(path) for path in paths}
+    changed = list(paths)
+    calls = 0
+    while True:
+        try:
+            callback(changed)
+        except Exception as error:  # pylint: disable = broad-except
+            print("%s: %s" % (type(error).__name__, error), file=sys.stderr)
+        calls += 1
+        if max_calls is not None and calls >= max_calls:
+            return
+        changed = []
+        try:
+            while not changed:
+                time.sleep(interval)
+                for path in paths:
+                    state = file_state(path)
+                    if state != states[path]:
+                        states[path] = state
+                        changed.append(path)
+        except KeyboardInterrupt:
+            return
+
+
+@contextlib.contextmanager
+def redirected_output(path):
+    """Context manager that sends stdout to the file at @p path, replacing
+    it only once the output is complete so that readers never see a
+    partial report.  If @p path is None, stdout is left alone."""
+    if path is None:
+        yield
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    (handle, temp_path) = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "w") as temp_file:
+            with contextlib.redirect_stdout(temp_file):
+                yield
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp_path, 0o666 & ~umask)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
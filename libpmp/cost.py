@@ -4,44 +4,168 @@
 much effort or cost would be involved."""
 
 import argparse
+import importlib
+import sys
 
-import libpmp.report.display_cdf
-import libpmp.report.enhanced_html
-import libpmp.report.parser_debug
-import libpmp.report.structure_dump
-from libpmp.model.from_html import from_html
-from libpmp.model.from_markdown import from_markdown
+from libpmp.common import profiling
+from libpmp.common.plot_pool import BACKENDS, DEFAULT_BACKEND
+from libpmp.common.watch import POLL_INTERVAL, redirected_output, watch_files
+from libpmp.model.engines import (
+    add_engine_arguments,
+    engine_from_args,
+    set_default_engine,
+)
+from libpmp.report.export import DEFAULT_QUANTILES, FORMATS, parse_quantiles
+
+# Map of {report name: module}.  Each module has a `report(root, args)`
+# function.  Modules are imported only when their report is run, since some
+# (eg, those that plot) import much more than a simple report needs.
+REPORTS = {
+    'structure_dump': 'libpmp.report.structure_dump',
+    'display_cdf': 'libpmp.report.display_cdf',
+    'parser_debug': 'libpmp.report.parser_debug',
+    'enhanced_html': 'libpmp.report.enhanced_html',
+    'export': 'libpmp.report.export',
+    'profile': 'libpmp.report.profile',
+}
+
+
+def get_report(name):
+    """@return the `report` function of the report @p name."""
+    return importlib.import_module(REPORTS[name]).report
+
+
+def load_model(path, markdown_parser=None):
+    """Read and parse the model at @p path.  Markdown is parsed with
+    @p markdown_parser (an `IncrementalParser`) if one is given."""
+    # Import only the parser needed.
+    # pylint: disable = import-outside-toplevel
+    with open(path) as input_file:
+        data = input_file.read()
+    if path.endswith('.html'):
+        from libpmp.model.from_html import from_html
+        return from_html(data)
+    if markdown_parser is not None:
+        return markdown_parser.parse(data)
+    from libpmp.model.from_markdown import from_markdown
+    return from_markdown(data)
+
+
+def _check_args(parser, args):
+    """Exit with an error from @p parser unless its parsed @p args are
+    consistent."""
+    if args.report not in REPORTS:
+        parser.error("Unrecognized report: %s" % args.report)
+    if args.batch and args.watch:
+        parser.error("--batch and --watch cannot be combined")
+    if args.portfolio and not args.batch:
+        parser.error("--portfolio requires --batch")
+    if not args.batch and len(args.input) != 1:
+        parser.error("Only one input may be given without --batch")
 
 
 def main():
     """Parse command line args, load estimates, and dispatch appropriate
-    report."""
+    report.  `cost serve ...` instead starts a server (see `server`)."""
+    if sys.argv[1:2] == ['serve']:
+        # pylint: disable = import-outside-toplevel
+        from libpmp.server import main as serve
+        serve(sys.argv[2:])
+        return
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument('--levels', type=int,
                         help='maximum levels to show', default=2)
     parser.add_argument('--report', type=str, default="structure_dump",
                         help='Report to run.')
-    parser.add_argument('input')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='number of parallel plot rendering workers '
+                             '(default: one per cpu)')
+    parser.add_argument('--plot-backend', choices=BACKENDS,
+                        default=DEFAULT_BACKEND,
+                        help='draw plots with our own lightweight svg '
+                             'writer, or with matplotlib (slower, in xkcd '
+                             'style)')
+    parser.add_argument('--plot-cache', type=str, default=None,
+                        metavar='DIR',
+                        help='keep rendered plots in DIR, and reuse them '
+                             'for plots whose data is unchanged')
+    parser.add_argument('--export-format', choices=FORMATS, default='jsonl',
+                        help='format of the export report')
+    parser.add_argument('--quantiles', type=parse_quantiles,
+                        default=DEFAULT_QUANTILES,
+                        help='comma-separated quantiles for the export '
+                             'report, eg 0.1,0.5,0.9')
+    add_engine_arguments(parser)
+    parser.add_argument('--profile-top', type=int, default=None,
+                        metavar='N',
+                        help='nodes listed by the profile report')
+    parser.add_argument('--profile-out', type=str, default=None,
+                        metavar='FILE',
+                        help='profile the run, and write a Chrome '
+                             'trace-event JSON of it to FILE')
+    parser.add_argument('--output', type=str, default=None,
+                        help='write the report to this file, not stdout')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running, regenerating the report '
+                             'whenever the input changes')
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL,
+                        help='seconds between checks of the input in '
+                             '--watch mode')
+    parser.add_argument('--batch', action='store_true',
+                        help='cost every input (paths, glob patterns, or '
+                             '@manifest files; see `batch`) and write '
+                             'their quantiles as JSON lines, not a report')
+    parser.add_argument('--portfolio', action='store_true',
+                        help='in --batch mode, also write the quantiles of '
+                             'the total of all the inputs')
+    # `buffers.BUFFER_KINDS`, spelled out since `buffers` needs the shared
+    # memory of Python 3.8, and is imported only in --batch mode.
+    parser.add_argument('--buffers', choices=('shm', 'file', 'pickle'),
+                        default='shm',
+                        help='in --batch --portfolio mode, how workers hand '
+                             'back costs:  in shared memory, in mapped '
+                             'temporary files, or pickled')
+    parser.add_argument('input', nargs='+')
 
     args = parser.parse_args()
 
-    data = open(args.input).read()
-    if args.input.endswith('.html'):
-        root = from_html(data)
-    else:
-        root = from_markdown(data)
-
-    if args.report == 'structure_dump':
-        libpmp.report.structure_dump.report(root, args)
-    elif args.report == 'display_cdf':
-        libpmp.report.display_cdf.report(root, args)
-    elif args.report == 'parser_debug':
-        libpmp.report.parser_debug.report(root, args)
-    elif args.report == 'enhanced_html':
-        assert hasattr(root, "ast")  # Require the CommonMark AST.
-        libpmp.report.enhanced_html.report(root, args)
+    _check_args(parser, args)
+    set_default_engine(engine_from_args(args))
+    if args.batch:
+        # pylint: disable = import-outside-toplevel
+        from libpmp.batch import run_batch
+        with redirected_output(args.output):
+            try:
+                run_batch(args.input, args, engine_from_args(args))
+            except (OSError, ValueError) as error:
+                parser.error(str(error))
+        return
+    args.input = args.input[0]
+    report = get_report(args.report)
+    markdown_parser = None
+    if args.watch:
+        # pylint: disable = import-outside-toplevel
+        from libpmp.model.incremental_markdown import IncrementalParser
+        markdown_parser = IncrementalParser()
+
+    profiling.enable(args.report == 'profile' or args.profile_out is not None)
+
+    def run(_=None):
+        profiling.reset()
+        with profiling.span("parse", path=args.input):
+            root = load_model(args.input, markdown_parser)
+        if args.report == 'enhanced_html':
+            assert hasattr(root, "ast")  # Require the CommonMark AST.
+        with redirected_output(args.output), profiling.span(
+                "report", report=args.report):
+            report(root, args)
+        if args.profile_out is not None:
+            profiling.write_chrome_trace(args.profile_out)
+
+    if args.watch:
+        watch_files([args.input], run, interval=args.poll_interval)
     else:
-        parser.error("Unrecognized report: %d" % args.report)
+        run()
 
 if __name__ == '__main__':
     main()
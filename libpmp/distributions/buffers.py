@@ -0,0 +1,138 @@
+"""Buffers holding the values of `NumericDistribution`s that other processes
+can map, so that worker processes can hand back large discretized costs by a
+small `NumericHandle` rather than by pickling every value.
+
+Two kinds of buffer are supported:
+ * "shm", blocks of `multiprocessing.shared_memory`;
+ * "file", raw files of values in a directory, which are mapped with
+   `numpy.memmap`.
+
+Values keep their precision (see `NumericDistribution.with_precision`).
+
+A worker calls `share` to copy a distribution into a new buffer and get its
+handle.  The buffer then belongs to nobody until a `BufferStore` `attach`es
+the handle, giving a distribution over the mapped buffer (without copying
+it); the store removes the buffers it attached when closed.  Every handle
+must be attached by exactly one store, or else `release`d, or its buffer
+outlives the run.
+"""
+
+import os
+import shutil
+import tempfile
+import uuid
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy
+
+from libpmp.distributions.numeric import NumericDistribution
+
+BUFFER_KINDS = ("shm", "file")
+
+DEFAULT_KIND = "shm"
+
+NumericHandle = namedtuple(
+    "NumericHandle", [
+        "kind",    # one of `BUFFER_KINDS`
+        "name",    # the name of the shared memory block, or the file path
+        "offset",  # the offset of the distribution
+        "length",  # the number of values
+        "dtype",   # the name of the precision of the values
+    ])
+
+
+def share(distribution, kind=DEFAULT_KIND, directory=None):
+    """Copy the values of @p distribution into a new buffer of @p kind (for
+    "file" buffers, a file in @p directory).  @return its `NumericHandle`.
+    Distributions other than `NumericDistribution`s are small, and are
+    returned unchanged."""
+    if not isinstance(distribution, NumericDistribution):
+        return distribution
+    values = distribution.values
+    if kind == "shm":
+        block = shared_memory.SharedMemory(create=True,
+                                           size=max(values.nbytes, 1))
+        # The block outlives this process; whoever attaches it unlinks it.
+        # pylint: disable = protected-access
+        resource_tracker.unregister(block._name, "shared_memory")
+        mapped = numpy.ndarray(values.shape, dtype=values.dtype,
+                               buffer=block.buf)
+        mapped[:] = values
+        del mapped  # Release the view, so that the block can be closed.
+        block.close()
+        name = block.name
+    elif kind == "file":
+        assert directory is not None, "File buffers need a directory"
+        name = os.path.join(directory, uuid.uuid4().hex)
+        values.tofile(name)
+    else:
+        raise ValueError("Unknown buffer kind %s" % kind)
+    return NumericHandle(kind, name, distribution.offset, len(values),
+                         values.dtype.name)
+
+
+def release(handle):
+    """Remove the buffer of @p handle, as returned by `share`, without
+    attaching it."""
+    if not isinstance(handle, NumericHandle):
+        return
+    if handle.kind == "shm":
+        block = shared_memory.SharedMemory(name=handle.name)
+        block.close()
+        block.unlink()
+    else:
+        os.remove(handle.name)
+
+
+class BufferStore:
+    """Attaches buffers made by `share`, and removes them when closed.  Also
+    usable as a context manager that closes it on exit."""
+
+    def __init__(self, kind=DEFAULT_KIND):
+        """@p kind is the kind of buffer (one of `BUFFER_KINDS`) that
+        workers should `share` into; for "file", this makes a temporary
+        `directory` for them."""
+        if kind not in BUFFER_KINDS:
+            raise ValueError("Unknown buffer kind %s" % kind)
+        self.kind = kind
+        self.directory = (tempfile.mkdtemp(prefix="libpmp-buffers-")
+                          if kind == "file" else None)
+        self._blocks = []  # Shared memory blocks attached.
+
+    def attach(self, handle):
+        """@return the distribution of @p handle, a `NumericHandle` or a
+        distribution returned unchanged by `share`.  The distribution maps
+        the buffer read-only, and stays valid after this store is closed."""
+        if not isinstance(handle, NumericHandle):
+            return handle
+        if handle.kind == "file":
+            return NumericDistribution(
+                numpy.memmap(handle.name, dtype=handle.dtype, mode="r",
+                             shape=(handle.length,)), handle.offset)
+        block = shared_memory.SharedMemory(name=handle.name)
+        self._blocks.append(block)
+        values = numpy.ndarray((handle.length,), dtype=handle.dtype,
+                               buffer=block.buf)
+        values.flags.writeable = False
+        return NumericDistribution(values, handle.offset, owner=block)
+
+    def release(self, handle):
+        """Remove the buffer of @p handle without attaching it."""
+        release(handle)
+
+    def close(self):
+        """Remove every buffer attached.  Their distributions' mappings are
+        unmapped once those distributions are freed."""
+        for block in self._blocks:
+            block.unlink()
+        self._blocks = []
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
@@ -4,7 +4,16 @@ very basic utilities for manipulating them."""
 # This is an abstract base class; disable the corresponding pylint complaints.
 # pylint: disable = invalid-name, unused-argument, no-self-use
 
-import scipy.optimize
+import numpy
+
+from libpmp.common import profiling
+
+# Tolerances of the bisection in `Distribution.quantile`; the same as the
+# defaults of scipy.optimize.bisect, which it replaces to spare importing
+# scipy.
+_BISECT_XTOL = 2e-12
+_BISECT_RTOL = 8.881784197001252e-16
+_BISECT_MAX_ITERATIONS = 100
 
 
 class Distribution:
@@ -19,6 +28,12 @@ class Distribution:
         NOTE: CDF(x) MUST APPROACH 1 AT ITS UPPER LIMIT."""
         return NotImplementedError("Distribution classes must define cdf.")
 
+    def cdf_array(self, xs):
+        """@Returns a numpy array of `cdf(x)` for each x in @p xs.  Used to
+        sample whole curves at once (eg for plotting); subclasses whose cdf
+        can be computed on arrays should override this."""
+        return numpy.array([self.cdf(x) for x in xs], dtype=float)
+
     def pdf(self, x):
         """@Returns the point value at @p x (that is, the probability-per-hour
         measure at x).  If the distribution is approximated or discretized,
@@ -48,24 +63,62 @@ class Distribution:
         while self.cdf(end) <= p:
             end = 2 * end if end != 0 else 1
 
-        # Then do a simple bisect.
-        result = scipy.optimize.bisect(
-            lambda x: (self.cdf(x) - p),
-            start,
-            end)
-        return result
+        # Then do a simple bisect, keeping cdf(start) <= p < cdf(end).
+        iterations = 0
+        while iterations < _BISECT_MAX_ITERATIONS:
+            middle = (start + end) / 2
+            if end - start <= _BISECT_XTOL + _BISECT_RTOL * abs(middle):
+                break
+            if self.cdf(middle) <= p:
+                start = middle
+            else:
+                end = middle
+            iterations += 1
+        if profiling.ENABLED:
+            profiling.count("quantile.bisects")
+            profiling.count("quantile.bisect_iterations", iterations)
+        return (start + end) / 2
+
+    def quantiles(self, ps):
+        """@Returns a numpy array of `quantile(p)` for each p in @p ps.  Used
+        to compute many quantiles at once (eg for export); subclasses that
+        can compute quantiles on arrays should override this."""
+        return numpy.array([self.quantile(p) for p in ps], dtype=float)
 
     def contains_point_masses(self):
         """Tests may be wrong when a pdf contains a Dirac delta point.  Set
         this true if so."""
         return False
 
+    def value_key(self):
+        """@Returns a hashable tuple of the parameters that determine this
+        distribution, by which distributions of the same class are compared
+        and hashed; or None (the default) to compare by identity."""
+        return None
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if type(other) is not type(self):
+            return False
+        key = self.value_key()
+        return key is not None and key == other.value_key()
+
+    def __hash__(self):
+        key = self.value_key()
+        if key is None:
+            return object.__hash__(self)
+        return hash((type(self).__name__, key))
+
 
 class _ZeroDistribution(Distribution):
 
     def cdf(self, _):
         return 1
 
+    def cdf_array(self, xs):
+        return numpy.ones(len(xs))
+
     def pdf(self, _):
         return 0
 
@@ -75,8 +128,18 @@ class _ZeroDistribution(Distribution):
     def quantile(self, _):
         return 0
 
+    def quantiles(self, ps):
+        return numpy.zeros(len(ps))
+
     def contains_point_masses(self):
         return True
 
+    def value_key(self):
+        return ()
+
+    def __reduce__(self):
+        # Unpickle as the singleton, since it is compared by identity.
+        return "ZERO"
+
 
 ZERO = _ZeroDistribution()
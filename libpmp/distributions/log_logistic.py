@@ -3,8 +3,11 @@
 # "a" and "b" are the canonical names of the parameters of the distribution.
 # pylint: disable=invalid-name
 
-import scipy.optimize
+import math
 
+import numpy
+
+from libpmp.common import profiling
 from libpmp.distributions.distribution import Distribution
 
 
@@ -29,6 +32,17 @@ class LogLogistic(Distribution):
         self._alpha = alpha
         self._beta = beta
 
+    @property
+    def alpha(self):
+        """The scale parameter, which is also the median."""
+        return self._alpha
+
+    @property
+    def beta(self):
+        """The shape parameter; the larger, the narrower the curve.  Only
+        moments below `beta` are finite."""
+        return self._beta
+
     def pdf(self, x):
         # Use variable names 'x', 'a', and 'b' for comparability to wikipedia.
         a = self._alpha
@@ -41,6 +55,14 @@ class LogLogistic(Distribution):
     def cdf(self, x):
         return _log_logistic_cdf(x, self._alpha, self._beta)
 
+    def cdf_array(self, xs):
+        xs = numpy.asarray(xs, dtype=float)
+        result = numpy.zeros(len(xs))
+        positive = xs > 0
+        result[positive] = 1 / (
+            1 + (xs[positive] / self._alpha) ** -self._beta)
+        return result
+
     def point_on_curve(self):
         return self._alpha
 
@@ -50,6 +72,13 @@ class LogLogistic(Distribution):
         b = self._beta
         return a * (p / (1 - p)) ** (1 / b)
 
+    def quantiles(self, ps):
+        ps = numpy.asarray(ps, dtype=float)
+        return self._alpha * (ps / (1 - ps)) ** (1 / self._beta)
+
+    def value_key(self):
+        return (self._alpha, self._beta)
+
     @staticmethod
     def fit(first_quantile_p, first_quantile_x,
             second_quantile_p, second_quantile_x):
@@ -63,6 +92,33 @@ class LogLogistic(Distribution):
             "Quantile positions out of order: 0 <= %f < %f" %
             (first_quantile_x, second_quantile_x))
 
+        profiling.count("fit.calls")
+        if first_quantile_p > 0 and first_quantile_x > 0:
+            # The log of the quantile function is linear in the log-odds of
+            # p, with slope 1/beta and intercept log(alpha), so two points
+            # determine the curve exactly.
+            def log_odds(p):
+                return math.log(p / (1 - p))
+            inverse_beta = (
+                (math.log(second_quantile_x) - math.log(first_quantile_x)) /
+                (log_odds(second_quantile_p) - log_odds(first_quantile_p)))
+            alpha = math.exp(math.log(first_quantile_x) -
+                             log_odds(first_quantile_p) * inverse_beta)
+            return LogLogistic(alpha, 1 / inverse_beta)
+        with profiling.span("fit_numerically"):
+            return LogLogistic._fit_numerically(
+                first_quantile_p, first_quantile_x,
+                second_quantile_p, second_quantile_x)
+
+    @staticmethod
+    def _fit_numerically(first_quantile_p, first_quantile_x,
+                         second_quantile_p, second_quantile_x):
+        """Fit as `fit` does, but by numerical optimization.  Used for
+        estimates with a quantile at zero, which have no closed form fit."""
+        # Only needed for unusual estimates, so spare importing scipy.
+        # pylint: disable = import-outside-toplevel
+        import scipy.optimize
+
         start = [0.5 * (first_quantile_x + second_quantile_x), 1]
 
         def error(ab):
@@ -2,24 +2,43 @@
 
 import math
 
+import numpy
+
 from libpmp.distributions.distribution import Distribution
 
+# Names of the precisions in which values may be stored (see
+# `NumericDistribution.with_precision`).  Arithmetic is done in float64
+# whatever the storage.
+PRECISIONS = ("float64", "float32", "float16")
+
+DEFAULT_PRECISION = "float64"
+
 
 class NumericDistribution(Distribution):
     """Class representing a discretization of a distribution, which is
     required after certain mathematical operations (eg convolution).
 
-    The distribution consists of a list of PDF values and an offset.  It is
-    automatically scaled to the sum of those PDF values to avoid numeric
-    error."""
+    The distribution consists of an array of PDF values and an offset.  It
+    is automatically scaled to the sum of those PDF values to avoid numeric
+    error.  The values are kept in a single contiguous buffer, which may be
+    one shared with other processes (see `buffers`), and may be stored in
+    reduced precision to save memory (see `with_precision`)."""
 
-    def __init__(self, values, offset=0):
-        """@p values is a list of PDF values P[i] (automatically normalized)
-        representing the probability of an outcome between offset+i and
-        offset+i+1."""
-        self._values = values
+    def __init__(self, values, offset=0, owner=None):
+        """@p values is a sequence of PDF values P[i] (automatically
+        normalized) representing the probability of an outcome between
+        offset+i and offset+i+1.  Arrays of any of the `PRECISIONS` are
+        used without copying; if their memory belongs to some @p owner (eg a
+        shared memory block), it is kept alive as long as this
+        distribution."""
+        self._values = numpy.asarray(values)
+        if self._values.dtype.name not in PRECISIONS:
+            self._values = self._values.astype(float)
         self._offset = int(offset)
-        self._scale = 1 / sum(values)
+        self._owner = owner
+        self._hash = None  # Hash of the values, computed on demand.
+        self._scale = 1 / float(self._values.sum(dtype=float))
+        self._cumulative = None  # Cumulative sums, computed on demand.
         assert self._scale > 0, (
             "NumericDistribution(%s) had zero scale" % values)
         assert self._scale < float("inf"), (
@@ -27,6 +46,36 @@ class NumericDistribution(Distribution):
 
     BEFORE, AFTER = [-3, -2]
 
+    def num_buckets(self):
+        """@return the number of PDF values (buckets) in the distribution."""
+        return len(self._values)
+
+    @property
+    def values(self):
+        """The (unnormalized) PDF values, as an array."""
+        return self._values
+
+    @property
+    def offset(self):
+        """The lower bound of the first bucket."""
+        return self._offset
+
+    @property
+    def precision(self):
+        """The name of the precision (one of `PRECISIONS`) of the values."""
+        return self._values.dtype.name
+
+    def with_precision(self, precision):
+        """@return this distribution with its values stored in @p precision
+        (one of `PRECISIONS`):  itself if they already are.  float16 values
+        are scaled so that the greatest is 1, since its range is small."""
+        if precision == self.precision:
+            return self
+        values = self._values
+        if precision == "float16":
+            values = values / float(values.max())
+        return NumericDistribution(values.astype(precision), self._offset)
+
     def _bucket(self, x):
         if x < self._offset:
             return self.BEFORE
@@ -42,7 +91,7 @@ class NumericDistribution(Distribution):
         bucket = self._bucket(x)
         if bucket in (self.BEFORE, self.AFTER):
             return 0
-        return self._values[bucket] * self._scale
+        return float(self._values[bucket]) * self._scale
 
     def cdf(self, x):
         bucket = self._bucket(x)
@@ -51,18 +100,79 @@ class NumericDistribution(Distribution):
         elif bucket == self.AFTER:
             return 1
         point_in_bucket = x - bucket - self._offset
-        return (sum(self._values[:bucket]) +
-                (self._values[bucket] * point_in_bucket)) * self._scale
+        return (float(self._cumulative_sums()[bucket]) +
+                float(self._values[bucket]) * point_in_bucket * self._scale)
+
+    def _cumulative_sums(self):
+        """@return the normalized sums of the values before each bucket
+        boundary (so from 0 to 1), as a numpy array one longer than the
+        values.  They are summed in float64, and stored in the precision of
+        the values."""
+        if self._cumulative is None:
+            cumulative = numpy.concatenate(
+                ([0.], numpy.cumsum(self._values, dtype=float)))
+            cumulative *= self._scale
+            self._cumulative = cumulative.astype(self._values.dtype,
+                                                 copy=False)
+        return self._cumulative
+
+    def cdf_array(self, xs):
+        # `cdf` interpolates linearly between the cumulative sums at bucket
+        # boundaries, which is exactly what numpy.interp does.
+        cumulative = self._cumulative_sums()
+        positions = numpy.asarray(xs, dtype=float) - self._offset
+        return numpy.interp(positions, numpy.arange(len(cumulative)),
+                            cumulative)
 
     def point_on_curve(self):
         return self._offset + (len(self._values) / 2)
 
-    # Leave the default quantile() implementation in place because it is
-    # probably fast enough.
+    def quantile(self, p):
+        return float(self.quantiles([p])[0])
+
+    def quantiles(self, ps):
+        # Invert the piecewise linear cdf directly:  find the bucket in which
+        # the cumulative sum reaches each p, then the point within it.
+        cumulative = numpy.asarray(self._cumulative_sums(), dtype=float)
+        values = cumulative[1:] - cumulative[:-1]
+        targets = numpy.asarray(ps, dtype=float) * cumulative[-1]
+        buckets = numpy.clip(
+            numpy.searchsorted(cumulative, targets, side="left") - 1,
+            0, len(values) - 1)
+        widths = values[buckets]
+        fractions = numpy.divide(targets - cumulative[buckets], widths,
+                                 out=numpy.zeros(len(targets)),
+                                 where=widths > 0)
+        return self._offset + buckets + numpy.clip(fractions, 0, 1)
 
     def contains_point_masses(self):
         return False
 
+    def value_key(self):
+        return (self._offset, self._values.tobytes())
+
+    def __eq__(self, other):
+        # Compare the arrays directly, rather than copying their bytes.
+        if self is other:
+            return True
+        return (type(other) is type(self) and
+                self._offset == other.offset and
+                self._values.dtype == other.values.dtype and
+                numpy.array_equal(self._values, other.values))
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = super().__hash__()
+        return self._hash
+
+    def __getstate__(self):
+        # Pickle the values alone, not any shared buffer that holds them.
+        state = dict(self.__dict__)
+        state["_values"] = numpy.array(self._values)
+        state["_owner"] = None
+        state["_cumulative"] = None
+        return state
+
     def __repr__(self):
         return "NumericDistribution(offset=%d, scale=%f, %s)" % (
-            self._offset, self._scale, self._values)
+            self._offset, self._scale, self._values.tolist())
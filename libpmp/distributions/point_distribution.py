@@ -1,5 +1,7 @@
 """Discrete distribution from a set of weighted points."""
 
+import numpy
+
 from libpmp.distributions.distribution import Distribution
 
 
@@ -16,6 +18,12 @@ class PointDistribution(Distribution):
         self._probabilities = {key: value_probabilities[key] / scale
                                for key in self._values}
 
+    @property
+    def probabilities(self):
+        """A list of `(value, probability)` of each point, by value."""
+        return [(value, self._probabilities[value])
+                for value in self._values]
+
     def pdf(self, x):
         return float("inf") if x in self._probabilities else 0
 
@@ -40,5 +48,17 @@ class PointDistribution(Distribution):
                 return value
         return self._values[-1]
 
+    def quantiles(self, ps):
+        ps = numpy.asarray(ps, dtype=float)
+        # Summed in the same order as `quantile`, so as to agree with it.
+        cumulative = numpy.cumsum([self._probabilities[value]
+                                   for value in self._values])
+        indices = numpy.searchsorted(cumulative, ps, side="left")
+        return numpy.array(self._values, dtype=float)[
+            numpy.minimum(indices, len(self._values) - 1)]
+
     def contains_point_masses(self):
         return True
+
+    def value_key(self):
+        return tuple(self.probabilities)
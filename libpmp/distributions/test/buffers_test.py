@@ -0,0 +1,61 @@
+#! /usr/bin/env python3
+
+"""Tests for buffers module."""
+
+import concurrent.futures
+import os
+import unittest
+
+import numpy
+
+from libpmp.distributions import buffers
+from libpmp.distributions.numeric import NumericDistribution
+from libpmp.distributions.uniform import UniformDistribution
+
+
+def _share_triangle(target):
+    """Make a distribution and share it into the `(kind, directory)`
+    @p target, as a worker would."""
+    return buffers.share(NumericDistribution(
+        [1, 2, 3, 2, 1], offset=10).with_precision("float32"), *target)
+
+
+class BuffersTest(unittest.TestCase):
+    """Tests for buffers module."""
+
+    def test_round_trip(self):
+        """Distributions shared by another process attach unchanged."""
+        expected = NumericDistribution([1, 2, 3, 2, 1], offset=10)
+        ps = [0.1, 0.5, 0.9]
+        for kind in buffers.BUFFER_KINDS:
+            with buffers.BufferStore(kind) as store, \
+                    concurrent.futures.ProcessPoolExecutor(1) as executor:
+                handle = executor.submit(
+                    _share_triangle, (store.kind, store.directory)).result()
+                self.assertIsInstance(handle, buffers.NumericHandle)
+                dist = store.attach(handle)
+            # Still usable once the buffers are removed.
+            numpy.testing.assert_allclose(dist.quantiles(ps),
+                                          expected.quantiles(ps))
+            self.assertEqual((dist.offset, dist.precision), (10, "float32"))
+            with self.assertRaises(ValueError):
+                dist.values[0] = 0  # Mapped read-only.
+
+    def test_release(self):
+        """Released buffers are removed; small distributions are passed
+        through unshared."""
+        with buffers.BufferStore("file") as store:
+            handle = _share_triangle((store.kind, store.directory))
+            self.assertTrue(os.path.exists(handle.name))
+            store.release(handle)
+            self.assertFalse(os.path.exists(handle.name))
+            uniform = UniformDistribution(0, 1)
+            self.assertIs(buffers.share(uniform, "file", store.directory),
+                          uniform)
+            self.assertIs(store.attach(uniform), uniform)
+        with self.assertRaises(ValueError):
+            buffers.BufferStore("tape")
+
+
+if __name__ == '__main__':
+    unittest.main()
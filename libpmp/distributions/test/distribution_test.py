@@ -21,6 +21,7 @@ DISTRIBUTIONS_TO_TEST = [[dut] for dut in (
     LogLogistic(10, 1),
     LogLogistic(10, 2),
     PointDistribution({2: 1}),
+    PointDistribution({1: 1, 3: 2, 8: 1}),
     UniformDistribution(0, 3),
     UniformDistribution(1, 1.4),
     NumericDistribution([1, 4, 6, 4, 1], offset=500),
@@ -75,6 +76,29 @@ class DistributionRulesTest(unittest.TestCase):
             dp = dut.cdf(t + dt) - dut.cdf(t)
             self.assertAlmostEqual(dpdt, dp / dt, delta=0.001)
 
+    @parameterized.expand(DISTRIBUTIONS_TO_TEST)
+    def test_cdf_array(self, dut):
+        """`cdf_array()` agrees with `cdf()`."""
+        xs = [-1, 0, 0.5, 1, 2.25, 3, 10, 99.9, 500.5, 503, 1e6]
+        for (x, y) in zip(xs, dut.cdf_array(xs)):
+            self.assertAlmostEqual(dut.cdf(x), y, msg="at x=%f" % x)
+
+    @parameterized.expand(DISTRIBUTIONS_TO_TEST)
+    def test_quantiles(self, dut):
+        """`quantiles()` agrees with `quantile()`."""
+        ps = [0.01, 0.1, 0.2, 0.5, 0.8, 0.9, 0.99]
+        for (p, x) in zip(ps, dut.quantiles(ps)):
+            self.assertAlmostEqual(dut.quantile(p), x, msg="at p=%f" % p)
+
+    def test_point_quantiles_at_steps(self):
+        """`quantiles()` of points agrees with `quantile()` where the CDF
+        steps, and at either end."""
+        dut = PointDistribution({1: 1, 3: 2, 8: 1})
+        ps = [0, 0.25, 0.5, 0.75, 1]
+        self.assertEqual(list(dut.quantiles(ps)),
+                         [dut.quantile(p) for p in ps])
+        self.assertEqual(list(dut.quantiles(ps)), [1, 1, 3, 3, 8])
+
     @parameterized.expand(DISTRIBUTIONS_TO_TEST)
     def test_quantile(self, dut):
         """`quantile()` and `cdf()` are approximate inverses."""
@@ -102,6 +126,15 @@ class FitTest(unittest.TestCase):
         self.assertAlmostEqual(dist.quantile(0.1), ten, delta=1)
         self.assertAlmostEqual(dist.quantile(0.75), seventyfive, delta=1)
 
+    def test_fit_zero_quantile(self):
+        """A quantile of zero, which no log-logistic curve has, is fitted
+        numerically and approximately."""
+        dist = LogLogistic.fit(0.1, 0, 0.75, 10)
+        # The optimizer matches the other quantile, and lands about 1.14
+        # above zero.
+        self.assertAlmostEqual(dist.quantile(0.1), 0, delta=1.5)
+        self.assertAlmostEqual(dist.quantile(0.75), 10, delta=1)
+
 
 if __name__ == "__main__":
     unittest.main()
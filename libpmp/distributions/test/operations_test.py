@@ -10,6 +10,7 @@ import unittest
 import libpmp.distributions.operations as op
 from libpmp.distributions.log_logistic import LogLogistic
 from libpmp.distributions.numeric import NumericDistribution
+from libpmp.distributions.point_distribution import PointDistribution
 from libpmp.distributions.uniform import UniformDistribution
 
 
@@ -40,6 +41,30 @@ class DistributionRulesTest(unittest.TestCase):
                                 [0, 0.125, 0.5, 0.875, 1, 1],
                                 offset=2)
 
+    def test_add_point(self):
+        """Test that a point mass at an integer is not lost in a sum."""
+        point = PointDistribution({3.0: 1})
+        total = op.dist_add(point, UniformDistribution(0, 2))
+        self.assertAlmostEqual(total.quantile(0.5), 4, delta=0.5)
+        total = op.dist_add(UniformDistribution(0, 2), point)
+        self.assertAlmostEqual(total.quantile(0.5), 4, delta=0.5)
+
+    def test_add_engines(self):
+        """Test that the other ways of adding agree with `dist_add`."""
+        left = LogLogistic.fit(0.1, 10, 0.75, 30)
+        right = LogLogistic.fit(0.1, 50, 0.75, 60)
+        expected = op.dist_add(left, right).quantiles([0.1, 0.5, 0.9])
+        for add in (op.dist_add_fft, op.dist_add_montecarlo):
+            total = add(left, right)
+            self.assertEqual(type(total), NumericDistribution)
+            for (x, y) in zip(total.quantiles([0.1, 0.5, 0.9]), expected):
+                self.assertAlmostEqual(x, y, delta=0.05 * y,
+                                       msg=add.__name__)
+        # Moments capture the location and spread, but not the shape.
+        total = op.dist_add_moments(left, right)
+        self.assertAlmostEqual(total.quantile(0.5), expected[1],
+                               delta=0.05 * expected[1])
+
     def test_scale(self):
         """Test that scale does what it says."""
         base = LogLogistic(10, 2)
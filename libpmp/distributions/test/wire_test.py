@@ -0,0 +1,75 @@
+#! /usr/bin/env python3
+
+"""Tests for wire module."""
+
+import pickle
+import unittest
+
+from libpmp.distributions import wire
+from libpmp.distributions.distribution import ZERO, Distribution
+from libpmp.distributions.log_logistic import LogLogistic
+from libpmp.distributions.numeric import NumericDistribution
+from libpmp.distributions.operations import dist_scale, dist_truncate
+from libpmp.distributions.point_distribution import PointDistribution
+from libpmp.distributions.uniform import UniformDistribution
+
+
+def _examples():
+    """@return one distribution of each encodable kind."""
+    log_logistic = LogLogistic.fit(0.1, 10, 0.75, 20)
+    return [
+        ZERO,
+        log_logistic,
+        UniformDistribution(1, 3),
+        PointDistribution({2: 1, 5: 3}),
+        NumericDistribution([1, 4, 6, 4, 1], offset=-2),
+        NumericDistribution([1, 4, 6, 4, 1]).with_precision("float32"),
+        NumericDistribution([1, 4, 6, 4, 1]).with_precision("float16"),
+        dist_scale(log_logistic, 2.5),
+        dist_truncate(dist_scale(UniformDistribution(0, 10), 2), 15),
+    ]
+
+
+class WireTest(unittest.TestCase):
+    """Tests for wire module."""
+
+    def test_round_trip(self):
+        """Every kind of distribution decodes to an equal one, with an
+        equal hash, and pickles likewise."""
+        ps = [0.1, 0.5, 0.9]
+        for dist in _examples():
+            for copy in (wire.decode(wire.encode(dist)),
+                         pickle.loads(pickle.dumps(dist))):
+                self.assertEqual(copy, dist)
+                self.assertEqual(hash(copy), hash(dist))
+                self.assertEqual(list(copy.quantiles(ps)),
+                                 list(dist.quantiles(ps)))
+        self.assertIs(wire.decode(wire.encode(ZERO)), ZERO)
+
+    def test_equality(self):
+        """Distributions are equal when their classes and parameters are."""
+        examples = _examples()
+        for (i, left) in enumerate(examples):
+            for (j, right) in enumerate(examples):
+                self.assertEqual(left == right, i == j)
+        self.assertNotEqual(UniformDistribution(1, 3),
+                            UniformDistribution(1, 4))
+        self.assertNotEqual(NumericDistribution([1, 2]),
+                            NumericDistribution([1, 2], offset=1))
+        self.assertEqual(len({wire.encode(dist) for dist in examples}),
+                         len(examples))
+
+    def test_errors(self):
+        """Bad encodings and unencodable distributions are rejected."""
+        encoding = wire.encode(NumericDistribution([1, 2, 3]))
+        for bad in (encoding[:-1], encoding + b"\0",
+                    bytes([wire.VERSION + 1]) + encoding[1:],
+                    bytes([wire.VERSION, 99])):
+            with self.assertRaises(ValueError):
+                wire.decode(bad)
+        with self.assertRaises(TypeError):
+            wire.encode(Distribution())
+
+
+if __name__ == '__main__':
+    unittest.main()
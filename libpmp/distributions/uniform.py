@@ -1,5 +1,7 @@
 """Uniform distributions."""
 
+import numpy
+
 from libpmp.distributions.distribution import Distribution
 
 
@@ -13,6 +15,16 @@ class UniformDistribution(Distribution):
         self._max = max_value
         self._density = 1 / (max_value - min_value)
 
+    @property
+    def min_value(self):
+        """The least value of the distribution."""
+        return self._min
+
+    @property
+    def max_value(self):
+        """The greatest value of the distribution."""
+        return self._max
+
     def pdf(self, x):
         if self._min <= x <= self._max:
             return self._density
@@ -30,5 +42,11 @@ class UniformDistribution(Distribution):
     def quantile(self, p):
         return self._min + (p / self._density)
 
+    def quantiles(self, ps):
+        return self._min + numpy.asarray(ps, dtype=float) / self._density
+
     def point_on_curve(self):
         return (self._min + self._max) / 2
+
+    def value_key(self):
+        return (self._min, self._max)
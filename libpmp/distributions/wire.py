@@ -0,0 +1,149 @@
+"""Compact, versioned binary encoding of distributions, for caching them,
+sending them between processes and serving them.
+
+An encoding is a version byte (`VERSION`) followed by the encoding of the
+distribution:  a tag byte naming its class, then its parameters, all little
+endian:
+ * `ZERO`:  nothing;
+ * `LogLogistic`:  alpha and beta, as doubles;
+ * `UniformDistribution`:  its least and greatest values, as doubles;
+ * `PointDistribution`:  the number of points (uint32), then the value and
+   probability of each, as doubles;
+ * `NumericDistribution`:  its offset (int64), the number of values
+   (uint32), then the values, in their precision (see
+   `NumericDistribution.with_precision`), with a tag for each precision;
+ * `ScaleWrapper` and `TruncateWrapper`:  the scale or maximum value, as a
+   double, then the encoding (without version) of the wrapped distribution.
+
+Distributions that decode from equal encodings are equal (see
+`Distribution.value_key`), so an encoding can also serve as a cache key.
+"""
+
+import struct
+
+import numpy
+
+from libpmp.distributions.distribution import ZERO
+from libpmp.distributions.log_logistic import LogLogistic
+from libpmp.distributions.numeric import NumericDistribution
+from libpmp.distributions.operations import ScaleWrapper, TruncateWrapper
+from libpmp.distributions.point_distribution import PointDistribution
+from libpmp.distributions.uniform import UniformDistribution
+
+# Version of the encoding; bumped on any incompatible change.
+VERSION = 1
+
+(_ZERO, _LOG_LOGISTIC, _UNIFORM, _POINT, _NUMERIC, _SCALE, _TRUNCATE,
+ _NUMERIC_FLOAT32, _NUMERIC_FLOAT16) = range(9)
+
+_BYTE = struct.Struct("<B")
+_DOUBLE = struct.Struct("<d")
+_DOUBLES = struct.Struct("<dd")
+_COUNT = struct.Struct("<I")
+_NUMERIC_HEADER = struct.Struct("<qI")
+
+# Map of {numeric tag: dtype of its values}.
+_NUMERIC_DTYPES = {
+    _NUMERIC: numpy.dtype("<f8"),
+    _NUMERIC_FLOAT32: numpy.dtype("<f4"),
+    _NUMERIC_FLOAT16: numpy.dtype("<f2"),
+}
+
+# Map of {precision: numeric tag}.
+_NUMERIC_TAGS = {dtype.name: tag for (tag, dtype) in _NUMERIC_DTYPES.items()}
+
+
+def _encode_into(dist, parts):
+    """Append the encoding of @p dist (without version) to @p parts."""
+    if dist is ZERO:
+        parts.append(_BYTE.pack(_ZERO))
+    elif isinstance(dist, LogLogistic):
+        parts.append(_BYTE.pack(_LOG_LOGISTIC))
+        parts.append(_DOUBLES.pack(dist.alpha, dist.beta))
+    elif isinstance(dist, UniformDistribution):
+        parts.append(_BYTE.pack(_UNIFORM))
+        parts.append(_DOUBLES.pack(dist.min_value, dist.max_value))
+    elif isinstance(dist, PointDistribution):
+        points = dist.probabilities
+        parts.append(_BYTE.pack(_POINT))
+        parts.append(_COUNT.pack(len(points)))
+        parts.append(struct.pack("<%dd" % (2 * len(points)),
+                                 *(x for point in points for x in point)))
+    elif isinstance(dist, NumericDistribution):
+        tag = _NUMERIC_TAGS[dist.precision]
+        parts.append(_BYTE.pack(tag))
+        parts.append(_NUMERIC_HEADER.pack(dist.offset, len(dist.values)))
+        parts.append(dist.values.astype(_NUMERIC_DTYPES[tag],
+                                        copy=False).tobytes())
+    elif isinstance(dist, ScaleWrapper):
+        parts.append(_BYTE.pack(_SCALE))
+        parts.append(_DOUBLE.pack(dist.scale))
+        _encode_into(dist.parent, parts)
+    elif isinstance(dist, TruncateWrapper):
+        parts.append(_BYTE.pack(_TRUNCATE))
+        parts.append(_DOUBLE.pack(dist.max_value))
+        _encode_into(dist.parent, parts)
+    else:
+        raise TypeError("Cannot encode %s" % type(dist).__name__)
+
+
+def encode(dist):
+    """@return the encoding of @p dist, as bytes.  Raises TypeError if it
+    is of a class that has no encoding."""
+    parts = [_BYTE.pack(VERSION)]
+    _encode_into(dist, parts)
+    return b"".join(parts)
+
+
+def _decode_from(data, position):
+    """@return `(dist, end)`, the distribution encoded (without version) in
+    @p data at @p position, and the position after its encoding."""
+    (tag,) = _BYTE.unpack_from(data, position)
+    position += _BYTE.size
+    if tag == _ZERO:
+        return (ZERO, position)
+    if tag in (_LOG_LOGISTIC, _UNIFORM):
+        (first, second) = _DOUBLES.unpack_from(data, position)
+        dist = (LogLogistic(first, second) if tag == _LOG_LOGISTIC
+                else UniformDistribution(first, second))
+        return (dist, position + _DOUBLES.size)
+    if tag == _POINT:
+        (count,) = _COUNT.unpack_from(data, position)
+        position += _COUNT.size
+        flat = struct.unpack_from("<%dd" % (2 * count), data, position)
+        return (PointDistribution(dict(zip(flat[::2], flat[1::2]))),
+                position + 2 * count * _DOUBLE.size)
+    if tag in _NUMERIC_DTYPES:
+        dtype = _NUMERIC_DTYPES[tag]
+        (offset, count) = _NUMERIC_HEADER.unpack_from(data, position)
+        position += _NUMERIC_HEADER.size
+        if position + count * dtype.itemsize > len(data):
+            raise ValueError("Truncated distribution encoding")
+        # A view of the encoding, not a copy.
+        values = numpy.frombuffer(data, dtype=dtype, count=count,
+                                  offset=position)
+        return (NumericDistribution(values, offset),
+                position + count * dtype.itemsize)
+    if tag in (_SCALE, _TRUNCATE):
+        (parameter,) = _DOUBLE.unpack_from(data, position)
+        (parent, position) = _decode_from(data, position + _DOUBLE.size)
+        dist = (ScaleWrapper(parent, parameter) if tag == _SCALE
+                else TruncateWrapper(parent, parameter))
+        return (dist, position)
+    raise ValueError("Unknown distribution tag %d" % tag)
+
+
+def decode(data):
+    """@return the distribution encoded in the bytes-like @p data.  Raises
+    ValueError if it is not a whole encoding of this `VERSION`."""
+    try:
+        (version,) = _BYTE.unpack_from(data, 0)
+        if version != VERSION:
+            raise ValueError("Unsupported distribution encoding version %d"
+                             % version)
+        (dist, end) = _decode_from(data, _BYTE.size)
+    except struct.error as error:
+        raise ValueError("Truncated distribution encoding") from error
+    if end != len(data):
+        raise ValueError("Trailing data after distribution encoding")
+    return dist
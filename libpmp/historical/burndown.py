@@ -1,70 +1,106 @@
 """Utility to create a burndown chart from a task history."""
 
-from io import BytesIO
-
-from matplotlib import pyplot as plt
+import weakref
 
+from libpmp.common.plot_pool import DEFAULT_BACKEND, render_svg
 from libpmp.distributions import distribution
-from libpmp.distributions.operations import dist_add
+from libpmp.model import engines
 
 
-def create_burndown_html(history, node):
+def create_burndown_html(history, node, backend=DEFAULT_BACKEND):
     """Create a burndown plot for the given @p node.
     @return that plot as an html `div` element."""
     return ('<div>' +
-            create_burndown_svg(history, node) + "</div>")
-
-
-def create_burndown_svg(history, node):
-    """Create a burndown plot for the given @p node.
-    @return that plot as a utf-8 string of svg data."""
-    plt.clf()
-    _plot_burndown(history, node)
-    figure_bytes = BytesIO()
-    plt.savefig(figure_bytes, format="svg")
-    return figure_bytes.getvalue().decode("utf-8")
-
-
-def _get_historical_costs(history, node):
+            create_burndown_svg(history, node, backend) + "</div>")
+
+
+def create_burndown_svg(history, node, backend=DEFAULT_BACKEND):
+    """Create a burndown plot for the given @p node, drawn with the plot
+    @p backend.  @return that plot as a utf-8 string of svg data."""
+    return render_svg(burndown_job(history, node), backend)
+
+
+def burndown_job(history, node, engine=None):
+    """@return a `plot_pool` job for a burndown plot of @p node, costed by
+    @p engine (default: the default engine)."""
+    return (plot_burndown, burndown_data(history, node, engine))
+
+
+# Map of {history: {key: distribution}} memoizing the sums of predecessor
+# costs made by `_sum_costs`, so that the burndowns of every node of a report
+# share their work.  Keys start with the key of the engine that summed them.
+_SUM_CACHES = weakref.WeakKeyDictionary()
+
+
+def _sum_costs(history, date, nodes, engine=None):
+    """Return the sum of the final costs of @p nodes, a predecessor set of
+    @p history at @p date, costed and added by @p engine (default: the
+    default engine).
+
+    Sums are memoized per history and engine, both by (date, node set) and
+    by the set of addend distributions, so that a set of nodes whose costs
+    were already summed (eg, shared or identical-cost nodes at another date)
+    is not summed again."""
+    engine = engine or engines.default_engine()
+    if len(nodes) == 1:
+        (node,) = nodes
+        return node.final_cost(engine=engine)
+    cache = _SUM_CACHES.setdefault(history, {})
+    node_key = (engine.key, date, frozenset(nodes))
+    result = cache.get(node_key)
+    if result is not None:
+        return result
+    costs = sorted((node.final_cost(engine=engine) for node in nodes),
+                   key=id)
+    cost_key = (engine.key,) + tuple(costs)
+    result = cache.get(cost_key)
+    if result is None:
+        result = distribution.ZERO
+        for cost in costs:
+            result = engine.add(result, cost)
+        cache[cost_key] = result
+    cache[node_key] = result
+    return result
+
+
+def _get_historical_costs(history, node, engine=None):
     """Return a list [(date, distribution)] for a node.
 
     Totals the projected cost of every predecessor of @p node at every date
-    in @p history.
+    in @p history, by @p engine (default: the default engine).
     """
     node_history = history.get_linear_history(node)
-    cost_history = []
-    for (date, nodes) in node_history:
-        cost_for_date = distribution.ZERO
-        for node in nodes:
-            cost_for_date = dist_add(cost_for_date, node.final_cost())
-        cost_history += [(date, cost_for_date)]
-    return cost_history
-
-
-def _burndown_axes(history, node):
-    """Configure the axes of the current plot and @return them."""
-    axes = plt.axes()
-    axes.set_xlabel("Date")
-    axes.set_ylabel("Remaining Cost")
-    axes.set_title(node.get_display_name())
-    axes.set_xlim(left=history.oldest_date(), right=history.most_recent_date())
-    axes.set_autoscaley_on(True)
-    return axes
+    return [(date, _sum_costs(history, date, nodes, engine))
+            for (date, nodes) in node_history]
 
 
-def _plot_burndown(history, node):
-    """Write a burndown plot to the current pyplot figure."""
-    plt.xkcd()  # Represent approximate/unfounded estimates with xkcd art.
-    axes = _burndown_axes(history, node)
-    costs = _get_historical_costs(history, node)
-    dates = [date for (date, _) in costs]
+def burndown_data(history, node, engine=None):
+    """@return the data for `plot_burndown` of @p node in @p history, costed
+    by @p engine (default: the default engine)."""
+    costs = _get_historical_costs(history, node, engine)
 
     def quantile_history(q):
         return [cost.quantile(q) for (date, cost) in costs]
 
-    axes.fill_between(dates, quantile_history(0.1), quantile_history(0.9),
+    return {"title": node.get_display_name(),
+            "xlim": (history.oldest_date(), history.most_recent_date()),
+            "dates": [date for (date, _) in costs],
+            "quantiles": {q: quantile_history(q)
+                          for q in (0.1, 0.25, 0.5, 0.75, 0.9)}}
+
+
+def plot_burndown(data, axes):
+    """Draw the burndown described by @p data (see `burndown_data`) onto
+    @p axes."""
+    axes.set_xlabel("Date")
+    axes.set_ylabel("Remaining Cost")
+    axes.set_title(data["title"])
+    axes.set_xlim(left=data["xlim"][0], right=data["xlim"][1])
+    axes.set_autoscaley_on(True)
+    (dates, quantiles) = (data["dates"], data["quantiles"])
+    axes.fill_between(dates, quantiles[0.1], quantiles[0.9],
                       hatch="/", edgecolor="red")
-    axes.fill_between(dates, quantile_history(0.25), quantile_history(0.75),
+    axes.fill_between(dates, quantiles[0.25], quantiles[0.75],
                       hatch="\\", edgecolor="red")
-    axes.plot(dates, quantile_history(0.5), color="black")
+    axes.plot(dates, quantiles[0.5], color="black")
     axes.set_ylim(bottom=0.)
@@ -0,0 +1,146 @@
+"""Build a `History` from the revisions of a model file in a git repository.
+
+The revision list comes from a single `git log`, and the file contents from
+a single `git cat-file --batch`, so no checkouts are needed.  Models are
+cached by blob hash:  a revision whose file content was seen before (in this
+load, or in an earlier one sharing the same cache) is not parsed again.
+"""
+
+import datetime
+import functools
+import subprocess
+
+from libpmp.historical.history import History
+from libpmp.historical.loader import parse_packed_models
+from libpmp.model.from_markdown import from_markdown, unpack_tree
+
+_NULL_SHA = "0" * 40
+
+
+def _git(repo, args, stdin=None):
+    """Run git with @p args in @p repo; @return its stdout as bytes."""
+    return subprocess.run(
+        ["git", "-C", repo] + args, input=stdin, stdout=subprocess.PIPE,
+        check=True).stdout
+
+
+def file_revisions(repo, path, rev="HEAD", max_count=None, since=None):
+    """@return a list, oldest first, of `(commit_sha, commit_time,
+    blob_sha)` for each commit reachable from @p rev (following first
+    parents) that changed the file at @p path.  Commits that deleted the
+    file are omitted.  @p max_count and @p since limit the search as with
+    `git log`."""
+    args = ["log", "--first-parent", "-m", "--raw", "--no-abbrev",
+            "--no-renames", "--format=%x00%H %ct"]
+    if max_count is not None:
+        args.append("--max-count=%d" % max_count)
+    if since is not None:
+        args.append("--since=%s" % since)
+    args += [rev, "--", path]
+    output = _git(repo, args).decode("utf-8")
+
+    revisions = []
+    for record in output.split("\0")[1:]:
+        lines = record.strip().split("\n")
+        (commit_sha, commit_time) = lines[0].split()
+        for line in lines[1:]:
+            # Raw diff lines are ":old_mode new_mode old_sha new_sha status".
+            fields = line.split("\t")[0].split()
+            if len(fields) == 5 and fields[3] != _NULL_SHA:
+                revisions.append((commit_sha, int(commit_time), fields[3]))
+                break
+    revisions.reverse()
+    return revisions
+
+
+def read_blobs(repo, blob_shas):
+    """@return a map of {blob_sha: text} for @p blob_shas, read with one
+    `git cat-file --batch`."""
+    if not blob_shas:
+        return {}
+    output = _git(repo, ["cat-file", "--batch"],
+                  stdin="".join(sha + "\n" for sha in blob_shas).encode())
+    result = {}
+    position = 0
+    for sha in blob_shas:
+        header_end = output.index(b"\n", position)
+        header = output[position:header_end].decode("utf-8").split()
+        assert header[0] == sha and header[1] == "blob", (
+            "Unexpected cat-file output %s for %s" % (header, sha))
+        size = int(header[2])
+        content_start = header_end + 1
+        result[sha] = output[content_start:content_start + size].decode(
+            "utf-8")
+        position = content_start + size + 1
+    return result
+
+
+def _commit_date(commit_time):
+    """@return the History date for a git @p commit_time."""
+    return datetime.datetime.fromtimestamp(commit_time,
+                                           tz=datetime.timezone.utc)
+
+
+def _load_blob(repo, blob):
+    """Read and parse the markdown blob @p blob from @p repo."""
+    return from_markdown(read_blobs(repo, [blob])[blob])
+
+
+def lazy_history_from_git(repo, path, rev="HEAD", max_count=None,
+                          since=None, max_loaded_models=None):
+    """Like `history_from_git`, but with lazy entries that read and parse
+    their revision only when first used, keeping at most
+    @p max_loaded_models parsed at once.  Eg, a burndown of the `window`
+    of recent weeks need never parse the older revisions.  Parse errors
+    are raised when the failing entry is used.  @return the history."""
+    history = History(max_loaded_models=max_loaded_models)
+    for (commit_sha, commit_time, blob) in file_revisions(
+            repo, path, rev=rev, max_count=max_count, since=since):
+        history.add_lazy_model(functools.partial(_load_blob, repo, blob),
+                               _commit_date(commit_time),
+                               sha=commit_sha, blob=blob)
+    return history
+
+
+def history_from_git(repo, path, rev="HEAD", max_count=None, since=None,
+                     cache=None, jobs=None):
+    """Make a `History` of the markdown model at @p path in the git
+    repository @p repo, with one entry per commit that changed it (see
+    `file_revisions` for @p rev, @p max_count and @p since).
+
+    Entries are dated by commit time, and also record the commit `sha` and
+    file `blob` hash.  @p cache, if given, is a map of {blob_sha: model}
+    that is consulted and updated, so that repeated loads (or revisions
+    that restore an earlier version) parse each file content only once.
+    New contents are parsed in parallel, using up to @p jobs workers.
+
+    @return a `(history, failures)` pair, where failures is a list of
+    `(commit_sha, exception)` for revisions that could not be parsed.
+    """
+    if cache is None:
+        cache = {}
+    revisions = file_revisions(repo, path, rev=rev, max_count=max_count,
+                               since=since)
+    missing = sorted({blob for (_, _, blob) in revisions} - set(cache))
+    texts = read_blobs(repo, missing)
+    results = parse_packed_models([texts[blob] for blob in missing],
+                                  jobs=jobs)
+    errors = {}
+    for (blob, (packed, error)) in zip(missing, results):
+        if error is None:
+            cache[blob] = unpack_tree(packed)
+        else:
+            errors[blob] = error
+
+    entries = []
+    failures = []
+    for (commit_sha, commit_time, blob) in revisions:
+        if blob in errors:
+            failures.append((commit_sha, errors[blob]))
+            continue
+        entries.append({"model": cache[blob],
+                        "date": _commit_date(commit_time),
+                        "sha": commit_sha, "blob": blob})
+    history = History()
+    history.add_entries(entries)
+    return history, failures
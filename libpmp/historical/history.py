@@ -3,6 +3,15 @@ For a model that changes over time, a datestamped history of its changes
 and mechanisms to track those changes.
 """
 
+import bisect
+import collections
+import weakref
+
+from libpmp.historical.node_index import (
+    FUZZY_MATCH_THRESHOLD,
+    NodeIndex,
+    identifier,
+)
 from libpmp.model.from_markdown import from_markdown
 
 
@@ -15,24 +24,164 @@ class History:
         - date:  The date of the model (typically a timestamp).
     Entries may have additional items specific to their source (eg, git sha).
     Entries are sorted oldest-to-newest.
+
+    Entries may also be lazy (see `add_lazy_model`), holding a loader that
+    is called to parse the model the first time its "model" is needed.  At
+    most `max_loaded_models` lazy models are kept parsed at once, least
+    recently used first out.  An unloaded model that is still referenced
+    (eg by a node held by a caller) is reused if its entry is loaded again,
+    so that nodes keep their identity as long as anyone holds them.
+
+    The history keeps a compact copy of each model added to it, leaving the
+    model itself unchanged:  the copy has no markdown AST, which histories
+    never read, and each of its nodes whose content is unchanged from a node
+    of another snapshot (see `Node.content_hash`) shares that node's
+    estimate, texts and memoized costs (see `Node.clone`).  Each snapshot
+    still has nodes of its own, with their own parents.  So the entries'
+    models (and their nodes) are not those added, which callers may drop.
     """
 
-    def __init__(self):
+    def __init__(self, fuzzy_match_threshold=FUZZY_MATCH_THRESHOLD,
+                 max_loaded_models=None):
+        """Create an empty history.  A node without an exact predecessor is
+        matched to the prior node whose name is most similar to its own, if
+        no other is as similar, the similarity is at least
+        @p fuzzy_match_threshold (see `NodeIndex.similar`), and that node
+        has no exact successor; or to none if @p fuzzy_match_threshold is
+        None.  @p max_loaded_models bounds the number of lazy entries
+        kept parsed, if not None."""
+        self.max_loaded_models = max_loaded_models
+        self._loaded = collections.OrderedDict()  # {id(entry): lazy entry}
+        # Map of {id(entry): model} of unloaded lazy models still referenced.
+        self._unloaded = weakref.WeakValueDictionary()
         self._entries = []
+        self._dates = []  # The dates of `_entries`, for bisection.
+        self._payloads = weakref.WeakValueDictionary()  # {content hash: node}
+        self._indices = {}  # Map of {id(model): NodeIndex}.
+        self._predecessor_maps = {}  # Map of {entry position: map}.
+        self._linear_histories = {}  # Map of {id(node): linear history}.
+        self.fuzzy_match_threshold = fuzzy_match_threshold
 
     def add_entry(self, entry):
         """Add an entry to the history"""
-        self._entries.append(entry)
+        if "model" in entry:  # Not an unloaded lazy entry.
+            entry["model"] = self._keep(entry["model"])
+        position = bisect.bisect_right(self._dates, entry["date"])
+        self._entries.insert(position, entry)
+        self._dates.insert(position, entry["date"])
+        self._invalidate_from(position)
+
+    def add_entries(self, entries):
+        """Add several entries to the history at once, sorting only once."""
+        for entry in entries:
+            if "model" in entry:  # Not an unloaded lazy entry.
+                entry["model"] = self._keep(entry["model"])
+        self._entries.extend(entries)
         self._entries.sort(key=lambda e: e["date"])
+        self._dates = [entry["date"] for entry in self._entries]
+        self._invalidate_from(0)
+
+    def _invalidate_from(self, position):
+        """Forget derived data that may depend on the entry at @p position
+        or later, all of which have moved."""
+        self._predecessor_maps = {i: predecessor_map for (i, predecessor_map)
+                                  in self._predecessor_maps.items()
+                                  if i < position}
+        self._linear_histories = {}
+
+    def _keep(self, model):
+        """@return the compact copy of @p model that this history keeps."""
+        result = model.clone(self._payloads)
+        stack = [result]
+        while stack:
+            current = stack.pop()
+            if hasattr(current, "ast"):
+                current.ast = None
+            stack.extend(current.children)
+        return result
 
     def add_model(self, model, sort_date):
         """Add a model to the history, with the given date."""
         self.add_entry({"model": model, "date": sort_date})
 
+    def add_lazy_model(self, loader, sort_date, **items):
+        """Add a model to the history, with the given date, that is made by
+        calling @p loader only when it is first needed.  Any other @p items
+        are added to the entry."""
+        entry = _LazyEntry(self, loader, items)
+        entry["date"] = sort_date
+        self.add_entry(entry)
+
+    def _load(self, entry):
+        """Parse the model of the lazy @p entry, unloading the least recently
+        used lazy models if there are too many.  @return the model."""
+        model = self._unloaded.pop(id(entry), None)
+        if model is None:
+            model = self._keep(entry.loader())
+        dict.__setitem__(entry, "model", model)
+        self._touch(entry)
+        while (self.max_loaded_models is not None and
+               len(self._loaded) > self.max_loaded_models):
+            (_, evicted) = self._loaded.popitem(last=False)
+            self._unload(evicted)
+        return model
+
+    def _touch(self, entry):
+        """Mark the lazy @p entry as the most recently used."""
+        self._loaded[id(entry)] = entry
+        self._loaded.move_to_end(id(entry))
+
+    def _unload(self, entry):
+        """Drop the model of the lazy @p entry, and everything derived from
+        it."""
+        model = dict.pop(entry, "model")
+        self._unloaded[id(entry)] = model
+        self._indices.pop(id(model), None)
+        self._linear_histories = {}
+        for (i, other) in enumerate(self._entries):
+            if other is entry:
+                self._predecessor_maps.pop(i, None)
+                self._predecessor_maps.pop(i + 1, None)
+
     def entries(self):
         """Get the entries in this history."""
         return self._entries
 
+    def entries_between(self, start=None, end=None):
+        """Get the entries dated from @p start to @p end inclusive (either
+        may be None for no limit), by bisection."""
+        return self._entries[self._slice(start, end)]
+
+    def window(self, start=None, end=None):
+        """@return a new `History` of the entries dated from @p start to
+        @p end inclusive, sharing them (and their models) with this one.
+        Eg, a burndown of recent weeks need never load older models."""
+        bounds = self._slice(start, end)
+        result = History(fuzzy_match_threshold=self.fuzzy_match_threshold,
+                         max_loaded_models=self.max_loaded_models)
+        result._entries = self._entries[bounds]
+        result._dates = self._dates[bounds]
+        result._payloads = self._payloads
+        result._unloaded = self._unloaded
+        return result
+
+    def _slice(self, start, end):
+        """@return the slice of `_entries` dated from @p start to @p end."""
+        low = 0 if start is None else bisect.bisect_left(self._dates, start)
+        high = (len(self._dates) if end is None
+                else bisect.bisect_right(self._dates, end))
+        return slice(low, high)
+
+    def entry_as_of(self, date):
+        """Get the newest entry dated no later than @p date, or None."""
+        position = bisect.bisect_right(self._dates, date)
+        return self._entries[position - 1] if position else None
+
+    def model_as_of(self, date):
+        """Get the model of the snapshot in effect at @p date, or None."""
+        entry = self.entry_as_of(date)
+        return entry["model"] if entry is not None else None
+
     def oldest_date(self):
         """Return the date of the first entry in this history."""
         return self._entries[0]["date"]
@@ -45,6 +194,47 @@ class History:
         """Return the model of the most recent entry in this history."""
         return self._entries[-1]["model"]
 
+    def index(self, entry):
+        """Return the `NodeIndex` of the model of @p entry, building it if
+        need be."""
+        model = entry["model"]
+        result = self._indices.get(id(model))
+        if result is None:
+            result = NodeIndex(model)
+            self._indices[id(model)] = result
+        return result
+
+    def _position(self, node):
+        """@return the position of the entry containing @p node, or None if
+        there is none."""
+        root = node
+        while root.parent is not None:
+            root = root.parent
+        for i in range(len(self._entries) - 1, -1, -1):
+            entry = self._entries[i]
+            # Without loading lazy models, which cannot hold the node unless
+            # they are still referenced.
+            model = dict.get(entry, "model")
+            if model is None:
+                model = self._unloaded.get(id(entry))
+            if model is root:
+                return i
+        return None
+
+    def predecessor_map(self, position):
+        """Return a map of {id(node): [nodes]} giving the predecessors (as
+        described in `predecessors`) in the prior entry of every node of the
+        entry at @p position.  Computed once per pair of entries."""
+        assert 0 < position < len(self._entries)
+        result = self._predecessor_maps.get(position)
+        if result is None:
+            index = self.index(self._entries[position])
+            prior_index = self.index(self._entries[position - 1])
+            result = {id(node): self._match(node, prior_index, index)
+                      for node in index}
+            self._predecessor_maps[position] = result
+        return result
+
     def predecessors(self, node):
         """Compute the recent history of a node.
 
@@ -53,55 +243,93 @@ class History:
         where the nodes list may be empty if there are no predecessors, or
         None if there is no prior entry.
 
-        NOTE:  Currently finds only at most one exact predecessor.
+        A node's predecessor is the node in the prior entry with the same
+        identifier (node name, or else display name), preferring one whose
+        parent also has the same identifier.  Failing that, nodes without a
+        node name are matched to the prior nodes with the most similar
+        display names, excluding any prior node that still exists under its
+        own name; this follows items that were renamed or split.
         """
-        # TODO(ggould) This is a grossly inadequate algorithm.  Some sort of
-        # fuzzy or levenshtein approach would be superior.
-        def identifier(node):
-            return node.node_name or node.display_name
-
-        for i in range(len(self._entries) - 1, 0, -1):
-            entry = self._entries[i]
-            if entry["model"].has_descendant(node):
-                prior_date = self._entries[i - 1]["date"]
-                prior_model = self._entries[i - 1]["model"]
-                break
-        else:
+        position = self._position(node)
+        if not position:
             return None  # Ran out of history without finding a predecessor.
-        # TODO(ggould) Find more priors using a fuzzier match.
-        prior_node = prior_model.find_descendant(
-            lambda n: identifier(n) == identifier(node))
-        if prior_node:
-            return (prior_date, [prior_node])
-        return (prior_date, [])
+        return (self._entries[position - 1]["date"],
+                self.predecessor_map(position)[id(node)])
+
+    def _match(self, node, prior_index, index):
+        """@return the predecessors of @p node (indexed by @p index) among
+        the nodes indexed by @p prior_index."""
+        exact = prior_index.exact(identifier(node))
+        if exact:
+            if len(exact) > 1 and node.parent is not None:
+                parent_identifier = identifier(node.parent)
+                for prior_node in exact:
+                    if (prior_node.parent is not None and
+                            identifier(prior_node.parent) ==
+                            parent_identifier):
+                        return [prior_node]
+            return [exact[0]]
+        if node.node_name or self.fuzzy_match_threshold is None:
+            return []
+        similar = prior_index.similar(node.display_name or "",
+                                      self.fuzzy_match_threshold)
+        if not similar:
+            return []
+        (best, prior_node) = similar[0]
+        if len(similar) > 1 and similar[1][0] == best:
+            return []  # No one prior node is the most similar.
+        if index.exact(identifier(prior_node)):
+            return []  # The prior node has its own exact successor.
+        return [prior_node]
 
     def get_linear_history(self, node):
         """Return a list [(date, {node})] for a node.
 
         Recursively reads out the predecessor tree of @p node at every date in
         this history.  The last entry in the result will be `node`.
+        Results are memoized, and share the per-entry `predecessor_map`s, so
+        the histories of every node of a model cost little more than one.
         """
-        result = []
+        result = self._linear_histories.get(id(node))
+        if result is not None:
+            return result
+        position = self._position(node)
+        assert position is not None, "Node is not in this history."
+        result = [(self._entries[position]["date"], {node})]
         working_set = {node}
-        working_date = self.most_recent_date()
-        while working_set:
-            result = [(working_date, working_set)] + result
-            new_working_date = None
-            new_working_set = set()
-            for working_node in working_set:
-                predecessors_result = self.predecessors(working_node)
-                if predecessors_result is None:
-                    break
-                prior_date, predecessors = predecessors_result
-                new_working_set.update(predecessors)
-                if new_working_date:
-                    assert new_working_date == prior_date
-                new_working_date = prior_date
-            working_date = new_working_date
-            working_set = new_working_set
+        while position > 0:
+            predecessor_map = self.predecessor_map(position)
+            working_set = {prior_node
+                           for working_node in working_set
+                           for prior_node in predecessor_map[id(working_node)]}
+            if not working_set:
+                break
+            position -= 1
+            result.append((self._entries[position]["date"], working_set))
+        result.reverse()
+        self._linear_histories[id(node)] = result
         return result
 
 
+class _LazyEntry(dict):
+    """A `History` entry whose "model" item is loaded on first use."""
+
+    def __init__(self, history, loader, items):
+        super().__init__(items)
+        self.history = history
+        self.loader = loader
+
+    def __missing__(self, key):
+        if key != "model":
+            raise KeyError(key)
+        return self.history._load(self)  # pylint: disable = protected-access
+
+    def __getitem__(self, key):
+        if key == "model" and dict.__contains__(self, key):
+            self.history._touch(self)  # pylint: disable = protected-access
+        return super().__getitem__(key)
+
+
 def history_from_md_texts(texts):
     """Make a `History` from a list of markdown text.  For testing purposes."""
     hist = History()
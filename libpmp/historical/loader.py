@@ -0,0 +1,100 @@
+"""Bulk loading of many model snapshots into a `History`.
+
+Parsing (and especially curve fitting) dominates the cost of loading a long
+history, so snapshots are parsed in a pool of workers and shipped back in the
+compact form produced by `from_markdown.pack_tree`.
+"""
+
+import concurrent.futures
+import os
+
+from libpmp.historical.history import History
+from libpmp.model.from_markdown import from_markdown, pack_tree, unpack_tree
+
+
+def _load_packed(path):
+    """Read and parse the markdown file at @p path; @return its model in
+    packed form."""
+    with open(path) as md_file:
+        return pack_tree(from_markdown(md_file.read()))
+
+
+def _parse_packed(text):
+    """Parse the markdown @p text; @return its model in packed form."""
+    return pack_tree(from_markdown(text))
+
+
+def map_reporting_errors(function, items, jobs, use_threads):
+    """Apply @p function to each of @p items using up to @p jobs workers.
+    @return a list of `(result, error)` pairs as in `load_packed_models`."""
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs <= 1 or len(items) <= 1:
+        results = []
+        for item in items:
+            try:
+                results.append((function(item), None))
+            except Exception as error:  # pylint: disable = broad-except
+                results.append((None, error))
+        return results
+
+    executor_class = (concurrent.futures.ThreadPoolExecutor if use_threads
+                      else concurrent.futures.ProcessPoolExecutor)
+    with executor_class(max_workers=jobs) as executor:
+        futures = [executor.submit(function, item) for item in items]
+        results = []
+        for future in futures:
+            try:
+                results.append((future.result(), None))
+            except Exception as error:  # pylint: disable = broad-except
+                results.append((None, error))
+        return results
+
+
+def load_packed_models(paths, jobs=None, use_threads=False):
+    """Parse each of the markdown files in @p paths using up to @p jobs
+    workers (default: one per cpu).  Worker processes are used unless
+    @p use_threads is set, which is only worthwhile when reading is slow
+    relative to parsing.
+
+    @return a list, parallel to @p paths, of `(packed_model, error)` pairs;
+    exactly one of each pair is None.
+    """
+    return map_reporting_errors(_load_packed, paths, jobs, use_threads)
+
+
+def parse_packed_models(texts, jobs=None):
+    """Like `load_packed_models`, but for markdown @p texts already in
+    memory.  The texts are parsed in worker processes, never threads, unless
+    @p jobs <= 1 or there is only one text, when they are parsed here."""
+    return map_reporting_errors(_parse_packed, texts, jobs, False)
+
+
+def history_from_md_files(paths, jobs=None, use_threads=False, models=None):
+    """Make a `History` from the markdown files in @p paths, in parallel.
+    Each snapshot is dated by its position in @p paths, as with
+    `history_from_md_texts`.
+
+    If @p models is given, it is a map of {path: model} of snapshots that
+    are already parsed; those paths are not read again, and newly parsed
+    models are added to it.
+
+    A snapshot that fails to load or parse does not stop the others.
+    @return a `(history, failures)` pair, where failures is a list of
+    `(path, exception)` for the snapshots that were skipped.
+    """
+    if models is None:
+        models = {}
+    to_load = [path for path in paths if path not in models]
+    failures = []
+    results = load_packed_models(to_load, jobs=jobs, use_threads=use_threads)
+    for (path, (packed, error)) in zip(to_load, results):
+        if error is not None:
+            failures.append((path, error))
+        else:
+            models[path] = unpack_tree(packed)
+    entries = [{"model": models[path], "date": i, "path": path}
+               for (i, path) in enumerate(paths) if path in models]
+    history = History()
+    history.add_entries(entries)
+    return history, failures
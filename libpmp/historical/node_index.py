@@ -0,0 +1,97 @@
+"""Indexes over the nodes of a model, for finding the counterparts of a node
+in another snapshot of the same model."""
+
+import re
+from collections import Counter
+
+from libpmp.model.diff import identifier
+
+# Length of the character n-grams used for fuzzy name matching.
+NGRAM_LENGTH = 3
+
+# Minimum similarity (Jaccard index of name n-grams) for a fuzzy match.  Any
+# lower, and names sharing only a word or two (eg "Write the tests" and "Write
+# the parser") would match.
+FUZZY_MATCH_THRESHOLD = 0.55
+
+
+def name_ngrams(name):
+    """@return the set of character n-grams of the normalized @p name."""
+    normalized = " %s " % re.sub(r"\s+", " ", name.strip().lower())
+    if len(normalized) <= NGRAM_LENGTH:
+        return frozenset()
+    return frozenset(normalized[i:i + NGRAM_LENGTH]
+                     for i in range(len(normalized) - NGRAM_LENGTH + 1))
+
+
+def name_numbers(name):
+    """@return the tuple of the numbers in @p name, in order.  Names that
+    differ in their numbers (eg "Phase 1" and "Phase 2") name different
+    things, however similar they are otherwise."""
+    return tuple(int(number) for number in re.findall(r"\d+", name))
+
+
+class NodeIndex:
+    """Identifier and name-similarity indexes of all of the nodes in one
+    model.  Built once per snapshot, so that lookups need not walk the
+    tree."""
+
+    def __init__(self, model):
+        self._nodes = {}  # Map of {id(node): node} for membership tests.
+        self._order = {}  # Map of {id(node): preorder position}.
+        self._by_identifier = {}  # Map of {identifier: [nodes in preorder]}.
+        self._ngrams = {}  # Map of {id(node): name n-grams}.
+        self._numbers = {}  # Map of {id(node): name numbers}.
+        self._by_ngram = {}  # Inverted index of {n-gram: [nodes]}.
+        self._add(model)
+
+    def _add(self, node):
+        """Add @p node and its descendants to the indexes, in preorder."""
+        self._nodes[id(node)] = node
+        self._order[id(node)] = len(self._order)
+        self._by_identifier.setdefault(identifier(node), []).append(node)
+        if not node.node_name:
+            ngrams = name_ngrams(node.display_name or "")
+            self._ngrams[id(node)] = ngrams
+            self._numbers[id(node)] = name_numbers(node.display_name or "")
+            for ngram in ngrams:
+                self._by_ngram.setdefault(ngram, []).append(node)
+        for child in node.children:
+            self._add(child)
+
+    def __contains__(self, node):
+        return id(node) in self._nodes
+
+    def __iter__(self):
+        """Iterate over the indexed nodes, in preorder."""
+        return iter(self._nodes.values())
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def exact(self, name):
+        """@return the nodes whose identifier is @p name, in preorder."""
+        return self._by_identifier.get(name, [])
+
+    def similar(self, name, threshold=FUZZY_MATCH_THRESHOLD):
+        """@return `[(similarity, node)]` for the unnamed nodes whose display
+        names are at least @p threshold similar to @p name and have the same
+        numbers (see `name_numbers`), most similar first (and in preorder
+        among equals)."""
+        ngrams = name_ngrams(name)
+        if not ngrams:
+            return []
+        numbers = name_numbers(name)
+        shared = Counter()
+        for ngram in ngrams:
+            for node in self._by_ngram.get(ngram, ()):
+                shared[id(node)] += 1
+        result = []
+        for (node_id, count) in shared.items():
+            union = len(ngrams) + len(self._ngrams[node_id]) - count
+            similarity = count / union
+            if similarity >= threshold and self._numbers[node_id] == numbers:
+                result.append((similarity, self._nodes[node_id]))
+        result.sort(
+            key=lambda match: (-match[0], self._order[id(match[1])]))
+        return result
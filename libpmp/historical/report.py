@@ -2,26 +2,51 @@
 Reports on histories.
 """
 
-from libpmp.historical.burndown import create_burndown_html
+from libpmp.common.plot_pool import plot_options, render_svgs
+from libpmp.historical.burndown import burndown_job
 from libpmp.report.enhanced_html import FOOTER, HEADER
 
 
-def dump_node(indent, node, history, level, args):
-    """@return a description of the given node."""
-    result = ""
+def _nodes_to_dump(indent, node, level, args):
+    """@return `[(indent, node)]` for @p node and the descendants that
+    `dump_node` describes, in document order."""
     if level >= args.levels:
-        return result
-    result += "%s %s : %s %s\n" % (
-        ' ' * indent, node.tag, node.format_distribution(), node.data)
-    result += "<br clear=all/>"
-    result += create_burndown_html(history, node) + "\n"
-    result += "<br clear=all/>"
+        return []
+    result = [(indent, node)]
     for child in node.children:
-        result += dump_node(indent + 2, child, history, level + 1, args)
+        result += _nodes_to_dump(indent + 2, child, level + 1, args)
     return result
 
 
+def dump_node_sections(indent, node, history, level, args):
+    """Generator of the description of the given node, one node at a time.
+    The burndown plots are rendered as selected by @p args (see
+    `plot_pool.plot_options`)."""
+    nodes = _nodes_to_dump(indent, node, level, args)
+    svgs = render_svgs((burndown_job(history, node) for (_, node) in nodes),
+                       **plot_options(args))
+    for ((node_indent, node), svg) in zip(nodes, svgs):
+        description = "%s %s : %s %s\n" % (
+            ' ' * node_indent, node.tag, node.format_distribution(), node.data)
+        yield (description + "<br clear=all/>" +
+               "<div>" + svg + "</div>\n" + "<br clear=all/>")
+
+
+def dump_node(indent, node, history, level, args):
+    """@return a description of the given node."""
+    return "".join(dump_node_sections(indent, node, history, level, args))
+
+
+def report_sections(root, history, args):
+    """Generator of the sections of `structure_dump_with_history`, each made
+    only when it is requested, so the report can be written out as it is
+    made."""
+    yield HEADER
+    yield from dump_node_sections(0, root, history, 0, args)
+    yield FOOTER
+
+
 def structure_dump_with_history(root, history, args):
     """Write out the whole node @p root with its estimates in a vaguely
     human-readable form."""
-    return HEADER + dump_node(0, root, history, 0, args) + FOOTER
+    return "".join(report_sections(root, history, args))
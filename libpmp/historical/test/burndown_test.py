@@ -0,0 +1,66 @@
+#! /usr/bin/env python3
+
+"""Tests for `burndown`."""
+
+# pylint: disable = protected-access
+
+import unittest
+
+from libpmp.historical import burndown
+from libpmp.historical.history import history_from_md_texts
+from libpmp.model import engines
+
+
+class BurndownTest(unittest.TestCase):
+    """Tests for `burndown`."""
+
+    def test_sum_costs(self):
+        """Predecessor sums are memoized and shared across dates."""
+        history = history_from_md_texts(
+            ["Header\n* Item 1 {3-4}\n* Item 2 {5-6}"])
+        items = history.most_recent_model().children[1:]
+        self.assertEqual([item.display_name for item in items],
+                         ["Item 1", "Item 2"])
+        total = burndown._sum_costs(history, 0, set(items))
+        self.assertAlmostEqual(
+            total.quantile(0.5),
+            sum(item.final_cost().quantile(0.5) for item in items), delta=1)
+        self.assertIs(burndown._sum_costs(history, 0, set(items)), total)
+        self.assertIs(burndown._sum_costs(history, 1, set(items)), total)
+        self.assertIs(burndown._sum_costs(history, 0, {items[0]}),
+                      items[0].final_cost())
+
+    def test_sum_costs_engine(self):
+        """Predecessor sums are made and memoized by the engine given, or
+        else the default engine."""
+        history = history_from_md_texts(
+            ["Header\n* Item 1 {3-4}\n* Item 2 {5-6}"])
+        items = set(history.most_recent_model().children[1:])
+        moments = engines.make_engine("moments")
+        narrow = engines.make_engine(precision="float32")
+        total = burndown._sum_costs(history, 0, items)
+        self.assertIsNot(burndown._sum_costs(history, 0, items, moments),
+                         total)
+        self.assertEqual(
+            burndown._sum_costs(history, 0, items, narrow).precision,
+            "float32")
+        try:
+            engines.set_default_engine(moments)
+            self.assertIs(burndown._sum_costs(history, 0, items),
+                          burndown._sum_costs(history, 0, items, moments))
+        finally:
+            engines.set_default_engine(engines.make_engine())
+
+    def test_historical_costs(self):
+        """Each date's cost is that of the node's predecessor."""
+        history = history_from_md_texts(
+            ["Header\n* Item 1 {3-4}", "Header\n* Item 1 {7-8}"])
+        item = history.most_recent_model().children[1]
+        costs = burndown._get_historical_costs(history, item)
+        self.assertEqual([date for (date, _) in costs], [0, 1])
+        self.assertAlmostEqual(costs[0][1].quantile(0.1), 3, delta=0.01)
+        self.assertIs(costs[1][1], item.final_cost())
+
+
+if __name__ == '__main__':
+    unittest.main()
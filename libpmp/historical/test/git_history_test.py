@@ -0,0 +1,113 @@
+#! /usr/bin/env python3
+
+"""Tests for `git_history`."""
+
+import os
+import subprocess
+import tempfile
+import unittest
+
+from libpmp.historical.git_history import (
+    history_from_git,
+    lazy_history_from_git,
+)
+
+REVISIONS = [
+    "Header\n* Item 1 {3-4}\n",
+    "Header\n* Item 1 {5-6}\n",
+    "Header\n* Item 1 {5-6} {7-8}\n",  # Malformed estimate.
+    "Header\n* Item 1 {3-4}\n",  # Same content as the first revision.
+]
+
+
+class GitHistoryTest(unittest.TestCase):
+    """Tests for `git_history`."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.repo = self.tempdir.name
+        self.git("init", "-q")
+        self.shas = []
+        for (i, text) in enumerate(REVISIONS):
+            with open(os.path.join(self.repo, "plan.md"), "w") as plan:
+                plan.write(text)
+            with open(os.path.join(self.repo, "other.md"), "w") as other:
+                other.write("Unrelated change %d\n" % i)
+            self.git("add", "plan.md", "other.md")
+            self.git("commit", "-q", "-m", "Revision %d" % i,
+                     date="@%d +0000" % (1500000000 + i * 86400))
+            self.shas.append(self.git("rev-parse", "HEAD").strip())
+        self.git("commit", "-q", "--allow-empty", "-m", "No change",
+                 date="@1600000000 +0000")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def git(self, *args, date=None):
+        """Run a git command in the test repository."""
+        env = dict(os.environ, GIT_AUTHOR_NAME="Tester",
+                   GIT_AUTHOR_EMAIL="tester@example.com",
+                   GIT_COMMITTER_NAME="Tester",
+                   GIT_COMMITTER_EMAIL="tester@example.com")
+        if date is not None:
+            env.update(GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date)
+        return subprocess.run(["git"] + list(args), cwd=self.repo, env=env,
+                              stdout=subprocess.PIPE, check=True,
+                              universal_newlines=True).stdout
+
+    def test_history(self):
+        """Every revision that changed the file becomes an entry."""
+        cache = {}
+        (history, failures) = history_from_git(self.repo, "plan.md",
+                                               cache=cache, jobs=1)
+        self.assertEqual([sha for (sha, _) in failures], [self.shas[2]])
+        entries = history.entries()
+        self.assertEqual([entry["sha"] for entry in entries],
+                         [self.shas[0], self.shas[1], self.shas[3]])
+        self.assertEqual([entry["date"].timestamp() for entry in entries],
+                         [1500000000, 1500086400, 1500259200])
+        # The same blob is parsed once; each entry keeps its own copy.
+        self.assertEqual(len(cache), 2)
+        (first, last) = (entries[0]["model"], entries[2]["model"])
+        self.assertIsNot(first, last)
+        self.assertEqual(first.content_hash(), last.content_hash())
+        self.assertIs(first.children[1].distribution,
+                      last.children[1].distribution)
+
+        item = history.most_recent_model().find_descendant(
+            lambda n: n.display_name == "Item 1")
+        (previous_date, predecessors) = history.predecessors(item)
+        self.assertEqual(previous_date, entries[1]["date"])
+        self.assertEqual(predecessors[0].distribution_text, "{5-6}")
+
+        (again, _) = history_from_git(self.repo, "plan.md", cache=cache,
+                                      max_count=2, jobs=1)
+        self.assertEqual([entry["sha"] for entry in again.entries()],
+                         [self.shas[3]])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(again.most_recent_model().content_hash(),
+                         history.most_recent_model().content_hash())
+
+    def test_lazy_history(self):
+        """Lazy entries parse only the revisions that are used."""
+        history = lazy_history_from_git(self.repo, "plan.md",
+                                        max_loaded_models=1)
+        entries = history.entries()
+        self.assertEqual([entry["sha"] for entry in entries], self.shas)
+        self.assertFalse(any("model" in entry for entry in entries))
+        recent = history.window(start=entries[3]["date"])
+        self.assertEqual(len(recent.entries()), 1)
+        item = recent.most_recent_model().children[1]
+        self.assertEqual(item.distribution_text, "{3-4}")
+        self.assertEqual([("model" in entry) for entry in entries],
+                         [False, False, False, True])
+        with self.assertRaises(ValueError):
+            entries[2]["model"]  # pylint: disable = pointless-statement
+        self.assertEqual(entries[1]["model"].children[1].distribution_text,
+                         "{5-6}")
+        self.assertEqual([("model" in entry) for entry in entries],
+                         [False, True, False, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
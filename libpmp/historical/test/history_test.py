@@ -2,9 +2,11 @@
 
 """Tests for `history`."""
 
+import gc
 import unittest
 
-from libpmp.historical.history import history_from_md_texts
+from libpmp.historical.history import History, history_from_md_texts
+from libpmp.model.from_markdown import from_markdown
 
 
 class HistoryTest(unittest.TestCase):
@@ -40,5 +42,187 @@ class HistoryTest(unittest.TestCase):
         linear_history = history.get_linear_history(test_node)
         assert linear_history == [(0, {previous_node}), (1, {test_node})]
 
+    def test_linear_history_batched(self):
+        """Check that linear histories of all nodes share predecessor maps."""
+        history = history_from_md_texts(
+            ["Header\n* Item 1 {3-4}",
+             "Header\n* Item 1 {3-4}\n* Item 2 {5-6}",
+             "Header\n* Item 1 {3-4}\n* Item 2 {5-6}"])
+        models = [entry["model"] for entry in history.entries()]
+        for node in history.index(history.entries()[-1]):
+            history.get_linear_history(node)
+        # pylint: disable = protected-access
+        self.assertEqual(len(history._predecessor_maps), 2)
+        item_2 = models[2].find_descendant(
+            lambda n: n.display_name == "Item 2")
+        linear_history = history.get_linear_history(item_2)
+        self.assertIs(history.get_linear_history(item_2), linear_history)
+        self.assertEqual(
+            linear_history,
+            [(1, {models[1].find_descendant(
+                lambda n: n.display_name == "Item 2")}),
+             (2, {item_2})])
+        item_1 = models[1].find_descendant(
+            lambda n: n.display_name == "Item 1")
+        self.assertEqual([date for (date, _) in
+                          history.get_linear_history(item_1)], [0, 1])
+
+    def test_structural_sharing(self):
+        """Check that snapshots keep their own nodes, without ASTs, sharing
+        the estimates and costs of unchanged nodes, and leave the models
+        added unchanged."""
+        # pylint: disable = protected-access
+        history = History()
+        texts = ["Header\n* Item 1 {3-4}\n * Item 2 {5-6}\n\nFooter",
+                 "Header\n* Item 1 {3-4}\n * Item 2 {5-7}\n\nFooter"]
+        added = [from_markdown(text) for text in texts]
+        before = (added[1].children[1]._memoized_cost, added[1].ast)
+        history.add_model(added[1], 1)
+        history.add_model(added[0], 0)  # Out of order.
+        (old, new) = [entry["model"] for entry in history.entries()]
+        self.assertEqual([entry["date"] for entry in history.entries()],
+                         [0, 1])
+        self.assertIsNot(new, added[1])
+        self.assertIs(added[1].children[1]._memoized_cost, before[0])
+        self.assertIs(added[1].ast, before[1])
+        for model in (old, new):
+            model.check_valid()
+            self.assertIsNone(model.ast)
+        (old_item, new_item) = (old.children[1], new.children[1])  # Item 1
+        self.assertIsNot(old_item, new_item)
+        self.assertIs(new_item.parent, new)
+        self.assertIs(old_item.distribution, new_item.distribution)
+        self.assertIs(old_item._memoized_cost, new_item._memoized_cost)
+        self.assertIs(old_item.final_cost(), new_item.final_cost())
+        self.assertIsNot(old.children[2]._memoized_cost,
+                         new.children[2]._memoized_cost)  # Item 2
+        self.assertEqual(new.children[2].distribution_text, "{5-7}")
+        self.assertAlmostEqual(new.final_cost().quantile(0.5),
+                               added[1].final_cost().quantile(0.5))
+
+    def test_lazy_entries(self):
+        """Check that lazy entries load on demand, within their bound."""
+        texts = ["* Item {%d-%d}" % (i, i + 1) for i in range(1, 6)]
+        loads = []
+
+        def loader(i):
+            loads.append(i)
+            return from_markdown(texts[i])
+
+        history = History(max_loaded_models=2)
+        for i in range(len(texts)):
+            history.add_lazy_model(lambda i=i: loader(i), i * 7, week=i)
+        self.assertEqual(loads, [])
+        self.assertEqual(history.entry_as_of(15)["week"], 2)
+        self.assertIsNone(history.entry_as_of(-1))
+        self.assertEqual(
+            [entry["week"] for entry in history.entries_between(7, 21)],
+            [1, 2, 3])
+        self.assertEqual(loads, [])
+
+        item = history.most_recent_model().children[0]
+        linear_history = history.get_linear_history(item)
+        self.assertEqual([date for (date, _) in linear_history],
+                         [0, 7, 14, 21, 28])
+        self.assertEqual(loads, [4, 3, 2, 1, 0])
+        self.assertEqual(
+            sum("model" in entry for entry in history.entries()), 2)
+        self.assertEqual(history.model_as_of(3).children[0].distribution_text,
+                         "{1-2}")
+        self.assertEqual(loads, [4, 3, 2, 1, 0])
+
+    def test_lazy_entries_held_nodes(self):
+        """Check that nodes held by a caller stay in the history when their
+        lazy model is unloaded, even with a single model loaded."""
+        # pylint: disable = protected-access
+        texts = ["* Item {%d-%d}\n* Other {1-2}" % (i, i + 1)
+                 for i in range(1, 4)]
+        loads = []
+
+        def loader(i):
+            loads.append(i)
+            return from_markdown(texts[i])
+
+        history = History(max_loaded_models=1)
+        for i in range(len(texts)):
+            history.add_lazy_model(lambda i=i: loader(i), i)
+        (item, other) = history.most_recent_model().children
+        self.assertEqual(
+            [date for (date, _) in history.get_linear_history(item)],
+            [0, 1, 2])
+        self.assertEqual(
+            sum("model" in entry for entry in history.entries()), 1)
+        self.assertEqual(
+            [date for (date, _) in history.get_linear_history(other)],
+            [0, 1, 2])
+        (date, predecessors) = history.predecessors(item)
+        self.assertEqual(date, 1)
+        self.assertEqual(predecessors[0].distribution_text, "{2-3}")
+        self.assertIs(history.most_recent_model(), item.parent)
+        self.assertEqual(loads[:3], [2, 1, 0])
+        self.assertEqual(loads.count(2), 1)  # Never reloaded while held.
+        del item, other, predecessors
+        history.model_as_of(0)
+        gc.collect()  # Trees are cyclic, through their parents.
+        self.assertEqual(len(history._unloaded), 0)
+
+    RENAMED_HISTORY = history_from_md_texts(
+        ["Header\n* Write the parser {3-4}\n* Write the tests {5-6}\n"
+         "* Ship it {1-2}",
+         "Header\n* Write the markdown parser {3-4}\n"
+         "* Write the unit tests {7-8}\n* Write the system tests {7-8}\n"
+         "* Celebrate {1-2}",
+         ])
+
+    def find(self, history, i, name):
+        """Find the node named @p name in entry @p i of @p history."""
+        return history.entries()[i]["model"].find_descendant(
+            lambda n: n.display_name == name)
+
+    def test_renamed(self):
+        """Check that renamed and split nodes find their predecessors."""
+        history = self.RENAMED_HISTORY
+        parser = self.find(history, 0, "Write the parser")
+        tests = self.find(history, 0, "Write the tests")
+        (_, predecessors) = history.predecessors(
+            self.find(history, 1, "Write the markdown parser"))
+        self.assertEqual(predecessors, [parser])
+        for name in ("Write the unit tests", "Write the system tests"):
+            (_, predecessors) = history.predecessors(
+                self.find(history, 1, name))
+            self.assertEqual(predecessors, [tests])
+        (_, predecessors) = history.predecessors(
+            self.find(history, 1, "Celebrate"))
+        self.assertEqual(predecessors, [])
+
+    def test_numbered_siblings(self):
+        """Check that items differing only by number are not taken for
+        renames of one another, nor are ambiguous matches made."""
+        history = history_from_md_texts(
+            ["Header\n* Item 1 {3-4}\n* Item 2 {5-6}",
+             "Header\n* Item 2 {5-6}\n* Item 3 {7-8}",
+             "Header\n* Item 2 {5-6}\n* Item 3 {7-8}\n"
+             "* Review the design A {1-2}\n* Review the design B {1-2}",
+             "Header\n* Item 2 {5-6}\n* Item 3 {7-8}\n"
+             "* Review the design C {1-2}"])
+        (_, predecessors) = history.predecessors(
+            self.find(history, 1, "Item 3"))
+        self.assertEqual(predecessors, [])
+        self.assertEqual(
+            [date for (date, _) in history.get_linear_history(
+                self.find(history, 1, "Item 3"))], [1])
+        (_, predecessors) = history.predecessors(
+            self.find(history, 3, "Review the design C"))
+        self.assertEqual(predecessors, [])
+
+    def test_exact_only(self):
+        """Check that fuzzy matching can be disabled."""
+        history = History(fuzzy_match_threshold=None)
+        for entry in self.RENAMED_HISTORY.entries():
+            history.add_entry(entry)
+        (_, predecessors) = history.predecessors(
+            self.find(history, 1, "Write the markdown parser"))
+        self.assertEqual(predecessors, [])
+
 if __name__ == '__main__':
     unittest.main()
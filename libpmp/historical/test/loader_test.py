@@ -0,0 +1,64 @@
+#! /usr/bin/env python3
+
+"""Tests for `loader`."""
+
+import os
+import tempfile
+import unittest
+
+from libpmp.historical.loader import history_from_md_files
+
+SNAPSHOTS = [
+    "Header\n* Item 1 {3-4}\n * Item 2 {5-6}",
+    "Header\n* Item 1 {7-8}\n * Item 2 {9-10}",
+    "Header\n* Item 1 {7-8} {9-10}",  # Malformed estimate.
+    "Header\n* Item 1 {1-2}\n * Item 2 {3-4}",
+]
+
+
+class LoaderTest(unittest.TestCase):
+    """Tests for `loader`."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.paths = []
+        for (i, text) in enumerate(SNAPSHOTS):
+            path = os.path.join(self.tempdir.name, "snapshot%d.md" % i)
+            with open(path, "w") as md_file:
+                md_file.write(text)
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def check_history(self, history, failures):
+        """Check the result of loading `SNAPSHOTS`."""
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(failures[0][0], self.paths[2])
+        self.assertIsInstance(failures[0][1], ValueError)
+        self.assertEqual([entry["date"] for entry in history.entries()],
+                         [0, 1, 3])
+        item = history.most_recent_model().find_descendant(
+            lambda n: n.display_name == "Item 1")
+        self.assertEqual(item.distribution_text, "{1-2}")
+        self.assertAlmostEqual(item.final_cost().quantile(0.1), 1, delta=0.01)
+        (previous_date, predecessors) = history.predecessors(item)
+        self.assertEqual(previous_date, 1)
+        self.assertEqual(predecessors[0].distribution_text, "{7-8}")
+
+    def test_serial(self):
+        """Loading in-process skips the bad snapshot."""
+        self.check_history(*history_from_md_files(self.paths, jobs=1))
+
+    def test_processes(self):
+        """Loading in a process pool gives the same result."""
+        self.check_history(*history_from_md_files(self.paths, jobs=2))
+
+    def test_threads(self):
+        """Loading in a thread pool gives the same result."""
+        self.check_history(*history_from_md_files(self.paths, jobs=2,
+                                                  use_threads=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
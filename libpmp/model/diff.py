@@ -0,0 +1,59 @@
+"""Structural comparison of two versions of a model tree."""
+
+from collections import namedtuple
+
+Change = namedtuple(
+    "Change", [
+        "kind",  # "changed", "added" or "removed"
+        "old",   # The node in the old tree, or None if added.
+        "new",   # The node in the new tree, or None if removed.
+    ])
+
+
+def identifier(node):
+    """@return the string that identifies @p node across versions of a
+    model:  its node name if it has one, else its display name."""
+    return getattr(node, "node_name", None) or node.display_name
+
+
+def diff_trees(old, new):
+    """@return a list of `Change`s, each parent before its descendants,
+    that turn the tree at @p old into the tree at @p new.
+
+    Subtrees with equal `content_hash`es are skipped without being walked,
+    so the cost is proportional to the size of the changes (and of the
+    paths down to them) rather than of the trees.  A changed node is
+    reported along with each of its changed ancestors; children are paired
+    first by content hash and then by `identifier`, and any left unpaired
+    are reported as added or removed."""
+    if old.content_hash() == new.content_hash():
+        return []
+    result = [Change("changed", old, new)]
+    unmatched_old = list(old.children)
+    unmatched_new = []
+    by_hash = {}
+    for (i, child) in enumerate(unmatched_old):
+        by_hash.setdefault(child.content_hash(), []).append(i)
+    for child in new.children:
+        positions = by_hash.get(child.content_hash())
+        if positions:
+            unmatched_old[positions.pop(0)] = None
+        else:
+            unmatched_new.append(child)
+    unmatched_old = [child for child in unmatched_old if child is not None]
+
+    by_identifier = {}
+    for child in unmatched_old:
+        by_identifier.setdefault(identifier(child), []).append(child)
+    paired = set()
+    for child in unmatched_new:
+        candidates = by_identifier.get(identifier(child))
+        if candidates:
+            old_child = candidates.pop(0)
+            paired.add(id(old_child))
+            result += diff_trees(old_child, child)
+        else:
+            result.append(Change("added", None, child))
+    result += [Change("removed", child, None) for child in unmatched_old
+               if id(child) not in paired]
+    return result
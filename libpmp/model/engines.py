@@ -0,0 +1,279 @@
+"""Evaluation engines:  the ways `Node.cost` can add up the costs of the
+children of a node, trading speed for accuracy.
+
+ * "convolution" (the default) samples up to `resolution` intervals of
+   each addend (see `dist_add`);
+ * "fft" convolves every unit interval of each addend, by FFT;
+ * "montecarlo" sums `samples` random samples of each addend;
+ * "moments" sums means and variances, and fits a log-normal curve to them;
+ * "auto" picks one of the above for each subtree, by its size and the
+   kinds of estimates at its leaves (see `AutoEngine`).
+
+Discretized sums are stored in the engine's `precision` (see
+`NumericDistribution.with_precision`), though always computed in float64.
+
+Costs are memoized per engine (see `Engine.key`), so that the same model can
+be costed by several engines.  Nodes use the default engine (see
+`set_default_engine`) unless given another.
+"""
+
+import threading
+import weakref
+
+from libpmp.distributions.log_logistic import LogLogistic
+from libpmp.distributions.numeric import (
+    DEFAULT_PRECISION,
+    PRECISIONS,
+    NumericDistribution,
+)
+from libpmp.distributions.operations import (
+    ADD_RESOLUTION,
+    MONTE_CARLO_SAMPLES,
+    dist_add,
+    dist_add_fft,
+    dist_add_moments,
+    dist_add_montecarlo,
+)
+
+ENGINES = ("convolution", "fft", "montecarlo", "moments", "auto")
+
+DEFAULT_ENGINE = "convolution"
+
+# Default probability of each tail ignored when adding.
+DEFAULT_EPSILON = 0.01
+
+# `AutoEngine` adds by FFT when the sum will span more than this many unit
+# intervals, since beyond that `dist_add` samples only some of them.
+AUTO_FFT_WIDTH = 2 * ADD_RESOLUTION
+
+# `AutoEngine` approximates subtrees by their moments once they have at
+# least this many estimated leaves, none of them heavy-tailed.
+AUTO_MOMENTS_LEAVES = 200
+
+# Log-logistic estimates with a shape parameter (`beta`) of at most this
+# have infinite variance, so are too heavy-tailed to approximate by moments.
+_HEAVY_TAIL_BETA = 2
+
+# Map of {node: (content hash, estimates, heavy-tailed)} memoizing
+# `_leaf_summary` of the nodes it was last computed for.
+_LEAF_SUMMARIES = weakref.WeakKeyDictionary()
+_LEAF_SUMMARIES_LOCK = threading.Lock()
+
+
+class Engine:
+    """Base class of the engines.  Subclasses define `_add`."""
+
+    name = None
+
+    def __init__(self, epsilon=DEFAULT_EPSILON, precision=DEFAULT_PRECISION):
+        self.epsilon = epsilon
+        self.precision = precision
+
+    @property
+    def key(self):
+        """A hashable identifier of this engine and its precision, under
+        which the costs it computes are memoized."""
+        return (self.name, self.epsilon, self.precision)
+
+    def add(self, left, right):
+        """@return the distribution of the sum of random variables
+        distributed by @p left and @p right, stored in `precision`."""
+        total = self._add(left, right)
+        if isinstance(total, NumericDistribution):
+            return total.with_precision(self.precision)
+        return total
+
+    def _add(self, left, right):
+        """@return the sum as `add` does, in any precision."""
+        raise NotImplementedError("Engines must define _add.")
+
+    def for_subtree(self, node):  # pylint: disable = unused-argument
+        """@return the engine with which to add the costs of the children
+        (and own cost) of @p node."""
+        return self
+
+    def __repr__(self):
+        return "%s%r" % (type(self).__name__, self.key[1:])
+
+
+class ConvolutionEngine(Engine):
+    """Adds by `dist_add`, sampling up to @p resolution intervals of each
+    addend."""
+
+    name = "convolution"
+
+    def __init__(self, epsilon=DEFAULT_EPSILON, resolution=ADD_RESOLUTION,
+                 precision=DEFAULT_PRECISION):
+        super().__init__(epsilon, precision)
+        self.resolution = resolution
+
+    @property
+    def key(self):
+        return super().key + (self.resolution,)
+
+    def _add(self, left, right):
+        return dist_add(left, right, self.epsilon, self.resolution)
+
+
+class FftEngine(Engine):
+    """Adds by `dist_add_fft`."""
+
+    name = "fft"
+
+    def _add(self, left, right):
+        return dist_add_fft(left, right, self.epsilon)
+
+
+class MonteCarloEngine(Engine):
+    """Adds by `dist_add_montecarlo`, with @p samples samples."""
+
+    name = "montecarlo"
+
+    def __init__(self, epsilon=DEFAULT_EPSILON, samples=MONTE_CARLO_SAMPLES,
+                 precision=DEFAULT_PRECISION):
+        super().__init__(epsilon, precision)
+        self.samples = samples
+
+    @property
+    def key(self):
+        return super().key + (self.samples,)
+
+    def _add(self, left, right):
+        return dist_add_montecarlo(left, right, self.epsilon, self.samples)
+
+
+class MomentsEngine(Engine):
+    """Adds by `dist_add_moments`."""
+
+    name = "moments"
+
+    def _add(self, left, right):
+        return dist_add_moments(left, right)
+
+
+def _heavy_tailed(distribution):
+    return (isinstance(distribution, LogLogistic) and
+            distribution.beta <= _HEAVY_TAIL_BETA)
+
+
+def _leaf_summary(node):
+    """@return `(count, heavy)`:  the number of estimates within @p node, and
+    whether any of them is heavy-tailed.  Built from those of its children,
+    and memoized while its `content_hash` is unchanged, so that summarizing
+    every subtree of a tree takes a single walk of it."""
+    digest = node.content_hash()
+    with _LEAF_SUMMARIES_LOCK:
+        memo = _LEAF_SUMMARIES.get(node)
+    if memo is not None and memo[0] == digest:
+        return memo[1:]
+    count = 0
+    heavy = False
+    if node.distribution is not None:
+        count = 1
+        heavy = _heavy_tailed(node.distribution)
+    for child in node.children:
+        (child_count, child_heavy) = _leaf_summary(child)
+        count += child_count
+        heavy = heavy or child_heavy
+    with _LEAF_SUMMARIES_LOCK:
+        _LEAF_SUMMARIES[node] = (digest, count, heavy)
+    return (count, heavy)
+
+
+class AutoEngine(Engine):
+    """Picks an engine for each subtree:  moments for subtrees of at least
+    `AUTO_MOMENTS_LEAVES` estimates, none of them heavy-tailed; otherwise
+    convolution, or FFT for sums wider than `AUTO_FFT_WIDTH`."""
+
+    name = "auto"
+
+    def __init__(self, epsilon=DEFAULT_EPSILON, resolution=ADD_RESOLUTION,
+                 precision=DEFAULT_PRECISION):
+        super().__init__(epsilon, precision)
+        self._convolution = ConvolutionEngine(epsilon, resolution, precision)
+        self._fft = FftEngine(epsilon, precision)
+        self._moments = MomentsEngine(epsilon, precision)
+
+    @property
+    def key(self):
+        return super().key + (self._convolution.resolution,)
+
+    def for_subtree(self, node):
+        (count, heavy) = _leaf_summary(node)
+        if heavy or count < AUTO_MOMENTS_LEAVES:
+            return self
+        return self._moments
+
+    def _add(self, left, right):
+        width = sum(
+            dist.quantile(1 - self.epsilon) - dist.quantile(self.epsilon)
+            for dist in (left, right))
+        if width > AUTO_FFT_WIDTH:
+            return self._fft.add(left, right)
+        return self._convolution.add(left, right)
+
+
+def make_engine(name=DEFAULT_ENGINE, epsilon=DEFAULT_EPSILON,
+                resolution=ADD_RESOLUTION, samples=MONTE_CARLO_SAMPLES,
+                precision=DEFAULT_PRECISION):
+    """@return the engine called @p name (one of `ENGINES`), with those of
+    the precision arguments that it uses, storing sums in @p precision (one
+    of `PRECISIONS`)."""
+    if name == "convolution":
+        return ConvolutionEngine(epsilon, resolution, precision)
+    if name == "fft":
+        return FftEngine(epsilon, precision)
+    if name == "montecarlo":
+        return MonteCarloEngine(epsilon, samples, precision)
+    if name == "moments":
+        return MomentsEngine(epsilon, precision)
+    if name == "auto":
+        return AutoEngine(epsilon, resolution, precision)
+    raise ValueError("Unknown engine %s" % name)
+
+
+_default_engine = make_engine()
+
+
+def default_engine():
+    """@return the engine used by nodes not given one."""
+    return _default_engine
+
+
+def set_default_engine(engine):
+    """Make @p engine the one used by nodes not given one."""
+    global _default_engine  # pylint: disable = global-statement
+    _default_engine = engine
+
+
+def add_engine_arguments(parser):
+    """Add the command line arguments that select an engine (see
+    `engine_from_args`) to the argparse @p parser."""
+    parser.add_argument('--engine', choices=ENGINES, default=DEFAULT_ENGINE,
+                        help='how to add up costs:  trading speed for '
+                             'accuracy, or "auto" to choose per subtree')
+    parser.add_argument('--epsilon', type=float, default=DEFAULT_EPSILON,
+                        help='probability of each tail of a cost ignored '
+                             'when adding it')
+    parser.add_argument('--add-resolution', type=int,
+                        default=ADD_RESOLUTION,
+                        help='intervals of each cost sampled by the '
+                             'convolution engine')
+    parser.add_argument('--samples', type=int, default=MONTE_CARLO_SAMPLES,
+                        help='samples of each cost drawn by the montecarlo '
+                             'engine')
+    parser.add_argument('--precision', choices=PRECISIONS,
+                        default=DEFAULT_PRECISION,
+                        help='precision in which discretized costs are '
+                             'stored; lower saves memory')
+
+
+def engine_from_args(args):
+    """@return the engine selected by the command line @p args (see
+    `add_engine_arguments`; any of which may be absent)."""
+    return make_engine(
+        getattr(args, "engine", DEFAULT_ENGINE),
+        getattr(args, "epsilon", DEFAULT_EPSILON),
+        getattr(args, "add_resolution", ADD_RESOLUTION),
+        getattr(args, "samples", MONTE_CARLO_SAMPLES),
+        getattr(args, "precision", DEFAULT_PRECISION))
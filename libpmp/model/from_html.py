@@ -90,6 +90,7 @@ def process_tree(parent_node):
     if len(possible_data) > 1:
         raise RuntimeError('multiple estimates found in one block')
     elif len(possible_data) == 1:
+        parent_node.distribution_text = possible_data[0]
         parent_node.distribution = node.make_distribution(possible_data[0])
 
 
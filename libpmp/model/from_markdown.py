@@ -26,7 +26,9 @@ class MarkdownNode(libpmp.model.node.Node):
         self.ast = None  # Markdown AST node corresponding to this.
         self.display_name = ""
         self.node_name = None  # To unify the same node across multiple models.
-        self.distribution_text = None  # For testing purposes.
+
+    def _content_fields(self):
+        return super()._content_fields() + (self.level,)
 
 
 class NodeParser(commonmark.render.renderer.Renderer):
@@ -209,3 +211,30 @@ def from_markdown(markdown_text):
     collapse_empty(model_root)
     process_tree(model_root)
     return model_root
+
+
+def pack_tree(node):
+    """Return a compact, picklable form of the `MarkdownNode` tree at
+    @p node, suitable for shipping between processes.  The markdown AST is
+    not included; see `unpack_tree`."""
+    return (node.tag, node.level, node.data, node.display_name,
+            node.node_name, node.distribution_text, node.distribution,
+            tuple(pack_tree(child) for child in node.children))
+
+
+def unpack_tree(packed, parent=None):
+    """Rebuild a `MarkdownNode` tree from the result of `pack_tree`.  The
+    rebuilt nodes have no `ast`, so AST-based reports cannot use them."""
+    (tag, level, data, display_name, node_name, distribution_text,
+     distribution, children) = packed
+    node = MarkdownNode()
+    node.tag = tag
+    node.level = level
+    node.data = data
+    node.display_name = display_name
+    node.node_name = node_name
+    node.distribution_text = distribution_text
+    node.distribution = distribution
+    node.parent = parent
+    node.children = [unpack_tree(child, node) for child in children]
+    return node
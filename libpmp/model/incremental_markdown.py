@@ -0,0 +1,195 @@
+"""Incremental re-parsing of markdown text that changes a little at a time.
+
+`IncrementalParser` splits the document into sections at its top-level
+headings and remembers the model built from each section, keyed by a hash of
+the section's text.  When the document is parsed again, sections whose text
+is unchanged keep their `MarkdownNode` subtrees (and so their fitted
+distributions and memoized costs); only the changed sections are rebuilt,
+and only the headings above a change have their costs recomputed.
+
+NOTE:  The commonmark parse itself still covers the whole text; it is cheap
+compared to curve fitting and cost evaluation, which are what get reused.
+Each section's model is built as if the section stood alone, which differs
+from `from_markdown` only for headings nested inside other blocks.
+"""
+
+import hashlib
+
+import commonmark
+import commonmark.blocks
+import commonmark.node
+
+from libpmp.model.from_markdown import (
+    MarkdownNode,
+    NodeParser,
+    collapse_empty,
+    process_tree,
+)
+
+
+class _Section:
+    """The AST blocks and model nodes built from one section of text: either
+    a top-level heading and everything up to the next one, or the preamble
+    before the first heading."""
+
+    def __init__(self, digest, blocks):
+        self.digest = digest
+        self.blocks = blocks
+        self.heading = None  # The heading node, or None for the preamble.
+        self.content = []  # The non-heading children of the section.
+        self.child_headings = None  # Heading children as of the last parse.
+        self.fresh = True  # True iff built during the current parse.
+
+        section_ast = commonmark.node.Node("document", [[1, 1], [0, 0]])
+        for block in blocks:
+            section_ast.append_child(block)
+        parser = NodeParser()
+        parser.render(section_ast)
+        section_root = parser.root
+        if blocks and blocks[0].t == "heading":
+            self.heading = section_root.children[0]
+            # Headings nested in other blocks can escape the section's
+            # heading; keep them in the section anyway.
+            for stray in section_root.children[1:]:
+                stray.parent = self.heading
+                self.heading.children.append(stray)
+            collapse_empty(self.heading)
+            process_tree(self.heading)
+            self.content = self.heading.children
+        else:
+            collapse_empty(section_root)
+            process_tree(section_root)
+            self.content = section_root.children
+
+
+class IncrementalParser:
+    """Parses successive versions of a markdown document, reusing the model
+    of every section whose text has not changed since the previous parse.
+
+    Each call to `parse` returns a model equivalent to `from_markdown`'s;
+    the model returned by the previous call shares nodes with it and must
+    not be used afterwards.
+    """
+
+    def __init__(self):
+        self._sections = {}  # Map of {digest: [_Section]} from the last parse.
+        self._root = None
+        self._root_children = None
+        self.sections_reused = 0  # Statistics for the most recent parse.
+        self.sections_rebuilt = 0
+
+    def parse(self, markdown_text):
+        """Parse @p markdown_text into a `model.Node` tree, reusing what we
+        can from the previous call."""
+        document = commonmark.blocks.Parser().parse(markdown_text)
+        sections = self._sections_of(document, markdown_text.split("\n"))
+        self._sections = {}
+        for section in sections:
+            self._sections.setdefault(section.digest, []).append(section)
+        self.sections_reused = sum(not s.fresh for s in sections)
+        self.sections_rebuilt = sum(s.fresh for s in sections)
+
+        # Move the blocks of every section, reused or not, into the new AST.
+        for section in sections:
+            for block in section.blocks:
+                document.append_child(block)
+
+        changed = any(section.fresh for section in sections)
+        if self._root is None:
+            self._root = MarkdownNode()
+            self._root.tag = 'root'
+            self._root.level = 0
+            changed = True
+        root = self._root
+        root.ast = document
+
+        children = []
+        frames = self._nest(sections)
+        for (section, child_frames) in frames:
+            if section.heading is None:
+                for node in section.content:
+                    node.parent = root
+                children += section.content
+            else:
+                changed |= self._materialize(section, child_frames)
+                children.append(section.heading)
+        children = [child for child in children
+                    if child.data or child.children]
+        for child in children:
+            child.parent = root
+        if changed or children != self._root_children:
+            root.forget_cost()
+        root.children = children
+        self._root_children = list(children)
+        return root
+
+    def _sections_of(self, document, lines):
+        """Split the top-level blocks of @p document into sections, reusing
+        prior sections where the text of @p lines is unchanged."""
+        groups = [[]]
+        block = document.first_child
+        while block is not None:
+            if block.t == "heading" and groups[-1]:
+                groups.append([])
+            groups[-1].append(block)
+            block = block.nxt
+        if not groups[-1]:
+            return []
+
+        sections = []
+        starts = [group[0].sourcepos[0][0] for group in groups]
+        ends = starts[1:] + [len(lines) + 1]
+        for (group, start, end) in zip(groups, starts, ends):
+            text = "\n".join(lines[start - 1:end - 1])
+            digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+            candidates = self._sections.get(digest)
+            if candidates:
+                section = candidates.pop()
+                section.fresh = False
+                for block in group:  # Superseded by the section's own AST.
+                    block.unlink()
+            else:
+                section = _Section(digest, group)
+            sections.append(section)
+        return sections
+
+    @staticmethod
+    def _nest(sections):
+        """@return the heading structure of @p sections as a list of
+        `(section, [child frames])` frames, mirroring `NodeParser.heading`."""
+        frames = []
+        stack = []  # Open (level, child frame list) pairs.
+        for section in sections:
+            if section.heading is None:
+                frames.append((section, []))
+                continue
+            level = section.heading.level
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            siblings = stack[-1][1] if stack else frames
+            child_frames = []
+            siblings.append((section, child_frames))
+            stack.append((level, child_frames))
+        return frames
+
+    def _materialize(self, section, child_frames):
+        """Attach the heading nodes of @p child_frames beneath @p section's
+        heading, recursively.  @return True iff anything in the subtree
+        changed, in which case the heading's memoized cost is dropped."""
+        heading = section.heading
+        changed = section.fresh
+        child_headings = []
+        for (child_section, grandchild_frames) in child_frames:
+            changed |= self._materialize(child_section, grandchild_frames)
+            child = child_section.heading
+            if child.data or child.children:
+                child_headings.append(child)
+        if child_headings != section.child_headings:
+            changed = True
+        section.child_headings = child_headings
+        heading.children = section.content + child_headings
+        for child in heading.children:
+            child.parent = heading
+        if changed:
+            heading.forget_cost()
+        return changed
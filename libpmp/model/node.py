@@ -1,11 +1,19 @@
 """The tree structure representing work to be estimated."""
 
-from collections import namedtuple
+import copy
+import functools
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
 
+from libpmp.common import profiling
+from libpmp.distributions import wire
 from libpmp.distributions.distribution import ZERO
 from libpmp.distributions.log_logistic import LogLogistic
-from libpmp.distributions.operations import dist_add, dist_scale
+from libpmp.distributions.numeric import NumericDistribution
+from libpmp.distributions.operations import dist_scale
 from libpmp.distributions.point_distribution import PointDistribution
+from libpmp.model import engines
 
 CostConfig = namedtuple(
     "CostConfig", [
@@ -13,6 +21,30 @@ CostConfig = namedtuple(
         "resource_costs"  # map of {resource, cost_units_per_resource_unit}
     ])
 
+# Maximum number of estimate expressions whose distributions are kept (see
+# `make_distribution`).
+ESTIMATE_CACHE_SIZE = 10000
+
+# Maximum number of entries in the cost cache shared by all nodes.
+SHARED_COST_CACHE_SIZE = 100000
+
+# Map of {(content hash, config, engine key): (cost, prefix costs)} of final
+# costs (see `Node.prefix_costs` and `engines.Engine.key`), shared by every
+# tree in the process so that, eg, identical subtrees of successive snapshots
+# in a `History` are costed once.  Least recently used entries are dropped
+# first.
+_SHARED_COSTS = OrderedDict()
+
+# Held while reading or updating `_SHARED_COSTS`, which threads (eg of the
+# server) share.
+_SHARED_COSTS_LOCK = threading.Lock()
+
+# Attributes of a node that are the same for every node with its content
+# (see `Node.content_hash`), so that copies may share them (see `Node.clone`).
+_PAYLOAD_FIELDS = ("tag", "data", "resource", "distribution",
+                   "distribution_text", "_content_hash", "_memoized_cost",
+                   "_memoized_prefixes")
+
 
 class Node:
     """
@@ -40,7 +72,10 @@ class Node:
         self.display_name = None
         self.resource = ""
         self.distribution = None
+        self.distribution_text = None  # The estimate text, if parsed.
         self._memoized_cost = {}
+        self._memoized_prefixes = {}
+        self._content_hash = None
         self.parser_diag = None
 
     def get_display_name(self):
@@ -93,6 +128,36 @@ class Node:
                 return result
         return None
 
+    def _content_fields(self):
+        """@return the attributes of this node (not its children) that
+        `content_hash` covers.  Subclasses with more content add to it."""
+        distribution_text = self.distribution_text
+        if self.distribution is not None and distribution_text is None:
+            # An estimate not from text is identified by its encoding, or
+            # failing that by identity.
+            try:
+                distribution_text = wire.encode(self.distribution)
+            except TypeError:
+                distribution_text = "<%x>" % id(self.distribution)
+        return (type(self).__name__, self.tag, self.c_class, self.data,
+                self.resource, distribution_text)
+
+    def content_hash(self):
+        """@return a digest of the content of this subtree:  the text,
+        estimate and resource of each node, and the tree structure.  Equal
+        hashes mean equal costs, and are used to share costs between trees
+        and to diff them.  Like `final_cost`, assumes that the subtree does
+        not change after a call, and thus memoizes the result."""
+        if self._content_hash is None:
+            content = hashlib.sha1()
+            for field in self._content_fields():
+                content.update(repr(field).encode("utf-8"))
+                content.update(b"\0")
+            for child in self.children:
+                content.update(child.content_hash())
+            self._content_hash = content.digest()
+        return self._content_hash
+
     def has_cost(self):
         """Return True iff this node has any cost."""
         self.check_valid()
@@ -100,42 +165,138 @@ class Node:
             return True
         return any(child.has_cost() for child in self.children)
 
-    def final_cost(self, config=None):
+    def final_cost(self, config=None, engine=None):
         """Like 'cost', but assumes that no changes can be made after a call,
         and thus memoizes the result."""
         self.check_valid()
-        return self._cost_raw(config, final=True)
+        return self._cost_raw(config, engine or engines.default_engine(),
+                              final=True)
 
-    def cost(self, config=None):
-        """Computes the cost of this node."""
+    def cost(self, config=None, engine=None):
+        """Computes the cost of this node, adding up costs with @p engine
+        (see `engines`; by default, `engines.default_engine()`)."""
         self.check_valid()
-        return self._cost_raw(config, final=False)
+        return self._cost_raw(config, engine or engines.default_engine(),
+                              final=False)
+
+    def forget_cost(self):
+        """Discard the memoized costs and content hash of this node (but not
+        of its descendants).  For use by parsers that reuse nodes across
+        parses."""
+        self._memoized_cost = {}
+        self._memoized_prefixes = {}
+        self._content_hash = None
 
-    def _cost_raw(self, config, final):
+    def clone(self, payloads=None):
+        """@return a copy of this subtree, as a separate tree (its root has
+        no parent), sharing the distributions of its nodes and starting with
+        copies of their memoized costs.
+
+        If @p payloads, a map of {content hash: node}, is given, the copy of
+        each node with the content of one in it instead shares that node's
+        estimate, texts and memoized costs (which are the same for both);
+        the other copies are added to it."""
+        result = copy.copy(self)
+        result.parent = None
+        kept = (None if payloads is None
+                else payloads.get(self.content_hash()))
+        if kept is None:
+            result._memoized_cost = dict(self._memoized_cost)
+            result._memoized_prefixes = dict(self._memoized_prefixes)
+            if payloads is not None:
+                payloads[self.content_hash()] = result
+        else:
+            for name in _PAYLOAD_FIELDS:
+                setattr(result, name, getattr(kept, name))
+        result.children = []
+        for child in self.children:
+            child_clone = child.clone(payloads)
+            child_clone.parent = result
+            result.children.append(child_clone)
+        return result
+
+    def prefix_costs(self, config=None, engine=None):
+        """@return a list with, for each child in order, the sum of the final
+        costs of that child and all of the children before it.  These are
+        the partial sums made on the way to `final_cost` (which then adds
+        this node's own distribution, if any), and are memoized with it."""
+        engine = engine or engines.default_engine()
+        self.final_cost(config, engine)
+        return self._memoized_prefixes[(config, engine.key)]
+
+    def _own_cost(self, config):
+        """Return the cost of this node's own distribution (not counting its
+        children) under @p config, or None if it has none."""
+        if not config or self.distribution is None:
+            return self.distribution
+        multiplier = config.resource_costs.get(self.resource, 0)
+        if multiplier > 0:
+            return dist_scale(self.distribution, multiplier)
+        return None
+
+    def _memoized_final_cost(self, memo_key):
+        """Return the memoized final cost of this node under @p memo_key (a
+        `(config, engine key)` pair), from its own memo or another tree's
+        with the same content, or None."""
+        if memo_key in self._memoized_cost:
+            result = self._memoized_cost[memo_key]
+        else:
+            shared_key = (self.content_hash(),) + memo_key
+            with _SHARED_COSTS_LOCK:
+                if shared_key not in _SHARED_COSTS:
+                    return None
+                _SHARED_COSTS.move_to_end(shared_key)
+                (result, prefixes) = _SHARED_COSTS[shared_key]
+            self._memoized_cost[memo_key] = result
+            self._memoized_prefixes[memo_key] = prefixes
+        if profiling.ENABLED:
+            profiling.record_memo_hit(self)
+        return result
+
+    def _cost_raw(self, config, engine, final):
         """Return the "cost" of this node, with resource costs defined by the
-        given config.  If no config is given, all resources are treated as
-        cost 1.  Memoizes (and uses memos) iff @p final is True."""
+        given config, added up by @p engine.  If no config is given, all
+        resources are treated as cost 1.  Memoizes (and uses memos) iff
+        @p final is True."""
+        memo_key = (config, engine.key)
         if final:
-            if config in self._memoized_cost:
-                return self._memoized_cost[config]
-
-        cost_so_far = self.distribution
-        if config:
-            multiplier = config.resource_costs.get(self.resource, 0)
-            if multiplier > 0:
-                cost_so_far = dist_scale(cost_so_far, multiplier)
-            else:
-                cost_so_far = None
+            result = self._memoized_final_cost(memo_key)
+            if result is not None:
+                return result
+        start = profiling.clock() if profiling.ENABLED else None
+
+        # Sum the children first, so that the partial sums are the prefix
+        # costs, and only then add our own cost.
+        adder = engine.for_subtree(self)
+        cost_so_far = None
+        prefixes = []
         for child in self.children:
-            child_cost = child._cost_raw(config, final)
+            child_cost = child._cost_raw(config, engine, final)
             if cost_so_far is None or child_cost is None:
                 cost_so_far = cost_so_far or child_cost
             else:
-                cost_so_far = dist_add(cost_so_far, child_cost)
+                cost_so_far = adder.add(cost_so_far, child_cost)
+            prefixes.append(cost_so_far or ZERO)
+
+        own_cost = self._own_cost(config)
+        if cost_so_far is None or own_cost is None:
+            cost_so_far = cost_so_far or own_cost
+        else:
+            cost_so_far = adder.add(cost_so_far, own_cost)
 
         result = cost_so_far or ZERO
         if final:
-            self._memoized_cost[config] = result
+            self._memoized_cost[memo_key] = result
+            self._memoized_prefixes[memo_key] = prefixes
+            shared_key = (self.content_hash(),) + memo_key
+            with _SHARED_COSTS_LOCK:
+                _SHARED_COSTS[shared_key] = (result, prefixes)
+                while len(_SHARED_COSTS) > SHARED_COST_CACHE_SIZE:
+                    _SHARED_COSTS.popitem(last=False)
+        if start is not None:
+            profiling.record_node(
+                self, start, grid=(result.num_buckets() if isinstance(
+                    result, NumericDistribution) else None))
         return result
 
     def pretty_print(self, prefix=""):
@@ -164,9 +325,12 @@ def fit_curve(value_10, value_75):
     return LogLogistic.fit(0.1, value_10, 0.75, value_75)
 
 
+@functools.lru_cache(maxsize=ESTIMATE_CACHE_SIZE)
 def make_distribution(data):
     """Constructs the distribution corresponding to the estimate expression
-    string in @p data."""
+    string in @p data.  Distributions are immutable, so each expression is
+    parsed (and its curve fitted) once, and its distribution shared by every
+    estimate written the same way."""
     values = data[1:-1].split('-')
     if len(values) == 1:
         return PointDistribution({float(values[0]): 1.0})
@@ -1,20 +1,20 @@
-"""Methods to generate plots from node distributions."""
+"""Methods to generate plots from node distributions.
 
-from io import BytesIO
-from operator import itemgetter
+Each kind of plot is made in two steps:  a `*_data` function samples the
+node's distributions into a picklable map, and a `plot_*` function draws
+that map onto matplotlib axes.  Only the first step needs the model, so the
+second can be run in other processes (see `libpmp.common.plot_pool`).
+"""
 
-from matplotlib import pyplot as plt
-from numpy import linspace
-from scipy.interpolate import interp1d
+from numpy import linspace, ones_like
 
 from libpmp.common import text
-from libpmp.distributions import distribution
-from libpmp.distributions.operations import dist_add
+from libpmp.common.plot_pool import plot_options, render_svgs
 
-# Number of samples from distribution to be plotted, pre-interpolation.
+# Number of samples of the boundaries of the filled areas of a plot.
 NUM_SAMPLES = 100
 
-# Number of interpolated values in plot.
+# Number of samples of each curve in a plot.
 GRAPH_RESOLUTION = 1000
 
 
@@ -26,34 +26,45 @@ def bounds_for_plotting(dist):
     return 0, high_x + margin
 
 
-def cdf_prep(node, _):
-    """Write a graph of the cdf of @p node to the current pyplot."""
+def cdf_data(node):
+    """@return the data for `plot_cdf` of the cdf of @p node."""
     # pylint: disable = invalid-name
-    plt.xkcd()
     cost = node.final_cost()
     (x_min, x_max) = bounds_for_plotting(cost)
-    xs = linspace(x_min, x_max, NUM_SAMPLES, endpoint=True)
-    ys = [cost.cdf(x) for x in xs]
-    cubic_y = interp1d(xs, ys, kind="cubic")
-    xs_dense = linspace(x_min, x_max, GRAPH_RESOLUTION, endpoint=True)
-    plt.plot(xs_dense, cubic_y(xs_dense), '-')
+    xs = linspace(x_min, x_max, GRAPH_RESOLUTION, endpoint=True)
+    return {"xs": xs, "ys": cost.cdf_array(xs)}
+
+
+def plot_cdf(data, axes):
+    """Draw the cdf described by @p data (see `cdf_data`) onto @p axes."""
+    axes.plot(data["xs"], data["ys"], '-')
+
+
+def cdf_prep(node, _):
+    """Write a graph of the cdf of @p node to the current pyplot."""
+    # pylint: disable = import-outside-toplevel
+    from matplotlib import pyplot as plt
+    plt.xkcd()
+    plot_cdf(cdf_data(node), plt.axes())
 
 
 def cdf_svg(node, args, multi=False):
-    """Obtain a byte array representing an svg plot of the CDF of @p node."""
-    plt.clf()
+    """Obtain a string of svg data for a plot of the CDF of @p node, drawn
+    as selected by @p args (see `plot_pool.plot_options`)."""
+    (svg,) = render_svgs([cdf_job(node, args, multi)], **plot_options(args))
+    return svg
+
+
+def cdf_job(node, _, multi=False):
+    """@return a `plot_pool` job for a plot of the CDF of @p node."""
     if multi:
-        multi_cdf_prep(node, args)
-    else:
-        cdf_prep(node, args)
-    figure_bytes = BytesIO()
-    plt.savefig(figure_bytes, format="svg")
-    return figure_bytes.getvalue().decode("utf-8")
+        return (plot_multi_cdf, multi_cdf_data(node))
+    return (plot_cdf, cdf_data(node))
 
 
-def multi_cdf_prep(node, _):
-    """Plot the CDF of @p node, with subdivisions representing the sequence of
-    child nodes.
+def multi_cdf_data(node):
+    """@return the data for `plot_multi_cdf` of the CDF of @p node, with
+    subdivisions representing the sequence of child nodes.
 
     NOTE: The subdivision plots, though pretty, are not mathematically
     well-founded: Later plots gain more central-limit-theorem love than
@@ -61,61 +72,78 @@ def multi_cdf_prep(node, _):
     overattributed to the earlier subtasks and underattributed to the later
     ones.
     """
-    # pylint: disable = invalid-name, too-many-locals
-    plt.xkcd()  # Represent approximate/unfounded estimates with xkcd art.
-    axes = plt.axes()
-    axes.set_xlabel("Cost of \"" + text.pretty_truncate(node.data, 35) + "\"")
-    axes.set_ylabel("Likelihood")
-    colors = ["red", "blue", "black"]
-    hatches = ["/", "\\", "o", "-"]
-
+    # pylint: disable = invalid-name
     total_cost = node.final_cost()
-    axes.set_title(" : ".join("%d" % round(node.final_cost().quantile(q / 100))
-                              for q in (10, 25, 50, 75, 90)))
+    title = " : ".join("%d" % round(total_cost.quantile(q / 100))
+                       for q in (10, 25, 50, 75, 90))
 
-    cost_so_far = distribution.ZERO
     (x_min, x_max) = bounds_for_plotting(total_cost)
-    xs = linspace(x_min, x_max, NUM_SAMPLES, endpoint=True)
     curves = []  # List of maps with params for the curves, from left to right.
-    nodes_to_plot = [child for child in node.children if child.has_cost()]
-    for to_plot in nodes_to_plot:
-        cost_so_far = dist_add(cost_so_far, to_plot.final_cost())
-        # Precompute the distribution to avoid having to cache it.
-        ys = [cost_so_far.cdf(x) for x in xs]
-        precomputed_cdf = interp1d(xs, ys, kind="cubic")
-        curves.append({"y": precomputed_cdf,
+    # The running sums of the children's costs were already made by
+    # `final_cost`; reuse them.
+    for (to_plot, cost_so_far) in zip(node.children, node.prefix_costs()):
+        if not to_plot.has_cost():
+            continue
+        curves.append({"y": cost_so_far.cdf_array,
                        "x_min": max(x_min, cost_so_far.quantile(0.001)),
                        "x_max": min(x_max, cost_so_far.quantile(0.999)),
                        "label": to_plot.get_display_name()})
     if node.distribution:
         # Direct cost in a node with costly children: Odd but not prohibited.
-        curves.append({"y": total_cost, "x_min": x_min, "x_max": x_max,
+        curves.append({"y": total_cost.cdf_array,
+                       "x_min": x_min, "x_max": x_max,
                        "label": node.get_display_name()})
 
-    legend = []
-    prior_curve = {"x_min": x_min, "x_max": x_max, "y": lambda _: 1.0}
-    do_legend = len(curves) > 1
-    for curve_desc in curves:
-        y, x_min, x_max = itemgetter("y", "x_min", "x_max")(curve_desc)
-        if do_legend:
-            legend.append(text.pretty_truncate(curve_desc["label"], 20))
-
+    # Sample every curve, and its fill back to the prior curve, now.
+    samples = []
+    prior_curve = {"x_min": x_min, "x_max": x_max, "y": ones_like}
+    for curve in curves:
+        xs_dense = linspace(curve["x_min"], curve["x_max"], GRAPH_RESOLUTION,
+                            endpoint=True)
+        xs_sparse = linspace(prior_curve["x_min"], curve["x_max"],
+                             NUM_SAMPLES, endpoint=True)
+        samples.append({
+            "xs": xs_dense,
+            "ys": curve["y"](xs_dense),
+            "fill_xs": xs_sparse,
+            "fill_lower": prior_curve["y"](xs_sparse),
+            "fill_upper": curve["y"](xs_sparse),
+            "label": text.pretty_truncate(curve["label"], 20),
+        })
+        prior_curve = curve
+    return {"xlabel": "Cost of \"" + text.pretty_truncate(node.data, 35) +
+                      "\"",
+            "title": title,
+            "curves": samples,
+            "legend": len(samples) > 1}
+
+
+def plot_multi_cdf(data, axes):
+    """Draw the subdivided CDF described by @p data (see `multi_cdf_data`)
+    onto @p axes."""
+    axes.set_xlabel(data["xlabel"])
+    axes.set_ylabel("Likelihood")
+    axes.set_title(data["title"])
+    colors = ["red", "blue", "black"]
+    hatches = ["/", "\\", "o", "-"]
+    for curve in data["curves"]:
         # Make a smooth plot of the interpolated line.
-        xs_dense = linspace(x_min, x_max, GRAPH_RESOLUTION, endpoint=True)
-        axes.plot(xs_dense, [y(x) for x in xs_dense], '-', color=colors[0])
-
+        axes.plot(curve["xs"], curve["ys"], '-', color=colors[0])
         # Roughly fill in the space to the prior curve.
-        xs_sparse = linspace(prior_curve["x_min"], x_max, NUM_SAMPLES,
-                             endpoint=True)
-        axes.fill_between(xs_sparse,
-                          [prior_curve["y"](x) for x in xs_sparse],
-                          [y(x) for x in xs_sparse],
-                          hatch=hatches[0],
+        axes.fill_between(curve["fill_xs"], curve["fill_lower"],
+                          curve["fill_upper"], hatch=hatches[0],
                           edgecolor=colors[0], facecolor="white")
-
         # Rotate state for the next plot.
         colors = colors[1:] + colors[0:1]
         hatches = hatches[1:] + hatches[0:1]
-        prior_curve = curve_desc
-    if do_legend:
-        axes.legend(legend)
+    if data["legend"]:
+        axes.legend([curve["label"] for curve in data["curves"]])
+
+
+def multi_cdf_prep(node, _):
+    """Plot the CDF of @p node, with subdivisions representing the sequence of
+    child nodes, to the current pyplot.  See `multi_cdf_data`."""
+    # pylint: disable = import-outside-toplevel
+    from matplotlib import pyplot as plt
+    plt.xkcd()  # Represent approximate/unfounded estimates with xkcd art.
+    plot_multi_cdf(multi_cdf_data(node), plt.axes())
@@ -0,0 +1,73 @@
+#! /usr/bin/env python3
+
+"""Tests for `diff` and the content hashes it relies on."""
+
+import unittest
+
+from libpmp.model.diff import diff_trees
+from libpmp.model.from_markdown import from_markdown
+
+
+class DiffTest(unittest.TestCase):
+    """Tests for `diff_trees` and `Node.content_hash`."""
+
+    OLD_MD = """\
+# Parsing
+
+ * Lexer {4-8}
+ * Grammar {8-20}
+
+# Testing
+
+ * Unit tests {4-8}
+"""
+
+    NEW_MD = """\
+# Parsing
+
+ * Lexer {4-8}
+ * Grammar {8-30}
+
+# Testing
+
+ * Unit tests {4-8}
+ * Fuzzing {2-3}
+
+# Docs
+"""
+
+    def test_content_hash(self):
+        """Identical subtrees hash alike, and share their costs."""
+        old = from_markdown(self.OLD_MD)
+        new = from_markdown(self.NEW_MD)
+        self.assertEqual(old.children[0].children[0].content_hash(),
+                         new.children[0].children[0].content_hash())
+        self.assertNotEqual(old.children[0].content_hash(),
+                            new.children[0].content_hash())
+        self.assertNotEqual(old.content_hash(), new.content_hash())
+        self.assertIs(old.children[0].children[0].final_cost(),
+                      new.children[0].children[0].final_cost())
+        self.assertIsNot(old.children[0].final_cost(),
+                         new.children[0].final_cost())
+
+    def test_diff(self):
+        """Only the changed parts of the trees are reported."""
+        old = from_markdown(self.OLD_MD)
+        new = from_markdown(self.NEW_MD)
+        self.assertEqual(diff_trees(old, from_markdown(self.OLD_MD)), [])
+        changes = [(change.kind,
+                    change.old and change.old.data,
+                    change.new and change.new.data)
+                   for change in diff_trees(old, new)]
+        self.assertEqual(changes, [
+            ("changed", "", ""),
+            ("changed", "Parsing", "Parsing"),
+            ("changed", "Grammar {8-20}", "Grammar {8-30}"),
+            ("changed", "Testing", "Testing"),
+            ("added", None, "Fuzzing {2-3}"),
+            ("added", None, "Docs"),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#! /usr/bin/env python3
+
+"""Tests for `engines`."""
+
+import argparse
+import unittest
+from unittest import mock
+
+from parameterized import parameterized
+
+from libpmp.model import engines
+from libpmp.model.from_markdown import from_markdown
+
+ENGINES_TO_TEST = [[name] for name in engines.ENGINES]
+
+
+class EnginesTest(unittest.TestCase):
+    """Tests for `engines`."""
+
+    MODEL_MD = """\
+# Project
+* First {10-20}
+* Second {20-40}
+* Third {100-200}
+"""
+
+    @parameterized.expand(ENGINES_TO_TEST)
+    def test_engines_agree(self, name):
+        """Every engine roughly agrees with the default on the median."""
+        project = from_markdown(self.MODEL_MD).children[0]
+        expected = project.final_cost().quantile(0.5)
+        engine = engines.make_engine(name)
+        self.assertAlmostEqual(
+            project.final_cost(engine=engine).quantile(0.5), expected,
+            delta=0.05 * expected)
+
+    def test_memoized_per_engine(self):
+        """Costs are memoized separately for each engine and precision."""
+        project = from_markdown(self.MODEL_MD).children[0]
+        fft = engines.make_engine("fft")
+        self.assertIsNot(project.final_cost(engine=fft), project.final_cost())
+        self.assertIs(project.final_cost(engine=engines.make_engine("fft")),
+                      project.final_cost(engine=fft))
+        self.assertIsNot(
+            project.final_cost(engine=engines.make_engine("fft", 0.02)),
+            project.final_cost(engine=fft))
+        self.assertIs(project.prefix_costs(engine=fft)[-1],
+                      project.final_cost(engine=fft))
+
+    def test_default_engine(self):
+        """Nodes use the default engine unless given another."""
+        project = from_markdown(self.MODEL_MD).children[0]
+        fft = engines.make_engine("fft")
+        engines.set_default_engine(fft)
+        try:
+            self.assertIs(project.final_cost(),
+                          project.final_cost(engine=fft))
+        finally:
+            engines.set_default_engine(engines.make_engine())
+
+    def test_auto(self):
+        """The auto engine approximates large light-tailed subtrees by their
+        moments, but not small or heavy-tailed ones."""
+        auto = engines.make_engine("auto")
+        project = from_markdown(self.MODEL_MD).children[0]
+        self.assertIs(auto.for_subtree(project), auto)
+        many = "# Many\n" + "* Task {20-30}\n" * engines.AUTO_MOMENTS_LEAVES
+        many_root = from_markdown(many)
+        self.assertEqual(auto.for_subtree(many_root).name, "moments")
+        heavy = many + "* Research {1-100}\n"
+        self.assertIs(auto.for_subtree(from_markdown(heavy)), auto)
+
+    def test_auto_deep(self):
+        """The auto engine examines each estimate once, however deep the
+        tree, until the tree changes."""
+        auto = engines.make_engine("auto")
+        depth = 50
+        deep = from_markdown("".join("%s* Task %d {1-100}\n" % ("  " * i, i)
+                                     for i in range(depth)))
+        nodes = [deep]
+        while nodes[-1].children:
+            nodes.append(nodes[-1].children[0])
+        # pylint: disable = protected-access
+        with mock.patch.object(engines, "_heavy_tailed",
+                               wraps=engines._heavy_tailed) as heavy:
+            for node in nodes:
+                self.assertIs(auto.for_subtree(node), auto)
+            self.assertEqual(heavy.call_count, depth)
+            nodes[-1].distribution = nodes[-1].distribution_text = None
+            for node in nodes:
+                node.forget_cost()
+            auto.for_subtree(deep)
+            self.assertEqual(heavy.call_count, 2 * depth - 1)
+
+    def test_precision(self):
+        """Discretized sums are stored in the engine's precision, and are
+        close to those stored in full precision."""
+        root = from_markdown(self.MODEL_MD)
+        ps = [0.1, 0.5, 0.9]
+        full = root.cost(engine=engines.make_engine("fft"))
+        for precision in ("float32", "float16"):
+            reduced = root.cost(engine=engines.make_engine(
+                "fft", precision=precision))
+            self.assertEqual(reduced.precision, precision)
+            for (x, y) in zip(reduced.quantiles(ps), full.quantiles(ps)):
+                self.assertAlmostEqual(x, y, delta=0.002 * y)
+
+    def test_from_args(self):
+        """Engines are made from command line arguments."""
+        parser = argparse.ArgumentParser()
+        engines.add_engine_arguments(parser)
+        engine = engines.engine_from_args(parser.parse_args(
+            ["--engine", "montecarlo", "--samples", "1000",
+             "--precision", "float32"]))
+        self.assertEqual(engine.key, ("montecarlo", 0.01, "float32", 1000))
+        self.assertEqual(engines.engine_from_args(argparse.Namespace()).key,
+                         engines.make_engine().key)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#! /usr/bin/env python3
+
+"""Tests for `incremental_markdown`."""
+
+import unittest
+
+from libpmp.model.from_markdown import from_markdown
+from libpmp.model.incremental_markdown import IncrementalParser
+
+
+def structure(node):
+    """@return a comparable summary of the tree at @p node."""
+    return (node.tag, node.level, node.data, node.display_name,
+            node.distribution_text, [structure(c) for c in node.children])
+
+
+class IncrementalParserTest(unittest.TestCase):
+    """Tests for `IncrementalParser`."""
+
+    ORIGINAL_MD = """\
+Preamble {1-2}
+
+Headline
+========
+
+## Subtask
+
+ * Squirrels {4-15}
+ * Squid {4-15}
+
+## Subtask 2
+
+No big deal {10-20}
+
+Second headline
+===============
+
+ * Ocelots {3-8}
+"""
+
+    EDITED_MD = ORIGINAL_MD.replace("Squid {4-15}", "Squid {5-15}")
+
+    def test_matches_from_markdown(self):
+        """Each parse gives the same model that `from_markdown` would."""
+        parser = IncrementalParser()
+        for text in (self.ORIGINAL_MD, self.EDITED_MD, self.ORIGINAL_MD):
+            model = parser.parse(text)
+            model.check_valid()
+            self.assertEqual(structure(model),
+                             structure(from_markdown(text)))
+
+    def test_reuse(self):
+        """Unchanged sections keep their nodes and memoized costs."""
+        parser = IncrementalParser()
+        model = parser.parse(self.ORIGINAL_MD)
+        self.assertEqual(parser.sections_rebuilt, 5)
+        model.final_cost()
+        (headline, second_headline) = model.children[1:]
+        (subtask, subtask_2) = headline.children
+        squirrels = subtask.children[0]
+        subtask_2_cost = subtask_2.final_cost()
+        second_headline_cost = second_headline.final_cost()
+
+        edited = parser.parse(self.EDITED_MD)
+        self.assertEqual(parser.sections_reused, 4)
+        self.assertEqual(parser.sections_rebuilt, 1)
+        self.assertIs(edited.children[1], headline)
+        self.assertIs(headline.children[1], subtask_2)
+        self.assertIs(subtask_2.final_cost(), subtask_2_cost)
+        self.assertIs(second_headline.final_cost(), second_headline_cost)
+        self.assertIsNot(headline.children[0], subtask)
+        self.assertEqual(
+            headline.children[0].children[1].distribution_text,
+            "{5-15}")
+        self.assertIsNot(headline.children[0].children[0], squirrels)
+        self.assertAlmostEqual(
+            edited.final_cost().quantile(0.5),
+            from_markdown(self.EDITED_MD).final_cost().quantile(0.5))
+
+
+if __name__ == '__main__':
+    unittest.main()
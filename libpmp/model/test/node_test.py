@@ -0,0 +1,87 @@
+#! /usr/bin/env python3
+
+"""Tests for `node`."""
+
+import threading
+import unittest
+from unittest import mock
+
+from libpmp.model import node
+from libpmp.model.from_markdown import from_markdown
+from libpmp.model.node import CostConfig
+
+
+class NodeTest(unittest.TestCase):
+    """Tests for the cost evaluation of `Node`."""
+
+    MODEL_MD = """\
+# Project
+* First {1-2}
+* No estimate
+* Second {10-20}
+* Third {100-200}
+"""
+
+    def test_prefix_costs(self):
+        """The prefix costs are the running sums made by `final_cost`."""
+        project = from_markdown(self.MODEL_MD).children[0]
+        prefixes = project.prefix_costs()
+        self.assertEqual(len(prefixes), 4)
+        self.assertIs(prefixes[0], project.children[0].final_cost())
+        self.assertIs(prefixes[1], prefixes[0])
+        self.assertIs(prefixes[-1], project.final_cost())
+        self.assertAlmostEqual(prefixes[2].quantile(0.5),
+                               project.children[0].final_cost().quantile(0.5) +
+                               project.children[2].final_cost().quantile(0.5),
+                               delta=1)
+        self.assertIs(project.prefix_costs(), prefixes)
+
+    def test_prefix_costs_shared(self):
+        """Identical trees share their prefix costs too."""
+        first = from_markdown(self.MODEL_MD).children[0]
+        second = from_markdown(self.MODEL_MD).children[0]
+        self.assertIs(first.prefix_costs(), second.prefix_costs())
+
+    def test_shared_costs_threads(self):
+        """Threads may share (and evict from) the shared cost cache."""
+        errors = []
+
+        def cost_models(offset):
+            try:
+                for i in range(20):
+                    text = self.MODEL_MD.replace("{1-2}", "{%d-%d}" % (
+                        offset + i + 1, offset + i + 2))
+                    from_markdown(text).final_cost()
+            except Exception as error:  # pylint: disable = broad-except
+                errors.append(error)
+
+        with mock.patch.object(node, "SHARED_COST_CACHE_SIZE", 3):
+            threads = [threading.Thread(target=cost_models, args=(100 * i,))
+                       for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+
+    def test_clone(self):
+        """Clones are separate trees with the same costs."""
+        root = from_markdown(self.MODEL_MD)
+        clone = root.clone()
+        clone.check_valid()
+        self.assertIsNone(clone.parent)
+        self.assertIsNot(clone.children[0], root.children[0])
+        self.assertIs(clone.children[0].parent, clone)
+        self.assertIs(clone.final_cost(), root.final_cost())
+
+    def test_config_without_estimate(self):
+        """A cost config applies only to nodes that have an estimate."""
+        config = CostConfig("dollars", {"": 100})
+        project = from_markdown(self.MODEL_MD).children[0]
+        self.assertAlmostEqual(
+            project.cost(config).quantile(0.5),
+            100 * project.final_cost().quantile(0.5), delta=100)
+
+
+if __name__ == '__main__':
+    unittest.main()
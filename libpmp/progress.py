@@ -4,26 +4,121 @@
 time.."""
 
 import argparse
+import sys
 
-from libpmp.historical.history import history_from_md_texts
-from libpmp.historical.report import structure_dump_with_history
+from libpmp.common import profiling
+from libpmp.common.plot_pool import BACKENDS, DEFAULT_BACKEND
+from libpmp.common.watch import POLL_INTERVAL, redirected_output, watch_files
+from libpmp.historical.git_history import history_from_git
+from libpmp.historical.loader import history_from_md_files
+from libpmp.historical.report import report_sections
+from libpmp.model.engines import (
+    add_engine_arguments,
+    engine_from_args,
+    set_default_engine,
+)
 
 
-def main():
-    """Parse command line args, load estimates, and generate a report."""
+def _argument_parser():
+    """Return the parser for our command line arguments."""
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument('--levels', type=int,
                         help='maximum levels to show', default=2)
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='number of parallel parse and plot workers '
+                             '(default: one per cpu)')
+    parser.add_argument('--threads', action='store_true',
+                        help='parse in threads rather than processes')
+    parser.add_argument('--plot-backend', choices=BACKENDS,
+                        default=DEFAULT_BACKEND,
+                        help='draw plots with our own lightweight svg '
+                             'writer, or with matplotlib (slower, in xkcd '
+                             'style)')
+    parser.add_argument('--plot-cache', type=str, default=None,
+                        metavar='DIR',
+                        help='keep rendered plots in DIR, and reuse them '
+                             'for plots whose data is unchanged')
+    add_engine_arguments(parser)
+    parser.add_argument('--profile-out', type=str, default=None,
+                        metavar='FILE',
+                        help='profile the run, and write a Chrome '
+                             'trace-event JSON of it to FILE')
+    parser.add_argument('--output', type=str, default=None,
+                        help='write the report to this file, not stdout')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running, regenerating the report '
+                             'whenever an input changes')
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL,
+                        help='seconds between checks of the inputs in '
+                             '--watch mode')
+    parser.add_argument('--git', type=str, default=None, metavar='REPO',
+                        help='read every revision of the single input, a '
+                             'path within the git repository REPO')
+    parser.add_argument('--max-count', type=int, default=None,
+                        help='with --git, use at most this many revisions')
+    parser.add_argument('--since', type=str, default=None,
+                        help='with --git, use only revisions since this '
+                             'date (in any format git accepts)')
     parser.add_argument('input_mds', nargs="+")
+    return parser
 
-    args = parser.parse_args()
 
-    md_texts = [open(input_md).read() for input_md in args.input_mds]
-    history = history_from_md_texts(md_texts)
+def load_history(args, models, changed_paths):
+    """Return a (history, failures) pair for the inputs named in @p args.
+    @p models is a map of {path: model} of snapshots already parsed, from
+    which @p changed_paths are first dropped."""
+    if args.git is not None:
+        return history_from_git(
+            args.git, args.input_mds[0], max_count=args.max_count,
+            since=args.since, jobs=args.jobs)
+    for path in changed_paths:
+        models.pop(path, None)
+    return history_from_md_files(
+        args.input_mds, jobs=args.jobs, use_threads=args.threads,
+        models=models)
+
+
+def run(args, models, changed_paths):
+    """Load the history (see `load_history`) and print the report."""
+    profiling.reset()
+    with profiling.span("load_history"):
+        history, failures = load_history(args, models, changed_paths)
+    for (path, error) in failures:
+        print("progress: skipping %s: %s" % (path, error), file=sys.stderr)
+    if not history.entries():
+        raise RuntimeError("No snapshots could be loaded.")
     model = history.most_recent_model()
-    print(
-        structure_dump_with_history(model, history, args)
-    )
+    with redirected_output(args.output), profiling.span("report"):
+        for section in report_sections(model, history, args):
+            sys.stdout.write(section)
+            sys.stdout.flush()
+        print()
+    if args.profile_out is not None:
+        profiling.write_chrome_trace(args.profile_out)
+
+
+def main():
+    """Parse command line args, load estimates, and generate a report."""
+    parser = _argument_parser()
+    args = parser.parse_args()
+    if args.git is not None:
+        if len(args.input_mds) != 1:
+            parser.error("--git takes exactly one input path.")
+        if args.watch:
+            parser.error("--git cannot be used with --watch.")
+
+    set_default_engine(engine_from_args(args))
+    profiling.enable(args.profile_out is not None)
+    models = {}  # Parsed snapshots, kept between runs in --watch mode.
+    if args.watch:
+        watch_files(args.input_mds,
+                    lambda changed: run(args, models, changed),
+                    interval=args.poll_interval)
+    else:
+        try:
+            run(args, models, args.input_mds)
+        except RuntimeError as error:
+            parser.error(str(error))
 
 if __name__ == '__main__':
     main()
@@ -2,9 +2,12 @@
 annotated with estimation results.  Only works with Markdown input, as it
 relies on abusing the CommonMark renderer to generate the HTML."""
 
+import sys
+import weakref
 
-import CommonMark
+import commonmark
 
+from libpmp.common.plot_pool import in_pool, plot_options, render_svgs
 from libpmp.model import node_plot
 
 HEADER = """
@@ -61,10 +64,60 @@ FOOTER = """
 """
 
 
-def distribution_text(node, args):
+# Map of {node: (final cost, plot backend, svg)} of plots already made in
+# this process, so that repeated reports on a changing model (`cost --watch`)
+# redraw only the headings whose costs have changed.
+_SVG_MEMO = weakref.WeakKeyDictionary()
+
+
+def _plotted_headings(subtree):
+    """@return the nodes of @p subtree, in document order, whose headings
+    are to be annotated with a plot."""
+    result = []
+    if subtree.ast.t == "heading" and subtree.has_cost():
+        result.append(subtree)
+    for child in subtree.children:
+        result += _plotted_headings(child)
+    return result
+
+
+def heading_svgs(nodes, args):
+    """Generator of the plot (svg) for each of the heading @p nodes, in
+    order.  Memoized plots are reused; the rest are rendered as selected by
+    @p args (see `plot_pool.plot_options`):  one at a time as they are
+    needed or, if rendering in a process pool, all submitted at once."""
+    options = plot_options(args)
+    nodes = list(nodes)
+
+    def memoized_svg(node):
+        (memo_cost, backend, svg) = _SVG_MEMO.get(node, (None, None, None))
+        if memo_cost is node.final_cost() and backend == options["backend"]:
+            return svg
+        return None
+
+    rendered = None
+    if in_pool(**options):
+        rendered = render_svgs(
+            (node_plot.cdf_job(node, args, multi=True) for node in nodes
+             if memoized_svg(node) is None),
+            **options)
+    for node in nodes:
+        svg = memoized_svg(node)
+        if svg is None:
+            if rendered is None:
+                (svg,) = render_svgs(
+                    [node_plot.cdf_job(node, args, multi=True)], **options)
+            else:
+                svg = next(rendered)
+            _SVG_MEMO[node] = (node.final_cost(), options["backend"], svg)
+        yield svg
+
+
+def distribution_text(node, args, svg=None):
     """Generates HTML text to be inserted after the header block for
-    the provided header @p node."""
-    svg = node_plot.cdf_svg(node, args, multi=True)
+    the provided header @p node, whose plot is @p svg if already made."""
+    if svg is None:
+        svg = node_plot.cdf_svg(node, args, multi=True)
     html = (
         '<div class="floating-box">' +
         svg +
@@ -72,23 +125,77 @@ def distribution_text(node, args):
     return html
 
 
+def _annotation(node, args, svg):
+    """@return an html block AST node of the estimates of @p node."""
+    dist_ast_node = commonmark.node.Node("html_block", [])
+    dist_ast_node.literal = distribution_text(node, args, svg)
+    return dist_ast_node
+
+
 def annotate_asts(subtree, args):
     """For the given MarkdownNode tree, annotate the associated AST with
-    estimates information."""
-    md_ast = subtree.ast
-    if md_ast.t == "heading" and subtree.has_cost():
-        dist_ast_node = CommonMark.node.Node("html_block", [])
-        dist_ast_node.literal = distribution_text(subtree, args)
-        md_ast.insert_after(dist_ast_node)
-    for child in subtree.children:
-        annotate_asts(child, args)
+    estimates information.  @return the annotations inserted, which the
+    caller must `unlink()` once done with the AST:  parsers share the ASTs
+    of unchanged sections between parses (see `IncrementalParser`), which
+    would otherwise gain another annotation each time."""
+    nodes = _plotted_headings(subtree)
+    annotations = []
+    for (node, svg) in zip(nodes, heading_svgs(nodes, args)):
+        annotations.append(_annotation(node, args, svg))
+        node.ast.insert_after(annotations[-1])
+    return annotations
+
+
+def _top_level_block(ast):
+    """@return the child of the document that is or contains @p ast."""
+    while ast.parent is not None and ast.parent.t != "document":
+        ast = ast.parent
+    return ast
+
+
+def report_sections(root, args):
+    """Generator of the HTML of the report on @p root, in sections:  the
+    header, each top-level block of the document (with the plots of its
+    headings), and the footer.  Each section is made only when it is
+    requested, so the report can be written out as it is made.  The AST of
+    @p root is left as it was."""
+    yield HEADER + "\n"
+    nodes = _plotted_headings(root)
+    blocks = {}  # Map of {id(top-level block): [nodes]}.
+    for node in nodes:
+        blocks.setdefault(id(_top_level_block(node.ast)), []).append(node)
+    svgs = zip(nodes, heading_svgs(nodes, args))
+    ready = {}  # Map of {node: svg} made but not yet written.
+
+    renderer = commonmark.HtmlRenderer()
+    block = root.ast.first_child
+    while block is not None:
+        annotations = []
+        nested = []  # Annotations inserted within the block, for now.
+        for node in blocks.get(id(block), []):
+            while node not in ready:
+                (plotted, svg) = next(svgs)
+                ready[plotted] = svg
+            annotation = _annotation(node, args, ready.pop(node))
+            if node.ast is block:
+                annotations.append(annotation)
+            else:  # A heading nested in a list or the like.
+                node.ast.insert_after(annotation)
+                nested.append(annotation)
+        try:
+            html = renderer.render(block) + "".join(
+                renderer.render(annotation) for annotation in annotations)
+        finally:
+            for annotation in nested:
+                annotation.unlink()
+        yield html
+        block = block.nxt
+    yield "\n" + FOOTER + "\n"
 
 
 def report(root, args):
-    """Renders out the whole node @p root with its estimates as HTML."""
-    renderer = CommonMark.HtmlRenderer()
-    annotate_asts(root, args)
-    html = renderer.render(root.ast)
-    print(HEADER)
-    print(html)
-    print(FOOTER)
+    """Renders out the whole node @p root with its estimates as HTML,
+    writing each section as soon as it is ready."""
+    for section in report_sections(root, args):
+        sys.stdout.write(section)
+        sys.stdout.flush()
@@ -0,0 +1,146 @@
+"""Report that exports the estimates of every node in machine-readable form,
+for ingestion into other systems:  JSON Lines, CSV, or a columnar numpy
+`.npz` archive that also holds each node's discretized CDF.
+
+Each node is identified by its path:  the identifiers (see
+`model.diff.identifier`) of its ancestors and itself, below the root,
+joined by "/" (with "/" and "\\" in identifiers escaped by "\\").  The
+second and later of several siblings with the same identifier get a suffix
+of "[2]", "[3]" and so on, so that paths are unique."""
+
+import csv
+import io
+import json
+import sys
+
+import numpy
+
+from libpmp.model.diff import identifier
+
+FORMATS = ("jsonl", "csv", "npz")
+
+# Quantiles exported unless others are requested.
+DEFAULT_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+# Number of points in each discretized CDF of the npz format.
+CDF_POINTS = 200
+
+# The CDFs span [0, the quantile at CDF_COVERAGE].
+CDF_COVERAGE = 0.999
+
+
+def _escape(name):
+    return name.replace("\\", "\\\\").replace("/", "\\/")
+
+
+def node_paths(root):
+    """Generator of `(path, node)` for @p root and its descendants, in
+    preorder.  The root's path is empty."""
+    stack = [("", root)]
+    while stack:
+        (path, node) = stack.pop()
+        yield (path, node)
+        prefix = path + "/" if path else ""
+        seen = {}  # Map of {name: times seen among these children}.
+        children = []
+        for child in node.children:
+            name = _escape(identifier(child) or "")
+            seen[name] = seen.get(name, 0) + 1
+            if seen[name] > 1:
+                name += "[%d]" % seen[name]
+            children.append((prefix + name, child))
+        stack.extend(reversed(children))
+
+
+def parse_quantiles(text):
+    """@return the tuple of quantiles in the comma-separated @p text.
+    Raises ValueError unless each is in [0, 1)."""
+    quantiles = tuple(float(value) for value in text.split(","))
+    for quantile in quantiles:
+        if not 0 <= quantile < 1:
+            raise ValueError("Quantile %s is not in [0, 1)" % quantile)
+    return quantiles
+
+
+def export_table(root, quantiles=DEFAULT_QUANTILES, cdf_points=0):
+    """@return the estimates of every node of @p root as a map of columns:
+    `path`, `name` and `estimate` (lists of strings), `quantile_levels`
+    (@p quantiles), and `quantiles`, an array with a row of the quantiles of
+    each node.  If @p cdf_points is nonzero, also `cdf_xs` and `cdf`, arrays
+    with a row of that many samples of each node's CDF."""
+    root.final_cost()  # Cost the whole tree at once, filling every memo.
+    rows = list(node_paths(root))
+    costs = [node.final_cost() for (_, node) in rows]
+    table = {
+        "path": [path for (path, _) in rows],
+        "name": [node.get_display_name() for (_, node) in rows],
+        "estimate": [node.distribution_text or "" for (_, node) in rows],
+        "quantile_levels": numpy.array(quantiles, dtype=float),
+        "quantiles": numpy.array([cost.quantiles(quantiles)
+                                  for cost in costs]).reshape(
+                                      (len(rows), len(quantiles))),
+    }
+    if cdf_points:
+        xs = numpy.array([numpy.linspace(0, cost.quantile(CDF_COVERAGE),
+                                         cdf_points) for cost in costs])
+        table["cdf_xs"] = xs
+        table["cdf"] = numpy.array([cost.cdf_array(cost_xs)
+                                    for (cost, cost_xs) in zip(costs, xs)])
+    return table
+
+
+def _quantile_name(quantile):
+    return "%g" % quantile
+
+
+def write_jsonl(table, output):
+    """Write @p table (see `export_table`) to the text stream @p output,
+    one JSON object per node."""
+    levels = [_quantile_name(q) for q in table["quantile_levels"]]
+    for (i, path) in enumerate(table["path"]):
+        output.write(json.dumps({
+            "path": path,
+            "name": table["name"][i],
+            "estimate": table["estimate"][i],
+            "quantiles": dict(zip(levels, table["quantiles"][i].tolist())),
+        }) + "\n")
+
+
+def write_csv(table, output):
+    """Write @p table (see `export_table`) to the text stream @p output as
+    CSV, one row per node."""
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(["path", "name", "estimate"] +
+                    ["q" + _quantile_name(q)
+                     for q in table["quantile_levels"]])
+    for (i, path) in enumerate(table["path"]):
+        writer.writerow([path, table["name"][i], table["estimate"][i]] +
+                        table["quantiles"][i].tolist())
+
+
+def write_npz(table, output):
+    """Write @p table (see `export_table`) to the binary stream @p output
+    as a numpy `.npz` archive of its columns."""
+    buffer = io.BytesIO()  # The stream need not be seekable.
+    numpy.savez_compressed(buffer, **{
+        name: (numpy.array(column, dtype=str)
+               if name in ("path", "name", "estimate") else column)
+        for (name, column) in table.items()})
+    output.write(buffer.getvalue())
+
+
+def report(root, args):
+    """Export the estimates of every node of @p root to stdout, in the
+    format `args.export_format`, with the quantiles `args.quantiles`."""
+    export_format = getattr(args, "export_format", "jsonl")
+    quantiles = getattr(args, "quantiles", None) or DEFAULT_QUANTILES
+    table = export_table(root, quantiles,
+                         CDF_POINTS if export_format == "npz" else 0)
+    if export_format == "npz":
+        sys.stdout.flush()
+        write_npz(table, sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+    elif export_format == "csv":
+        write_csv(table, sys.stdout)
+    else:
+        write_jsonl(table, sys.stdout)
@@ -0,0 +1,50 @@
+"""Report that costs the model with profiling on (see
+`libpmp.common.profiling`) and prints the nodes that took longest to cost,
+and the counters of the instrumented operations."""
+
+from libpmp.common import profiling
+from libpmp.report.export import node_paths
+
+# Number of nodes listed unless `args.profile_top` says otherwise.
+DEFAULT_TOP = 20
+
+
+def node_profiles(root):
+    """@return a list of `(path, stats)` for each node of @p root costed
+    while profiling, where `stats` is its `profiling.node_stats` plus
+    `self_seconds`, the time spent costing it but not its children.  The
+    list is sorted slowest first."""
+    rows = []
+    for (path, node) in node_paths(root):
+        stats = dict(profiling.node_stats(node))
+        children_seconds = sum(profiling.node_stats(child)["seconds"]
+                               for child in node.children)
+        stats["self_seconds"] = max(0., stats["seconds"] - children_seconds)
+        if stats["misses"] or stats["hits"]:
+            rows.append((path or "(root)", stats))
+    rows.sort(key=lambda row: row[1]["self_seconds"], reverse=True)
+    return rows
+
+
+def report(root, args):
+    """Cost @p root (unless that was already done with profiling on), then
+    print the `args.profile_top` nodes that took longest, and every
+    counter."""
+    if not profiling.ENABLED:
+        profiling.enable()
+        profiling.reset()
+    root.final_cost()
+    top = getattr(args, "profile_top", None) or DEFAULT_TOP
+    rows = node_profiles(root)
+    print("%10s %10s %7s %5s %5s  %s" % (
+        "self s", "total s", "grid", "hits", "miss", "node"))
+    for (path, stats) in rows[:top]:
+        print("%10.4f %10.4f %7d %5d %5d  %s" % (
+            stats["self_seconds"], stats["seconds"], stats["grid"],
+            stats["hits"], stats["misses"], path))
+    if len(rows) > top:
+        print("(%d more nodes)" % (len(rows) - top))
+    print()
+    for (name, value) in sorted(profiling.counters().items()):
+        print("%-32s %s" % (name, ("%.4f" % value)
+                            if isinstance(value, float) else value))
@@ -0,0 +1,79 @@
+#! /usr/bin/env python3
+
+"""Tests for `enhanced_html`."""
+
+import argparse
+import unittest
+from unittest import mock
+
+from libpmp.model.from_markdown import from_markdown
+from libpmp.report import enhanced_html
+
+
+class EnhancedHtmlTest(unittest.TestCase):
+    """Tests for `enhanced_html`."""
+
+    MODEL_MD = """\
+# First
+* A {1-2}
+
+Some text.
+
+# Second
+* B {10-20}
+  ## Nested
+  * C {3-4}
+"""
+
+    def test_report_sections(self):
+        """The report is made a section at a time, with each plot in the
+        section of its heading."""
+        model = from_markdown(self.MODEL_MD)
+        sections = enhanced_html.report_sections(
+            model, argparse.Namespace(jobs=1))
+        self.assertEqual(next(sections), enhanced_html.HEADER + "\n")
+        self.assertNotIn(model.children[0], enhanced_html._SVG_MEMO)
+        rest = list(sections)
+        self.assertEqual(rest[-1], "\n" + enhanced_html.FOOTER + "\n")
+        plotted = [section for section in rest if "<svg" in section]
+        self.assertEqual(len(plotted), 3)
+        self.assertTrue(plotted[0].startswith("<h1>First</h1>"))
+        self.assertTrue(plotted[1].startswith("<h1>Second</h1>"))
+        # A heading nested in a list gets its plot within the list.
+        self.assertTrue(plotted[2].startswith("<ul>"))
+        self.assertIn("<h2>Nested</h2>\n<div", plotted[2])
+
+    def test_repeated_report(self):
+        """Reporting on the same model again gives the same report, the
+        plots of nested headings included."""
+        model = from_markdown(self.MODEL_MD.replace("* B", "> ## Quoted\n* B"))
+        args = argparse.Namespace(jobs=1)
+        first = "".join(enhanced_html.report_sections(model, args))
+        self.assertEqual(first.count("<svg"), 4)
+        self.assertEqual("".join(enhanced_html.report_sections(model, args)),
+                         first)
+        annotations = enhanced_html.annotate_asts(model, args)
+        self.assertEqual(len(annotations), 4)
+        for annotation in annotations:
+            annotation.unlink()
+        self.assertEqual("".join(enhanced_html.report_sections(model, args)),
+                         first)
+
+    def test_svg_memo_backend(self):
+        """Plots made with one backend are not reused for another."""
+        model = from_markdown(self.MODEL_MD)
+        args = argparse.Namespace(jobs=1)
+        list(enhanced_html.report_sections(model, args))
+        (_, backend, svg) = enhanced_html._SVG_MEMO[model.children[0]]
+        other = argparse.Namespace(jobs=1, plot_backend="fake")
+        with mock.patch.object(enhanced_html, "render_svgs",
+                               return_value=["<svg>fake</svg>"]) as render:
+            report = "".join(enhanced_html.report_sections(model, other))
+        self.assertNotEqual(backend, "fake")
+        self.assertTrue(render.called)
+        self.assertIn("<svg>fake</svg>", report)
+        self.assertNotIn(svg, report)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+#! /usr/bin/env python3
+
+"""Tests for `export`."""
+
+import csv
+import io
+import json
+import unittest
+
+import numpy
+
+from libpmp.model.from_markdown import from_markdown
+from libpmp.report import export
+
+
+class ExportTest(unittest.TestCase):
+    """Tests for `export`."""
+
+    MODEL_MD = """\
+# Plan
+* Design {1-2}
+* Build / test {10-20}
+* Design {3-4}
+"""
+
+    def setUp(self):
+        self.model = from_markdown(self.MODEL_MD)
+
+    def test_node_paths(self):
+        """Paths are unique, escaped, and in preorder."""
+        paths = [path for (path, _) in export.node_paths(self.model)]
+        self.assertEqual(paths, ["", "Plan", "Plan/Design",
+                                 "Plan/Build \\/ test", "Plan/Design[2]"])
+
+    def test_quantiles(self):
+        """Each node's row holds its quantiles."""
+        table = export.export_table(self.model, (0.1, 0.75))
+        self.assertEqual(table["quantiles"].shape, (5, 2))
+        (design_10, design_75) = table["quantiles"][2]
+        self.assertAlmostEqual(design_10, 1, delta=0.01)
+        self.assertAlmostEqual(design_75, 2, delta=0.01)
+        self.assertEqual(table["estimate"][2], "{1-2}")
+
+    def test_formats(self):
+        """The text formats hold a record per node."""
+        table = export.export_table(self.model, (0.5,))
+        jsonl = io.StringIO()
+        export.write_jsonl(table, jsonl)
+        records = [json.loads(line) for line in jsonl.getvalue().split("\n")
+                   if line]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(sorted(records[1]["quantiles"]), ["0.5"])
+        text = io.StringIO()
+        export.write_csv(table, text)
+        rows = list(csv.reader(io.StringIO(text.getvalue())))
+        self.assertEqual(rows[0], ["path", "name", "estimate", "q0.5"])
+        self.assertEqual(rows[4][0], "Plan/Build \\/ test")
+
+    def test_npz(self):
+        """The npz format holds the columns and the CDFs."""
+        table = export.export_table(self.model, cdf_points=10)
+        binary = io.BytesIO()
+        export.write_npz(table, binary)
+        binary.seek(0)
+        archive = numpy.load(binary)
+        self.assertEqual(list(archive["path"]), table["path"])
+        self.assertEqual(archive["cdf"].shape, (5, 10))
+        self.assertAlmostEqual(archive["cdf"][2][-1], export.CDF_COVERAGE)
+
+    def test_parse_quantiles(self):
+        """Quantiles are parsed from text, and checked."""
+        self.assertEqual(export.parse_quantiles("0.1,0.5"), (0.1, 0.5))
+        with self.assertRaises(ValueError):
+            export.parse_quantiles("0.5,1")
+
+
+if __name__ == '__main__':
+    unittest.main()
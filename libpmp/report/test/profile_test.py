@@ -0,0 +1,57 @@
+#! /usr/bin/env python3
+
+"""Tests for `profile`."""
+
+import argparse
+import contextlib
+import io
+import unittest
+
+from libpmp.common import profiling
+from libpmp.model import node
+from libpmp.model.from_markdown import from_markdown
+from libpmp.report import profile
+
+
+class ProfileTest(unittest.TestCase):
+    """Tests for `profile`."""
+
+    MODEL_MD = """\
+# Plan
+* Design {1-20}
+* Build {10-200}
+"""
+
+    def setUp(self):
+        node._SHARED_COSTS.clear()
+
+    def tearDown(self):
+        profiling.enable(False)
+        profiling.reset()
+
+    def test_report(self):
+        """The report lists the slowest nodes, and the counters."""
+        model = from_markdown(self.MODEL_MD)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            profile.report(model, argparse.Namespace(profile_top=2))
+        lines = output.getvalue().split("\n")
+        self.assertIn("node", lines[0])
+        self.assertTrue(lines[1].endswith("Plan"))  # Where the adding is.
+        self.assertEqual(lines[3], "(2 more nodes)")
+        self.assertIn("dist_add.calls", output.getvalue())
+
+    def test_node_profiles(self):
+        """Each node's own time excludes its children's."""
+        profiling.enable()
+        model = from_markdown(self.MODEL_MD)
+        model.final_cost()
+        rows = dict(profile.node_profiles(model))
+        self.assertEqual(sorted(rows), ["(root)", "Plan", "Plan/Build",
+                                        "Plan/Design"])
+        self.assertLessEqual(rows["(root)"]["self_seconds"],
+                             rows["(root)"]["seconds"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,375 @@
+"""A local HTTP service answering cost queries (`cost serve`), for clients
+such as dashboards that would otherwise run `cost` once per query.
+
+The served models are parsed once and kept in memory, with their memoized
+costs, and are parsed again (incrementally, for markdown) whenever their
+files change.  Requests are handled concurrently, one thread each; queries
+on the same model take turns.  Every response is JSON.  The endpoints are:
+
+ * `GET /`:  the served models, and the paths of their nodes.
+ * `GET /quantiles?model=M&node=P&q=0.1,0.5,0.9`:  quantiles of a node's
+   cost.
+ * `GET /cdf?model=M&node=P&points=N`:  N samples of a node's CDF.
+ * `GET /report?model=M&report=R&levels=L`:  the text of a report.
+ * `GET /whatif?model=M&node=P&estimate={10-20}`, or `POST /whatif` with a
+   JSON object of these parameters whose `overrides` is a map of {node path:
+   estimate}:  quantiles of the root (or of `of`, a node path) if those
+   nodes (with everything below them) cost those estimates, next to the
+   actual ones.
+
+Nodes are named by their paths as in the export report (see
+`libpmp.report.export`); the root's path is empty.  `model` may be omitted
+if only one model is served.  Any query may also give an `engine` (see
+`libpmp.model.engines`) with which to cost the model.
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import sys
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy
+
+from libpmp.common.plot_pool import BACKENDS, DEFAULT_BACKEND
+from libpmp.common.watch import file_state
+from libpmp.cost import get_report, load_model
+from libpmp.model import engines
+from libpmp.model.node import make_distribution
+from libpmp.report.export import (
+    CDF_COVERAGE,
+    CDF_POINTS,
+    DEFAULT_QUANTILES,
+    node_paths,
+    parse_quantiles,
+)
+
+DEFAULT_HOST = "127.0.0.1"
+
+DEFAULT_PORT = 8177
+
+# Reports that can be served.  The others show windows, write binary
+# output, or change process-wide state.
+SERVED_REPORTS = ("structure_dump", "parser_debug", "enhanced_html", "export")
+
+# Reports write to stdout, which is shared by every thread.
+_OUTPUT_LOCK = threading.Lock()
+
+
+class _Model:
+    """A served model, and what is needed to keep it up to date."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()  # Held while loading or querying.
+        self.state = None  # `file_state` of the file when last loaded.
+        self.root = None
+        self.nodes = {}  # Map of {node path: node}.
+        self.markdown_parser = None
+        if not path.endswith('.html'):
+            # pylint: disable = import-outside-toplevel
+            from libpmp.model.incremental_markdown import IncrementalParser
+            self.markdown_parser = IncrementalParser()
+
+    def refresh(self):
+        """Load the model, if its file has changed since it was last
+        loaded.  Call with `lock` held."""
+        state = file_state(self.path)
+        if self.root is not None and state == self.state:
+            return
+        self.root = load_model(self.path, self.markdown_parser)
+        self.nodes = dict(node_paths(self.root))
+        self.state = state
+
+
+def _with_estimates(root, nodes):
+    """@return a copy of @p root in which each node of @p nodes, a map of
+    {node: estimate text}, costs that estimate instead of whatever it and
+    its descendants did (which are left out of the copy).  The model itself
+    is left alone; the copy keeps the memoized costs of the subtrees that
+    are unchanged."""
+    for node in nodes:
+        ancestor = node.parent if node is not root else None
+        while ancestor is not None:
+            if ancestor in nodes:
+                raise ValueError("Overridden nodes contain one another")
+            ancestor = ancestor.parent if ancestor is not root else None
+    result = root.clone()
+    # The clone's nodes, in the same (preorder) order as the model's.
+    copies = dict(zip((node for (_, node) in node_paths(root)),
+                      (node for (_, node) in node_paths(result))))
+    for (node, estimate) in nodes.items():
+        clone = copies[node]
+        clone.children = []
+        try:
+            clone.distribution = make_distribution(estimate)
+        except (ValueError, AssertionError) as error:
+            raise ValueError("Bad estimate %s" % estimate) from error
+        clone.distribution_text = estimate
+        while clone is not None:
+            clone.forget_cost()
+            clone = clone.parent
+    return result
+
+
+def _quantile_map(cost, quantiles):
+    return dict(zip(("%g" % q for q in quantiles),
+                    cost.quantiles(quantiles).tolist()))
+
+
+class CostService:
+    """The queries answered by the server, on the models at @p paths, with
+    the cost command line arguments @p args (for the default engine and the
+    reports' options).  Each query takes a map of {parameter: value} and
+    returns a JSON-compatible result.  Unknown models and nodes raise
+    KeyError; bad parameters, ValueError."""
+
+    def __init__(self, paths, args):
+        self.models = {path: _Model(path) for path in paths}
+        self.args = args
+
+    @contextlib.contextmanager
+    def _model(self, params):
+        """Context manager giving the up to date model named in @p params,
+        which it keeps to this thread."""
+        name = params.get("model")
+        if name is None and len(self.models) == 1:
+            (name,) = self.models
+        if name not in self.models:
+            raise KeyError("Unknown model %s" % name)
+        model = self.models[name]
+        with model.lock:
+            model.refresh()
+            yield model
+
+    @staticmethod
+    def _engine(params):
+        if "engine" not in params:
+            return None  # The default engine.
+        if params["engine"] not in engines.ENGINES:
+            raise ValueError("Unknown engine %s" % params["engine"])
+        return engines.make_engine(params["engine"])
+
+    @staticmethod
+    def _node(model, path):
+        if path not in model.nodes:
+            raise KeyError("Unknown node %s" % path)
+        return model.nodes[path]
+
+    def models_query(self, _):
+        """@return the served models, each with its node paths."""
+        result = {}
+        for name in self.models:
+            with self._model({"model": name}) as model:
+                result[name] = list(model.nodes)
+        return {"models": result}
+
+    def quantiles_query(self, params):
+        """@return the quantiles `q` (default `DEFAULT_QUANTILES`) of the
+        cost of the node `node` (default the root)."""
+        quantiles = (parse_quantiles(params["q"]) if "q" in params
+                     else DEFAULT_QUANTILES)
+        with self._model(params) as model:
+            node = self._node(model, params.get("node", ""))
+            cost = node.final_cost(engine=self._engine(params))
+            return {"model": model.path, "node": params.get("node", ""),
+                    "quantiles": _quantile_map(cost, quantiles)}
+
+    def cdf_query(self, params):
+        """@return `points` samples of the CDF of the cost of the node
+        `node`, from zero to its `CDF_COVERAGE` quantile."""
+        points = int(params.get("points", CDF_POINTS))
+        if not 1 < points <= 100000:
+            raise ValueError("Bad number of points %d" % points)
+        with self._model(params) as model:
+            node = self._node(model, params.get("node", ""))
+            cost = node.final_cost(engine=self._engine(params))
+            xs = numpy.linspace(0, cost.quantile(CDF_COVERAGE), points)
+            return {"model": model.path, "node": params.get("node", ""),
+                    "xs": xs.tolist(), "cdf": cost.cdf_array(xs).tolist()}
+
+    def report_query(self, params):
+        """@return the output of the report `report` (one of
+        `SERVED_REPORTS`) on the model, with `levels` levels."""
+        name = params.get("report", "structure_dump")
+        if name not in SERVED_REPORTS:
+            raise ValueError("Report %s cannot be served" % name)
+        args = copy.copy(self.args)
+        args.levels = int(params.get("levels", args.levels))
+        args.export_format = params.get("export_format", "jsonl")
+        if args.export_format not in ("jsonl", "csv"):
+            raise ValueError("Bad export format %s" % args.export_format)
+        if "q" in params:
+            args.quantiles = parse_quantiles(params["q"])
+        with self._model(params) as model:
+            if name == "enhanced_html" and not hasattr(model.root, "ast"):
+                raise ValueError("enhanced_html needs a markdown model")
+            output = io.StringIO()
+            with _OUTPUT_LOCK, contextlib.redirect_stdout(output):
+                get_report(name)(model.root, args)
+            return {"model": model.path, "report": name,
+                    "output": output.getvalue()}
+
+    def what_if_query(self, params):
+        """@return the quantiles `q` of the cost of the node `of` (default
+        the root), both as it is and if the nodes in `overrides` (a map of
+        {node path: estimate}), or else the node `node`, had the estimates
+        given (else `estimate`)."""
+        overrides = params.get("overrides")
+        if overrides is None:
+            if "node" not in params or "estimate" not in params:
+                raise ValueError("whatif needs a node and an estimate")
+            overrides = {params["node"]: params["estimate"]}
+        if (not isinstance(overrides, dict) or not overrides or
+                not all(isinstance(estimate, str)
+                        for estimate in overrides.values())):
+            raise ValueError("whatif overrides must be a nonempty map of "
+                             "estimates")
+        quantiles = (parse_quantiles(params["q"]) if "q" in params
+                     else DEFAULT_QUANTILES)
+        engine = self._engine(params)
+        with self._model(params) as model:
+            of_path = params.get("of", "")
+            of_node = self._node(model, of_path)
+            changed = {self._node(model, path): estimate
+                       for (path, estimate) in overrides.items()}
+            copies = dict(node_paths(_with_estimates(model.root, changed)))
+            return {
+                "model": model.path, "of": of_path, "overrides": overrides,
+                "actual": _quantile_map(of_node.final_cost(engine=engine),
+                                        quantiles),
+                "whatif": _quantile_map(
+                    copies[of_path].final_cost(engine=engine), quantiles)}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Dispatches requests to the server's `CostService`."""
+
+    # Map of {path: CostService method}.
+    ROUTES = {
+        "/": "models_query",
+        "/quantiles": "quantiles_query",
+        "/cdf": "cdf_query",
+        "/report": "report_query",
+        "/whatif": "what_if_query",
+    }
+
+    def _params(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = {name: values[-1] for (name, values) in
+                  urllib.parse.parse_qs(
+                      url.query, keep_blank_values=True).items()}
+        return (url.path, params)
+
+    def do_GET(self):  # pylint: disable = invalid-name
+        """Answer a query."""
+        self._respond(*self._params())
+
+    def do_POST(self):  # pylint: disable = invalid-name
+        """Answer a query whose parameters are (also) in a JSON body."""
+        (path, params) = self._params()
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send(400, {"error": "Body is not JSON"})
+            return
+        if not isinstance(body, dict):
+            self._send(400, {"error": "Body is not a JSON object"})
+            return
+        for (name, value) in body.items():
+            # Other than the overrides of whatif, parameters are as in a
+            # query string.
+            if name == "overrides":
+                continue
+            if isinstance(value, (int, float)) and \
+                    not isinstance(value, bool):
+                body[name] = str(value)
+            elif not isinstance(value, str):
+                self._send(400, {"error": "Parameter %s is not a string or "
+                                          "number" % name})
+                return
+        params.update(body)
+        self._respond(path, params)
+
+    def _respond(self, path, params):
+        if path not in self.ROUTES:
+            self._send(404, {"error": "Unknown endpoint %s" % path})
+            return
+        try:
+            result = getattr(self.server.service, self.ROUTES[path])(params)
+        except KeyError as error:
+            self._send(404, {"error": error.args[0]})
+            return
+        except ValueError as error:
+            self._send(400, {"error": str(error)})
+            return
+        except Exception as error:  # pylint: disable = broad-except
+            self.log_error("%s: %s", type(error).__name__, error)
+            self._send(500, {"error": "%s: %s" % (type(error).__name__,
+                                                  error)})
+            return
+        self._send(200, result)
+
+    def _send(self, status, result):
+        body = json.dumps(result).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """@return an HTTP server (not yet serving) answering queries with the
+    `CostService` @p service."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def _argument_parser():
+    parser = argparse.ArgumentParser(
+        prog="cost serve",
+        description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST,
+                        help='address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help='port to listen on')
+    parser.add_argument('--levels', type=int, default=2,
+                        help='default maximum levels of reports')
+    parser.add_argument('--plot-backend', choices=BACKENDS,
+                        default=DEFAULT_BACKEND,
+                        help='how the enhanced_html report draws plots')
+    parser.add_argument('--plot-cache', type=str, default=None,
+                        metavar='DIR',
+                        help='keep rendered plots in DIR')
+    engines.add_engine_arguments(parser)
+    parser.add_argument('inputs', nargs='+', help='models to serve')
+    return parser
+
+
+def main(argv=None):
+    """Parse the `cost serve` command line @p argv, load the models, and
+    serve until interrupted."""
+    args = _argument_parser().parse_args(argv)
+    args.jobs = 1  # Plots of one request are few; don't start a pool.
+    engines.set_default_engine(engines.engine_from_args(args))
+    service = CostService(args.inputs, args)
+    for name in args.inputs:  # Load and cost each model before serving.
+        service.quantiles_query({"model": name})
+    server = make_server(service, args.host, args.port)
+    print("Serving %s on http://%s:%d/" % (", ".join(args.inputs),
+                                           *server.server_address[:2]),
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()